@@ -0,0 +1,70 @@
+"""
+Sorgu embedding verim testi: tek tek encode vs. EmbeddingBatcher.
+
+Kullanım (proje kök dizininden):
+    python -m app.benchmarks.bench_embedding --requests 256 --concurrency 16
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.rag_service import _load_embeddings
+
+SAMPLE_QUERIES = [
+    "OKR linki nedir",
+    "e-pcr nasıl onaylanır",
+    "Kaizen formu nereden doldurulur",
+    "Rollmech hakkında bilgi ver",
+    "KPI sistemine nasıl giriş yaparım",
+    "Kazanılmış dersler kaydı nasıl açılır",
+    "LegalMech ne işe yarar",
+    "Polivalans raporu nerede",
+]
+
+async def _run(embed_one, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await embed_one(f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} #{i}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return elapsed, latencies
+
+def _report(name, total, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<12} {total / elapsed:8.1f} sorgu/sn | "
+          f"p50 {statistics.median(latencies) * 1000:7.1f} ms | p95 {p95 * 1000:7.1f} ms | toplam {elapsed:6.2f} sn")
+
+async def main(total, concurrency, max_batch_size, max_wait_ms):
+    embeddings = _load_embeddings()
+    embeddings.embed_query("ısınma")  # İlk çağrı maliyetini ölçüme katma
+
+    async def sequential(text):
+        return await asyncio.to_thread(embeddings.embed_query, text)
+
+    elapsed, latencies = await _run(sequential, total, concurrency)
+    _report("tek-tek", total, elapsed, latencies)
+
+    batcher = EmbeddingBatcher(embeddings.embed_documents, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    elapsed, latencies = await _run(batcher.embed, total, concurrency)
+    _report("batch", total, elapsed, latencies)
+    print(f"Batch istatistikleri: {batcher.stats()}")
+    batcher.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sorgu embedding verim testi")
+    parser.add_argument("--requests", type=int, default=256, help="Toplam sorgu sayısı")
+    parser.add_argument("--concurrency", type=int, default=16, help="Eşzamanlı istek sayısı")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.max_batch_size, args.max_wait_ms))
@@ -0,0 +1,96 @@
+"""
+Prompt düzeninin Ollama KV önbelleğine (prefix reuse) etkisini ölçer.
+
+Altın setteki her soru için gerçek bağlam (retriever + bağlam paketleyici) hazırlanır ve
+iki düzende Ollama'ya tek tokenlık üretim olarak gönderilir:
+    prefix_stable : Sabit talimatlar -> bağlam -> soru (uygulamanın kullandığı düzen)
+    legacy_chat   : Önceki zincirin Ollama'ya gönderdiği metin: ChatPromptTemplate'in eklediği
+                    "Human: " + kayıtlı şablonun yeniden dizilmemiş hali
+Her istek için Ollama'nın döndüğü prompt_eval_duration (prefill süresi) karşılaştırılır.
+
+Kullanım (proje kök dizininden, Ollama çalışırken):
+    python -m app.benchmarks.bench_prefix_cache --mode thinking --repeat 2
+"""
+import argparse
+import statistics
+
+import requests
+
+from app.core.config import OLLAMA_BASE_URL, MODEL_KEEP_ALIVE
+from app.benchmarks.bench_retrieval import GOLDEN_SET_PATH, load_golden_set
+from app.services import rag_service
+from app.services.prompt_layout import prefix_stable_template, static_prefix
+
+def build_prompts(raw_template, template, question, context):
+    """
+    Aynı içerikten iki farklı düzende prompt üretir.
+    prefix_stable, zincirin Ollama'ya gönderdiği metnin aynısıdır (rag_service.prompt_template).
+    legacy_chat, ChatPromptTemplate | OllamaLLM zincirinin gönderdiği metindir (mesaj "Human: " ile başlar).
+    """
+    stable = rag_service.prompt_template(template).format(context=context, question=question)
+    legacy = "Human: " + rag_service.prompt_template(raw_template).format(context=context, question=question)
+    return {"prefix_stable": stable, "legacy_chat": legacy}
+
+def prefill(model, prompt):
+    """Tek tokenlık üretim; (işlenen prompt token, prefill saniyesi) döner."""
+    response = requests.post(
+        f"{OLLAMA_BASE_URL}/api/generate",
+        json={
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": MODEL_KEEP_ALIVE,
+            "options": {**rag_service.LLM_OPTIONS, "num_predict": 1},
+        },
+        timeout=600,
+    )
+    response.raise_for_status()
+    data = response.json()
+    return data.get("prompt_eval_count") or 0, (data.get("prompt_eval_duration") or 0) / 1e9
+
+def main(mode, repeat, golden_path):
+    rag_service.initialize_rag()
+    rt = rag_service.runtime
+    raw_template = rt.text_thinking if mode == "thinking" else rt.text_fast
+    template = prefix_stable_template(raw_template)
+    golden = load_golden_set(golden_path)
+
+    # Bağlamlar bir kez hazırlanır; ölçüm sadece Ollama prefill süresini kapsar
+    vectors = rag_service.embeddings.embed_documents([item["question"] for item in golden])
+    contexts = [
+        rag_service._get_context_with_links(item["question"], rt.retriever, vector, mode, template)
+        for item, vector in zip(golden, vectors)
+    ]
+
+    print(f"Model: {rt.model} | mod: {mode} | {len(golden)} soru x {repeat} tekrar")
+    print(f"Sabit başlangıç: {len(static_prefix(template))} karakter")
+    prefill(rt.model, "Merhaba")  # Model yüklemesi ölçüme girmesin
+
+    # Isındırmanın önbelleğe aldığı başlangıç gerçek isteğin başlangıcı olmalı
+    sample = build_prompts(raw_template, template, golden[0]["question"], contexts[0])["prefix_stable"]
+    if not sample.startswith(static_prefix(template)):
+        print("⚠️ UYARI: Isındırma prompt'u ile gerçek istek aynı başlangıca sahip değil!")
+
+    results = {}
+    for layout in ("legacy_chat", "prefix_stable"):
+        seconds, tokens = [], []
+        for _ in range(repeat):
+            for item, context in zip(golden, contexts):
+                count, duration = prefill(rt.model, build_prompts(raw_template, template, item["question"], context)[layout])
+                tokens.append(count)
+                seconds.append(duration)
+        results[layout] = seconds
+        print(f"{layout:<14} prefill ort. {statistics.mean(seconds) * 1000:8.1f} ms | "
+              f"medyan {statistics.median(seconds) * 1000:8.1f} ms | ort. {statistics.mean(tokens):6.0f} token")
+
+    saved = statistics.mean(results["legacy_chat"]) - statistics.mean(results["prefix_stable"])
+    print(f"\n⚡ İstek başına kazanılan prefill süresi: {saved * 1000:.1f} ms "
+          f"(%{saved / max(statistics.mean(results['legacy_chat']), 1e-9) * 100:.0f})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt düzeni / Ollama prefix önbelleği ölçümü")
+    parser.add_argument("--mode", choices=["fast", "thinking"], default="thinking")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--golden", default=GOLDEN_SET_PATH, help="Altın set JSON dosyası")
+    args = parser.parse_args()
+    main(args.mode, args.repeat, args.golden)
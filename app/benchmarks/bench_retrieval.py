@@ -0,0 +1,68 @@
+"""
+Yoğun (dense) ve hibrit (BM25 + dense) aramanın hız ve isabet karşılaştırması.
+
+Altın set: app/benchmarks/golden_set.json  ->  [{"question": ..., "source": ..., "page": (opsiyonel)}]
+Kullanım (proje kök dizininden):
+    python -m app.benchmarks.bench_retrieval --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from app.core.config import RETRIEVER_K
+from app.services import rag_service
+from app.services.hybrid_retriever import HybridRetriever
+
+GOLDEN_SET_PATH = os.path.join(os.path.dirname(__file__), "golden_set.json")
+
+def load_golden_set(path=GOLDEN_SET_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def is_hit(docs, item):
+    """Beklenen kaynak (ve varsa sayfa) ilk k sonuçta var mı?"""
+    for doc in docs:
+        if doc.metadata.get("source") != item["source"]:
+            continue
+        if "page" not in item or doc.metadata.get("page") == item["page"]:
+            return True
+    return False
+
+def run(retriever, golden, vectors, repeat):
+    latencies = []
+    hits = 0
+    for item, vector in zip(golden, vectors):
+        for i in range(repeat):
+            started = time.perf_counter()
+            docs = retriever.search(item["question"], vector)
+            latencies.append(time.perf_counter() - started)
+        hits += is_hit(docs, item)
+    latencies.sort()
+    return {
+        "hit_rate": hits / len(golden),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+def main(repeat, k, golden_path):
+    rag_service.initialize_rag()
+    golden = load_golden_set(golden_path)
+    # Embedding bir kez hesaplanır; iki yöntem sadece arama maliyetiyle karşılaştırılır
+    vectors = rag_service.embeddings.embed_documents([item["question"] for item in golden])
+
+    print(f"{len(golden)} soru, k={k}, tekrar={repeat}")
+    for mode in ("dense", "hybrid"):
+        retriever = HybridRetriever(vectorstore=rag_service.vectorstore, k=k, mode=mode)
+        result = run(retriever, golden, vectors, repeat)
+        print(f"{mode:<8} isabet@{k}: {result['hit_rate']:.0%} | "
+              f"p50 {result['p50_ms']:6.1f} ms | p95 {result['p95_ms']:6.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dense vs. hibrit arama karşılaştırması")
+    parser.add_argument("--repeat", type=int, default=5, help="Her soru için tekrar sayısı")
+    parser.add_argument("--k", type=int, default=RETRIEVER_K)
+    parser.add_argument("--golden", default=GOLDEN_SET_PATH, help="Altın set JSON dosyası")
+    args = parser.parse_args()
+    main(args.repeat, args.k, args.golden)
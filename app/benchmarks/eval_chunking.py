@@ -0,0 +1,163 @@
+"""
+Parça boyutu / örtüşme / k ızgarası için arama kalitesi ve hız değerlendirmesi.
+
+Her (chunk_size, chunk_overlap) için 'belgelerim' geçici bir Chroma indeksine baştan kurulur,
+altın setteki sorular her k ve arama modu için çalıştırılır. Raporlanan değerler:
+    recall@k  : Beklenen kaynak (ve varsa sayfa) ilk k sonuçta olan soruların oranı
+    MRR@k     : İlk doğru sonucun sırasının tersinin ortalaması
+    parça     : İndeksteki parça sayısı, diskteki boyut (MB)
+    kurulum   : Parçalama + embedding + yazma süresi
+    p50 / p95 : Sorgu başına arama süresi (sorgu embedding'i hariç, bir kez hesaplanır)
+
+Altın set: app/benchmarks/golden_set.json  ->  [{"question": ..., "source": ..., "page": (opsiyonel, 1'den başlar)}]
+Kullanım (proje kök dizininden):
+    python -m app.benchmarks.eval_chunking --chunk-sizes 512,768,1024 --overlaps 100,200 --ks 2,4,6
+    python -m app.benchmarks.eval_chunking --modes dense,hybrid --json sonuc.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from langchain_chroma import Chroma
+
+from app.core.config import DATA_PATH, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVER_K, HYBRID_CANDIDATES, INDEX_WRITE_BATCH_SIZE
+from app.benchmarks.bench_retrieval import GOLDEN_SET_PATH, load_golden_set, is_hit
+from app.services import rag_service
+from app.services.hybrid_retriever import HybridRetriever
+from app.services.index_sync import make_chunk_ids, make_splitter
+from app.services.lexical_index import LexicalIndex
+from app.services.pdf_loader import iter_pdf_documents
+
+def parse_int_list(value):
+    return [int(x) for x in value.split(",") if x.strip()]
+
+def load_pages(data_path):
+    """Tüm PDF sayfalarını bir kez okur; her ızgara noktası aynı sayfalarla kurulur."""
+    paths = sorted(os.path.join(data_path, f) for f in os.listdir(data_path) if f.lower().endswith(".pdf"))
+    started = time.perf_counter()
+    pages = list(iter_pdf_documents(paths))
+    print(f"📄 {len(paths)} PDF, {len(pages)} sayfa okundu ({time.perf_counter() - started:.1f} sn)")
+    return pages
+
+def dir_size_mb(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / (1024 * 1024)
+
+def build_index(pages, chunk_size, chunk_overlap, embeddings, work_dir):
+    """Geçici Chroma + BM25 indeksi kurar. (vectorstore, lexical_index, istatistikler) döner."""
+    started = time.perf_counter()
+    splitter = make_splitter(chunk_size, chunk_overlap)
+
+    # Parça id'leri uygulamadaki gibi kaynağa bağlı: 'dosya.pdf::i'
+    chunks, ids, counters = [], [], {}
+    for page in pages:
+        for chunk in splitter.split_documents([page]):
+            source = chunk.metadata["source"]
+            ids.extend(make_chunk_ids(source, 1, start=counters.get(source, 0)))
+            counters[source] = counters.get(source, 0) + 1
+            chunks.append(chunk)
+
+    persist_dir = os.path.join(work_dir, f"chroma_{chunk_size}_{chunk_overlap}")
+    store = Chroma(persist_directory=persist_dir, embedding_function=embeddings, collection_name="eval")
+    lexical = LexicalIndex()
+    for i in range(0, len(chunks), INDEX_WRITE_BATCH_SIZE):
+        batch, batch_ids = chunks[i:i + INDEX_WRITE_BATCH_SIZE], ids[i:i + INDEX_WRITE_BATCH_SIZE]
+        store.add_documents(batch, ids=batch_ids)
+        lexical.add(batch_ids, [c.page_content for c in batch])
+
+    stats = {
+        "chunks": len(chunks),
+        "avg_chunk_chars": round(statistics.mean(len(c.page_content) for c in chunks), 1) if chunks else 0,
+        "build_seconds": round(time.perf_counter() - started, 2),
+        "index_mb": round(dir_size_mb(persist_dir), 2),
+    }
+    return store, lexical, stats
+
+def evaluate(retriever, golden, vectors, repeat):
+    """recall@k, MRR@k ve arama gecikmesini ölçer."""
+    latencies = []
+    hits = 0
+    reciprocal_ranks = []
+    for item, vector in zip(golden, vectors):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            docs = retriever.search(item["question"], vector)
+            latencies.append(time.perf_counter() - started)
+
+        hits += is_hit(docs, item)
+        rank = next((i + 1 for i, doc in enumerate(docs) if is_hit([doc], item)), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+    latencies.sort()
+    return {
+        "recall": round(hits / len(golden), 3),
+        "mrr": round(statistics.mean(reciprocal_ranks), 3),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000, 2),
+    }
+
+def main(args):
+    golden = load_golden_set(args.golden)
+    embeddings = rag_service._load_embeddings()
+    # Soru embedding'leri bir kez hesaplanır; karşılaştırma sadece indeks ve arama maliyetini ölçer
+    vectors = embeddings.embed_documents([item["question"] for item in golden])
+    pages = load_pages(args.data_path)
+
+    grid = [(size, overlap) for size in args.chunk_sizes for overlap in args.overlaps if overlap < size]
+    print(f"🧪 {len(golden)} soru | {len(grid)} parçalama ayarı × k={args.ks} × modlar={args.modes}\n")
+
+    work_dir = tempfile.mkdtemp(prefix="rag_eval_")
+    results = []
+    try:
+        for chunk_size, chunk_overlap in grid:
+            store, lexical, stats = build_index(pages, chunk_size, chunk_overlap, embeddings, work_dir)
+            print(f"🏗️ size={chunk_size} overlap={chunk_overlap}: {stats['chunks']} parça, "
+                  f"{stats['index_mb']} MB, kurulum {stats['build_seconds']} sn")
+
+            for mode in args.modes:
+                for k in args.ks:
+                    retriever = HybridRetriever(
+                        vectorstore=store, k=k, candidates=max(args.candidates, k), mode=mode, lexical_index=lexical
+                    )
+                    metrics = evaluate(retriever, golden, vectors, args.repeat)
+                    results.append({"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "mode": mode, "k": k, **stats, **metrics})
+
+            store.delete_collection()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Sonuçlar kaydedildi: {args.json}")
+
+def print_table(results):
+    header = f"{'size':>5} {'ovl':>4} {'mod':<7} {'k':>2} | {'recall':>6} {'MRR':>5} | {'parça':>6} {'MB':>6} {'kurulum':>8} | {'p50 ms':>7} {'p95 ms':>7}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in results:
+        marker = " *" if (r["chunk_size"], r["chunk_overlap"], r["k"]) == (CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVER_K) else ""
+        print(f"{r['chunk_size']:>5} {r['chunk_overlap']:>4} {r['mode']:<7} {r['k']:>2} | "
+              f"{r['recall']:>6.0%} {r['mrr']:>5.2f} | {r['chunks']:>6} {r['index_mb']:>6.1f} {r['build_seconds']:>7.1f}s | "
+              f"{r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f}{marker}")
+    print("(* = mevcut ayarlar)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parçalama ve k ayarları için kalite / hız değerlendirmesi")
+    parser.add_argument("--chunk-sizes", type=parse_int_list, default=[512, 768, 1024])
+    parser.add_argument("--overlaps", type=parse_int_list, default=[100, 200])
+    parser.add_argument("--ks", type=parse_int_list, default=[2, 4, 6])
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=["dense", "hybrid"])
+    parser.add_argument("--candidates", type=int, default=HYBRID_CANDIDATES, help="Hibrit modda her yöntemden alınan aday sayısı")
+    parser.add_argument("--repeat", type=int, default=3, help="Gecikme ölçümü için her soru tekrar sayısı")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--golden", default=GOLDEN_SET_PATH, help="Altın set JSON dosyası")
+    parser.add_argument("--json", help="Sonuçların yazılacağı JSON dosyası")
+    main(parser.parse_args())
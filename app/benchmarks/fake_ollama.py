@@ -0,0 +1,142 @@
+"""
+Gerçek GPU sunucusu olmadan test için sahte Ollama HTTP sunucusu.
+
+Desteklenen uçlar: POST /api/generate, POST /api/chat, GET /api/tags, GET /api/version
+İlk token gecikmesi (TTFT), token hızı, cevap uzunluğu ve aynı anda kaç üretimin
+yapılabileceği (Ollama'daki OLLAMA_NUM_PARALLEL gibi) ayarlanabilir.
+
+Kullanım:
+    python -m app.benchmarks.fake_ollama --port 11500 --ttft-ms 300 --tokens-per-sec 40 --output-tokens 120 --parallel 1
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("Bu", "konuda", "ilgili", "uygulamaya", "intranet", "üzerinden", "erişebilir",
+         "ve", "adımları", "kılavuzdaki", "sırayla", "takip", "edebilirsiniz.")
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"  # Akış bağlantı kapanınca biter (chunked gerekmez)
+
+    def log_message(self, format, *args):
+        pass  # Her isteği ekrana basma
+
+    def do_GET(self):
+        if self.path.startswith("/api/tags"):
+            self._send_json({"models": [{"name": name} for name in self.server.models]})
+        elif self.path.startswith("/api/version"):
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"status": "Ollama is running"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.startswith("/api/generate"):
+            self._generate(body, chat=False)
+        elif self.path.startswith("/api/chat"):
+            self._generate(body, chat=True)
+        else:
+            self.send_error(404)
+
+    def _generate(self, body, chat):
+        server = self.server
+        model = body.get("model", "fake")
+        prompt = body.get("prompt") or " ".join(m.get("content", "") for m in body.get("messages", []))
+        prompt_tokens = max(1, len(prompt) // 4)
+        output_tokens = server.output_tokens
+        options = body.get("options") or {}
+        if options.get("num_predict") and options["num_predict"] > 0:
+            output_tokens = min(output_tokens, options["num_predict"])
+
+        # Boş prompt: Ollama'da modeli yükleme isteğidir, hemen döner
+        if not prompt.strip():
+            output_tokens = 0
+
+        started = time.perf_counter()
+        stream = body.get("stream", True)
+
+        if stream:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+
+        tokens = []
+        # Gerçek Ollama gibi: Aynı anda en fazla 'parallel' üretim, diğerleri sırada bekler
+        with server.slots:
+            if output_tokens:
+                time.sleep(server.ttft)
+            for i in range(output_tokens):
+                token = WORDS[i % len(WORDS)] + " "
+                tokens.append(token)
+                if stream:
+                    self._write_line(self._chunk(model, token, chat, done=False))
+                if i < output_tokens - 1:
+                    time.sleep(1 / server.tokens_per_sec)
+
+        total_ns = int((time.perf_counter() - started) * 1e9)
+        final = self._chunk(model, "" if stream else "".join(tokens), chat, done=True)
+        final.update({
+            "done_reason": "stop",
+            "total_duration": total_ns,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(server.ttft * 1e9) if output_tokens else 0,
+            "eval_count": output_tokens,
+            "eval_duration": int(max(0, output_tokens - 1) / server.tokens_per_sec * 1e9),
+        })
+        if stream:
+            self._write_line(final)
+        else:
+            self._send_json(final)
+
+    @staticmethod
+    def _chunk(model, text, chat, done):
+        chunk = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": done}
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        return chunk
+
+    def _write_line(self, data):
+        self.wfile.write((json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, data):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def start_fake_ollama(port=11500, ttft_ms=300, tokens_per_sec=40, output_tokens=120, parallel=1, models=("fake-model",)):
+    """Sahte sunucuyu arka plan thread'inde başlatır ve sunucu nesnesini döner (shutdown() ile kapatılır)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.ttft = ttft_ms / 1000
+    server.tokens_per_sec = tokens_per_sec
+    server.output_tokens = output_tokens
+    server.slots = threading.Semaphore(parallel)
+    server.models = list(models)
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sahte Ollama sunucusu")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="İlk token gecikmesi (ms)")
+    parser.add_argument("--tokens-per-sec", type=float, default=40, help="Token üretim hızı")
+    parser.add_argument("--output-tokens", type=int, default=120, help="Cevap uzunluğu (token)")
+    parser.add_argument("--parallel", type=int, default=1, help="Aynı anda yapılabilecek üretim sayısı")
+    args = parser.parse_args()
+    srv = start_fake_ollama(args.port, args.ttft_ms, args.tokens_per_sec, args.output_tokens, args.parallel)
+    print(f"🧪 Sahte Ollama: http://127.0.0.1:{args.port} (Ctrl+C ile durdur)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
@@ -0,0 +1,207 @@
+"""
+Sahte Ollama sunucusu ve küçük bir test korpusu ile /soru-sor yük testi.
+
+1. Geçici bir RAG_DATA_DIR içinde test PDF'leri oluşturur (belgelerim/).
+2. Sahte Ollama'yı başlatır (TTFT ve token hızı ayarlanabilir).
+3. main_chat'i ayrı bir uvicorn sürecinde bu klasör ve sahte Ollama ile açar.
+4. fast / thinking modlarında istenen eşzamanlılıkla istek gönderir.
+5. İstek/sn, p50/p95/p99 gecikme ve /metrics üzerinden aşama bazında ortalama süreleri raporlar.
+
+Kullanım (proje kök dizininden):
+    python -m app.benchmarks.load_test --requests 200 --concurrency 16 --modes fast,thinking
+    python -m app.benchmarks.load_test --stream          # /soru-sor/stream ile ilk token süresi (TTFT)
+"""
+import argparse
+import asyncio
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz  # pymupdf
+import httpx
+
+from app.benchmarks.fake_ollama import start_fake_ollama
+
+FIXTURE_DOCS = {
+    "OKR Kılavuzu.pdf": [
+        "OKR (Objectives and Key Results) hedef yönetim sistemidir. Hedefler çeyreklik olarak OKR uygulamasına girilir.",
+        "Anahtar sonuçlar ölçülebilir olmalıdır. İlerleme her hafta güncellenir ve yöneticiyle gözden geçirilir.",
+    ],
+    "E-PCR Onay Kılavuzu.pdf": [
+        "E-PCR talepleri onay veren kullanıcı ekranından incelenir. Onay için talep açılır ve Onayla butonuna basılır.",
+        "Reddedilen talepler açıklama ile talep sahibine geri gönderilir. Onay geçmişi talep detayında görünür.",
+    ],
+    "Kaizen Kılavuzu.pdf": [
+        "Kaizen önerileri Problem Çözme Teknikleri uygulamasından girilir. Öneri formu kök neden analizi içerir.",
+        "Onaylanan Kaizen önerileri Kazanılmış Dersler sistemine aktarılır ve ekiplerle paylaşılır.",
+    ],
+    "Rollmech.pdf": [
+        "Rollmech rulo şekillendirme makineleri ve otomotiv profilleri üretir. Üretim tesisleri grup şirketlerine hizmet verir.",
+    ],
+}
+
+QUERIES = [
+    "OKR linki nedir",
+    "e-pcr nasıl onaylanır",
+    "Kaizen önerisi nereden girilir",
+    "Rollmech ne üretir",
+    "Reddedilen E-PCR talebi ne olur",
+    "OKR ilerlemesi ne sıklıkla güncellenir",
+]
+
+def build_fixture_corpus(data_dir):
+    """Test PDF'lerini belgelerim/ altına yazar."""
+    docs_dir = os.path.join(data_dir, "belgelerim")
+    os.makedirs(docs_dir, exist_ok=True)
+    for filename, pages in FIXTURE_DOCS.items():
+        pdf = fitz.open()
+        for text in pages:
+            page = pdf.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=11)
+        pdf.save(os.path.join(docs_dir, filename))
+        pdf.close()
+
+def start_chat_server(port, data_dir, ollama_url, with_cache):
+    env = dict(os.environ)
+    env.update({
+        "RAG_DATA_DIR": data_dir,
+        "OLLAMA_BASE_URL": ollama_url,
+        "RAG_SEMANTIC_CACHE": "1" if with_cache else "0",
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main_chat:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+async def wait_until_ready(base_url, timeout=300):
+    """/readyz 200 dönene kadar bekler (/stats açılış sürerken de 200 döner)."""
+    started = time.time()
+    async with httpx.AsyncClient() as client:
+        while time.time() - started < timeout:
+            try:
+                response = await client.get(f"{base_url}/readyz", timeout=2)
+                if response.status_code == 200:
+                    return
+                if response.json().get("startup") == "failed":
+                    raise RuntimeError("Chat API açılamadı (ayrıntı: /healthz).")
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(1)
+    raise TimeoutError("Chat API hazır olmadı.")
+
+def parse_stage_metrics(text):
+    """/metrics çıktısından aşama bazında (toplam, adet) değerlerini çıkarır."""
+    result = {}
+    for kind, stage, mode, value in re.findall(r'rag_stage_seconds_(sum|count)\{stage="([^"]+)",mode="([^"]+)"\} ([0-9.e+-]+)', text):
+        entry = result.setdefault((stage, mode), [0.0, 0])
+        if kind == "sum":
+            entry[0] = float(value)
+        else:
+            entry[1] = int(float(value))
+    return result
+
+async def one_request(client, base_url, mode, query, stream):
+    started = time.perf_counter()
+    ttft = None
+    if stream:
+        async with client.stream("POST", f"{base_url}/soru-sor/stream", json={"query": query, "mode": mode}) as r:
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if line.startswith("data:") and ttft is None:
+                    ttft = time.perf_counter() - started
+    else:
+        r = await client.post(f"{base_url}/soru-sor", json={"query": query, "mode": mode})
+        r.raise_for_status()
+    return time.perf_counter() - started, ttft
+
+async def drive(base_url, total, concurrency, modes, stream):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {mode: {"latency": [], "ttft": [], "errors": 0} for mode in modes}
+
+    async with httpx.AsyncClient(timeout=600) as client:
+        async def worker(i):
+            mode = modes[i % len(modes)]
+            query = f"{QUERIES[i % len(QUERIES)]} ({i})"
+            async with semaphore:
+                try:
+                    latency, ttft = await one_request(client, base_url, mode, query, stream)
+                    results[mode]["latency"].append(latency)
+                    if ttft is not None:
+                        results[mode]["ttft"].append(ttft)
+                except Exception as e:
+                    results[mode]["errors"] += 1
+                    print(f"❌ {mode}: {e}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+def report(results, elapsed, before, after):
+    total = sum(len(r["latency"]) for r in results.values())
+    errors = sum(r["errors"] for r in results.values())
+    print("\n" + "=" * 60)
+    print(f"Toplam: {total} başarılı, {errors} hatalı istek | {elapsed:.1f} sn | {total / elapsed:.2f} istek/sn")
+    for mode, r in results.items():
+        lat = [x * 1000 for x in r["latency"]]
+        print(f"  {mode:<9} p50 {percentile(lat, 50):8.0f} ms | p95 {percentile(lat, 95):8.0f} ms | p99 {percentile(lat, 99):8.0f} ms")
+        if r["ttft"]:
+            ttft = [x * 1000 for x in r["ttft"]]
+            print(f"  {'':<9} TTFT p50 {percentile(ttft, 50):6.0f} ms | p95 {percentile(ttft, 95):6.0f} ms")
+
+    print("\nAşama bazında ortalama (ms):")
+    for (stage, mode), (total_s, count) in sorted(after.items()):
+        prev_s, prev_count = before.get((stage, mode), (0.0, 0))
+        n = count - prev_count
+        if n > 0:
+            print(f"  {stage:<20} {mode:<9} {(total_s - prev_s) / n * 1000:9.1f}  (n={n})")
+    print("=" * 60)
+
+async def main(args):
+    data_dir = tempfile.mkdtemp(prefix="rag_bench_")
+    build_fixture_corpus(data_dir)
+    ollama = start_fake_ollama(args.ollama_port, args.ttft_ms, args.tokens_per_sec, args.output_tokens, args.ollama_parallel)
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start_chat_server(args.port, data_dir, f"http://127.0.0.1:{args.ollama_port}", args.with_cache)
+    try:
+        print("⏳ Chat API başlatılıyor (embedding modeli + test korpusu)...")
+        await wait_until_ready(base_url)
+        async with httpx.AsyncClient() as client:
+            before = parse_stage_metrics((await client.get(f"{base_url}/metrics")).text)
+        modes = args.modes.split(",")
+        print(f"🚀 {args.requests} istek, eşzamanlılık {args.concurrency}, modlar {modes}, stream={args.stream}")
+        results, elapsed = await drive(base_url, args.requests, args.concurrency, modes, args.stream)
+        async with httpx.AsyncClient() as client:
+            after = parse_stage_metrics((await client.get(f"{base_url}/metrics")).text)
+        report(results, elapsed, before, after)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        ollama.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sahte Ollama ile /soru-sor yük testi")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--modes", default="fast,thinking", help="Virgülle ayrılmış modlar")
+    parser.add_argument("--stream", action="store_true", help="/soru-sor/stream kullan ve TTFT ölç")
+    parser.add_argument("--with-cache", action="store_true", help="Semantik önbellek açık kalsın")
+    parser.add_argument("--port", type=int, default=8100, help="Test edilen Chat API portu")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-sec", type=float, default=40)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    parser.add_argument("--ollama-parallel", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
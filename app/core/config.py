@@ -12,11 +12,18 @@ RAW_COOKIE = """BURAYA_KOPYALADIGINIZ_UZUN_COOKIE_YAZISI"""
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+# Belgeler, vektör veritabanı ve loglar başka bir klasöre yönlendirilebilir
+# (Örn: Yük testinde küçük bir test korpusu kullanmak için RAG_DATA_DIR=/tmp/rag_bench)
+DATA_DIR = Path(os.getenv("RAG_DATA_DIR", str(BASE_DIR)))
+
 # Klasörler (String formatında)
 CHAT_MODEL = "gemma2:9b" 
-DATA_PATH = str(BASE_DIR / "belgelerim")         # Canlı (Yayındaki) Belgeler
-STAGING_PATH = str(BASE_DIR / "taslak_belgeler") # Yönetici onayını bekleyen belgeler
-CHROMA_PATH = str(BASE_DIR / "chroma_db_text")   # Vektör Veritabanı
+DATA_PATH = str(DATA_DIR / "belgelerim")         # Canlı (Yayındaki) Belgeler
+STAGING_PATH = str(DATA_DIR / "taslak_belgeler") # Yönetici onayını bekleyen belgeler
+CHROMA_PATH = str(DATA_DIR / "chroma_db_text")   # Vektör Veritabanı
+INDEX_MANIFEST_PATH = str(DATA_DIR / "chroma_db_text_manifest.json") # İndekslenen dosyaların listesi (hash, parça id'leri)
+LEXICAL_INDEX_PATH = str(DATA_DIR / "chroma_db_text_bm25.json")      # Kelime (BM25) indeksi
+CORPUS_VERSION_PATH = str(DATA_DIR / "chroma_db_text_version.json")  # Korpus / ayar sürüm damgası (Admin yazar, Chat okur)
 LOCAL_EMBEDDING_PATH = str(BASE_DIR / "local_models" / "bge-m3") # Embedding Modeli
 SETTINGS_FILE_PATH = str(BASE_DIR / "settings.json") # <-- YENİ
 USERS_JSON_PATH = str(BASE_DIR / "users.json") 
@@ -24,8 +31,12 @@ PROMPT_FAST_PATH = str(BASE_DIR / "prompt_fast.txt")       # Hızlı Mod
 PROMPT_THINKING_PATH = str(BASE_DIR / "prompt_thinking.txt") # Düşünen Mod
 
 # Veritabanı Dosyaları (Loglar)
-LOG_DB_PATH = str(BASE_DIR / "chat_history.db")      # Sohbet kayıtları
-ADMIN_LOG_DB_PATH = str(BASE_DIR / "admin_logs.db")  # Yönetici işlem kayıtları
+LOG_DB_PATH = str(DATA_DIR / "chat_history.db")      # Sohbet kayıtları
+ADMIN_LOG_DB_PATH = str(DATA_DIR / "admin_logs.db")  # Yönetici işlem kayıtları
+JOBS_DB_PATH = str(DATA_DIR / "admin_jobs.db")       # Arka plan işleri (belge işleme kuyruğu)
+
+# --- OLLAMA ---
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 
 # --- 4. KLASÖR KONTROLÜ ---
 # Gerekli klasörler yoksa otomatik oluştur.
@@ -52,4 +63,159 @@ APP_LINKS = {
     "mikado": "http://10.90.2.200:8082/mikado/",
     "polivalans raporu": "http://bz-srv-tia/Reports/powerbi/Polivalans?rs:embed=true",
     "polivalans": "https://polivalans.bize360.com/"
-}
\ No newline at end of file
+}
+
+# --- 6. SEMANTİK CEVAP ÖNBELLEĞİ ---
+# Benzer sorular (embedding benzerliği eşiğin üzerinde) Ollama'ya gitmeden önbellekten cevaplanır.
+SEMANTIC_CACHE_ENABLED = os.getenv("RAG_SEMANTIC_CACHE", "1") != "0"  # Yük testinde kapatılabilir
+SEMANTIC_CACHE_MAX_ENTRIES = 256       # En fazla kayıt sayısı (LRU)
+SEMANTIC_CACHE_TTL_SECONDS = 6 * 3600  # Kayıt ömrü (saniye)
+SEMANTIC_CACHE_THRESHOLDS = {          # Mod bazında kosinüs benzerliği eşiği
+    "fast": 0.95,
+    "thinking": 0.97,
+}
+
+# --- 7. SORGU EMBEDDING BATCH'LEME ---
+# Aynı anda gelen sorgular bu süre kadar beklenip tek seferde encode edilir.
+EMBED_BATCH_MAX_SIZE = 32     # Bir batch'teki en fazla sorgu
+EMBED_BATCH_MAX_WAIT_MS = 5   # İlk sorgudan sonra en fazla bekleme (ms)
+
+# --- 8. PARALEL PDF OKUMA ---
+# Soğuk (sıfırdan) veritabanı oluşturulurken PDF'ler süreç havuzunda okunur.
+PDF_INGEST_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # 1 = sıralı okuma
+PDF_PAGES_PER_TASK = 25  # Büyük dosyalar bu sayfa aralıklarına bölünür
+
+# --- 9. İNDEKS SENKRONİZASYONU ---
+CHUNK_SIZE = 1024            # Parça uzunluğu (karakter)
+CHUNK_OVERLAP = 200          # Parçalar arası örtüşme (karakter)
+INDEX_WRITE_BATCH_SIZE = 256 # Chroma'ya tek seferde yazılan parça sayısı
+INDEX_SYNC_ON_STARTUP = True # Admin API açılırken 'belgelerim' ile Chroma eşitlensin mi?
+
+# --- 10. ARAMA (RETRIEVAL) ---
+RETRIEVER_K = 4              # Prompta giren parça sayısı
+RETRIEVAL_MODE = "hybrid"    # "hybrid" (BM25 + yoğun) veya "dense" (sadece yoğun)
+HYBRID_CANDIDATES = 10       # Her yöntemden alınan aday sayısı
+HYBRID_RRF_K = 60            # Reciprocal Rank Fusion sabiti
+LEXICAL_STEM_LENGTH = 5      # Türkçe kökleme: kelimenin ilk N karakteri
+
+# --- 11. SOHBET LOG YAZICISI ---
+# Sohbet logları kuyruğa alınır ve tek bağlantı üzerinden toplu (batch) yazılır.
+LOG_BATCH_SIZE = 50              # Bu kadar kayıt birikince yaz
+LOG_FLUSH_INTERVAL_SECONDS = 1.0 # ... veya en geç bu süre dolunca yaz
+LOG_QUEUE_MAX = 10000            # Kuyruk sınırı (dolarsa kayıt düşürülür)
+
+# --- 12. METRİKLER ---
+METRICS_PERSIST_PER_REQUEST = True  # Aşama sürelerini sohbet log kaydının yanına (timings sütunu) yaz
+
+# --- 13. ÜRETİM KUYRUĞU (Kabul kontrolü) ---
+# Ollama istekleri kendi içinde sıraya alır; sıralama ve yük atma burada yapılır.
+# Sınır Chat API işçisi (uvicorn --workers / WEB_CONCURRENCY) başınadır; toplam, işçi sayısına bölünür.
+_OLLAMA_SLOTS = int(os.getenv("OLLAMA_NUM_PARALLEL", "1")) + 1  # +1: Bir istek retrieval yaparken GPU boş kalmasın
+_CHAT_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+GENERATION_MAX_IN_FLIGHT = (_OLLAMA_SLOTS + _CHAT_WORKERS - 1) // _CHAT_WORKERS  # Yukarı yuvarlanır
+GENERATION_MAX_QUEUE = 40                 # Toplam bekleyen istek sınırı (aşılırsa 503)
+GENERATION_MAX_QUEUED_PER_IP = 3          # Tek IP'nin bekleyen istek sınırı (aşılırsa 429)
+GENERATION_QUEUE_TIMEOUT_SECONDS = 120    # Kuyrukta en fazla bekleme (aşılırsa 503)
+GENERATION_PRIORITIES = {                 # Küçük sayı = yüksek öncelik
+    "fast": 0,
+    "thinking": 1,
+}
+GENERATION_PRIORITY_AGING_SECONDS = 20    # Bu kadar bekleyen düşük öncelikli istek öne alınır
+
+# --- 14. MODEL ISINDIRMA (Warm-up) ---
+# Seçili model açılışta / model değişiminde bir deneme üretimiyle belleğe yüklenir,
+# keep_alive ile bellekte tutulur; önceki model bellekten boşaltılır.
+MODEL_WARMUP_ENABLED = True
+_keep_alive = os.getenv("RAG_MODEL_KEEP_ALIVE", "-1")   # -1 = süresiz, "30m" = 30 dakika
+MODEL_KEEP_ALIVE = int(_keep_alive) if _keep_alive.lstrip("-").isdigit() else _keep_alive
+MODEL_WARMUP_TIMEOUT_SECONDS = 300   # Büyük modellerin ilk yüklenmesi uzun sürebilir
+MODEL_UNLOAD_PREVIOUS = True         # Model değişince eskisi Ollama'dan boşaltılsın mı?
+MODEL_WARMUP_RETRY_SECONDS = 5       # Isındırma başarısızsa ilk tekrar deneme aralığı (her denemede iki katı)
+MODEL_WARMUP_RETRY_MAX_SECONDS = 300 # En uzun tekrar deneme aralığı
+
+# --- 15. BAĞLAM BÜTÇESİ (num_ctx) ---
+# Soru + prompt şablonu + bağlam + cevap, modelin bağlam penceresine sığmalı;
+# sığmayan kısmı Ollama sessizce keser.
+LLM_NUM_CTX = 4096                  # Ollama num_ctx (LLM ve ısındırma aynı değeri kullanır)
+CONTEXT_OUTPUT_RESERVE = {          # Mod bazında cevap için ayrılan token
+    "fast": 512,
+    "thinking": 1280,
+}
+CONTEXT_TOKEN_SAFETY_FACTOR = 1.15  # Embedding tokenizer'ı ile sohbet modeli tokenizer'ı farkı için pay
+CONTEXT_MIN_CHUNK_TOKENS = 48       # Bundan az yer kaldıysa son parça kesilmez, atılır
+CONTEXT_DUPLICATE_THRESHOLD = 0.85  # Bu benzerliğin (kelime kümesi Jaccard) üzerindeki parçalar tekrar sayılır
+
+# --- 16. PROMPT DÜZENİ (Ollama KV önbelleği) ---
+# "prefix_stable": Sabit talimatlar -> bağlam -> soru. Ollama, istekler arasında ortak olan
+# başlangıcı (talimatları) tekrar hesaplamaz. "as_is": Şablon dosyadaki haliyle kullanılır.
+PROMPT_LAYOUT = "prefix_stable"
+
+# --- 17. SOHBET HAFIZASI (Çok turlu konuşma) ---
+# Son turlar aynen, daha eskileri sunucuda tutulan kısa bir özet olarak prompta girer.
+MEMORY_ENABLED = True
+MEMORY_MAX_TOKENS = 600             # Özet + son turların toplam bütçesi (bağlam bütçesinden düşülür)
+MEMORY_SUMMARY_MAX_TOKENS = 250     # Özetin en fazla uzunluğu
+MEMORY_RECENT_MESSAGES = 4          # Aynen tutulan son mesaj sayısı (2 soru + 2 cevap)
+MEMORY_MESSAGE_MAX_TOKENS = 150     # Tek bir mesajın hafızada kaplayabileceği en fazla token
+MEMORY_REWRITE_ENABLED = True       # Takip sorusu, arama için bağımsız bir soruya çevrilsin mi?
+MEMORY_LLM_MAX_OUTPUT_TOKENS = 160  # Soru yeniden yazma / özetleme çıktı sınırı
+MEMORY_CACHE_MAX_CONVERSATIONS = 1000
+MEMORY_CACHE_TTL_SECONDS = 12 * 3600
+
+# --- 18. ADMIN OTURUMLARI ---
+# Girişte kısa ömürlü, imzalı bir oturum anahtarı verilir; sonraki istekler
+# 'Authorization: Bearer <anahtar>' ile yapılır. Anahtar verilmezse her açılışta yenisi üretilir.
+ADMIN_SESSION_SECRET = os.getenv("ADMIN_SESSION_SECRET", "")
+ADMIN_SESSION_TTL_SECONDS = 2 * 3600   # Oturum süresi
+# Eski betikler için her istekte form alanlarıyla kullanıcı adı / şifre kabul edilsin mi?
+# Her istek tam PBKDF2 maliyeti ödediğinden varsayılan kapalıdır (admin.html anahtar kullanır).
+ADMIN_ALLOW_FORM_CREDENTIALS = os.getenv("ADMIN_ALLOW_FORM_CREDENTIALS", "0") == "1"
+
+# --- 19. AYAR DEPOSU (Dosya izleyici) ---
+# settings.json, prompt dosyaları ve users.json bir kez okunur, bellekte tutulur.
+# İzleyici dosyaların değişme zamanına bu aralıkla bakar; değişen dosya tekrar okunur.
+CONFIG_WATCH_INTERVAL_SECONDS = 2
+# Ollama'daki model listesi (Admin paneli) bu süre önbellekte tutulur
+MODEL_LIST_CACHE_TTL_SECONDS = 60
+MODEL_LIST_TIMEOUT_SECONDS = 2
+
+# --- 20. ARKA PLAN İŞLERİ (Admin belge işleme kuyruğu) ---
+# Belge işleme / indeks senkronizasyonu SQLite'taki kalıcı bir kuyruğa yazılır.
+# Aynı anda en fazla JOB_WORKERS iş çalışır (embedding modeli tek, işler onu paylaşır).
+JOB_WORKERS = 1
+JOB_MAX_ATTEMPTS = 3            # Hata alan iş en fazla bu kadar denenir
+JOB_RETRY_DELAY_SECONDS = 30    # Tekrar denemeden önce bekleme (deneme sayısıyla çarpılır)
+JOB_POLL_SECONDS = 2            # İşçiler kuyruğa en geç bu aralıkla bakar
+JOB_PROGRESS_SAVE_SECONDS = 1.0 # İlerleme bilgisi veritabanına en fazla bu sıklıkla yazılır
+
+# --- 21. RETRIEVAL SUNUCUSU (Çok işçili sohbet) ---
+# "local" : Her süreç embedding modelini ve Chroma'yı kendisi yükler (varsayılan, tek işçi).
+# "remote": Embedding modeli, Chroma ve BM25 indeksi tek bir retrieval sunucusunda tutulur
+#           (python -m app.services.retrieval_server). Chat işçileri sorgu embedding'i ve aramayı
+#           yerel soket üzerinden sunucuya yaptırır; Admin API Chroma'ya yazar ama modeli yüklemez.
+RETRIEVAL_BACKEND = os.getenv("RAG_RETRIEVAL_BACKEND", "local")
+# Bağlantı pickle kullanır: authkey'i bilen süreç sunucuda kod çalıştırabilir.
+# Bu yüzden varsayılan adres sadece sahibinin erişebildiği (0600) bir unix soketidir;
+# unix soketi olmayan Windows'ta sadece 127.0.0.1 dinlenir.
+_default_retrieval_address = str(DATA_DIR / "retrieval.sock") if os.name == "posix" else "127.0.0.1:8765"
+RETRIEVAL_SERVER_ADDRESS = os.getenv("RAG_RETRIEVAL_ADDRESS", _default_retrieval_address)  # Unix soket yolu veya "host:port"
+# Ortak anahtar: RAG_RETRIEVAL_AUTHKEY verilmezse sunucu ilk açılışta rastgele bir anahtar üretip
+# bu dosyaya (izinler 0600) yazar; aynı kullanıcıyla çalışan işçiler anahtarı buradan okur.
+_retrieval_authkey = os.getenv("RAG_RETRIEVAL_AUTHKEY")
+RETRIEVAL_SERVER_AUTHKEY = _retrieval_authkey.encode("utf-8") if _retrieval_authkey else None
+RETRIEVAL_AUTHKEY_PATH = str(DATA_DIR / "retrieval_authkey")
+RETRIEVAL_CLIENT_POOL_SIZE = 8           # İşçi başına açık bağlantı sınırı
+RETRIEVAL_CLIENT_TIMEOUT_SECONDS = 30    # Tek isteğin en fazla bekleme süresi
+RETRIEVAL_CONNECT_WAIT_SECONDS = 120     # Açılışta sunucunun hazır olmasını bekleme süresi
+
+# --- 22. SÜRÜM DAMGASI (Admin -> Chat bildirimi) ---
+# Admin API belge yayınlayınca / kaldırınca / prompt-model değiştirince damgadaki sayacı artırır.
+# Her Chat işçisi ve retrieval sunucusu damgaya istek başında (en fazla bu aralıkla) bakar ve
+# sadece değişen kısmı yeniler ("corpus": Chroma görünümü + cevap önbelleği, "config": ayarlar).
+CORPUS_VERSION_CHECK_SECONDS = 1.0
+
+# --- 23. AÇILIŞ (Arka planda yükleme) ---
+# Sunucu hemen istek kabul eder; embedding modeli, Chroma ve model ısındırma arka planda yüklenir.
+# Durum /healthz (süreç ayakta mı) ve /readyz (cevap vermeye hazır mı) ile izlenir.
+# RAG_STARTUP_BACKGROUND=0 ise eski davranış: Lifespan her şey yüklenene kadar bekler.
+STARTUP_BACKGROUND_INIT = os.getenv("RAG_STARTUP_BACKGROUND", "1") != "0"
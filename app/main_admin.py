@@ -1,42 +1,72 @@
-from fastapi import FastAPI, BackgroundTasks, UploadFile, File, Form, HTTPException
+# Açılış süresi ölçümü ilk importla başlar (startup_service hafiftir)
+from app.services.startup_service import run_startup, mark_imports_done, get_startup_state, is_started
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import os
 import shutil
-import requests
 from datetime import datetime
+from typing import Optional
 
 # Servisler ve Ayarlar
-from app.services.rag_service import ingest_new_file, initialize_rag
-from app.services.auth_service import verify_user
-from app.services.logging_service import log_admin_action, get_admin_logs
+from app.services.rag_service import (
+    ingest_new_file, initialize_rag, sync_with_data_folder,
+    remove_file_from_index, clean_index
+)
+from app.services.auth_service import verify_user, create_session_token, require_admin
+from app.services.logging_service import (
+    init_db, log_admin_action, get_admin_logs, query_conversations, get_conversation_summary
+)
 from app.services.settings_service import get_current_model, set_current_model, get_available_models
+from app.services.config_store import config_store
+from app.services.corpus_version import bump_version
+from app.services.metrics_service import render_prometheus, register_gauge
+from app.services.job_queue import job_queue
 
 # Config'den gerekli tüm yolları import ediyoruz
 from app.core.config import (
+    ADMIN_SESSION_TTL_SECONDS,
     DATA_PATH, 
     STAGING_PATH, 
-    PROMPT_FAST_PATH, 
-    PROMPT_THINKING_PATH,
-    # Eski uyumluluk için gerekirse kalsın
+    INDEX_SYNC_ON_STARTUP,
+    STARTUP_BACKGROUND_INIT,
 )
 
 ADMIN_HTML_PATH = "admin.html"
-CHAT_API_URL = "http://localhost:8000/refresh-db"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Admin API açılırken RAG sistemini başlatır.
-    Dosya işlemek ve veritabanına yazmak için gereklidir.
+    Admin API açılırken RAG sistemini (arka planda) başlatır.
+    Dosya işlemek ve veritabanına yazmak için gereklidir; yükleme bitmeden başlayan işler onu bekler.
+    Ayar dosyaları (model, promptlar, kullanıcılar) bellekte tutulur ve değişiklikleri izlenir.
     """
     print("🔧 Admin Paneli başlatılıyor...")
-    initialize_rag()
+    mark_imports_done()
+    init_db()
+    config_store.start_watcher()
+    run_startup(lambda: initialize_rag(writable=True), background=STARTUP_BACKGROUND_INIT)
+
+    # Belge işleme kuyruğu (yarım kalan işler kaldığı yerden tekrar alınır)
+    job_queue.register("ingest", run_ingest_job, on_cancel=rollback_ingest)
+    job_queue.register("sync", run_sync_job)
+    job_queue.init_db()
+    job_queue.start()
+    
+    # 'belgelerim' ile Chroma'yı eşitle (sadece yeni/değişen/silinen dosyalar), açılışı bekletmeden
+    if INDEX_SYNC_ON_STARTUP:
+        job_queue.submit("sync", created_by="system", unique=True)
     yield
+    job_queue.stop()
+    config_store.stop_watcher()
 
 app = FastAPI(title="Admin API (Yönetim)", version="5.0", lifespan=lifespan)
 
+# /metrics için iş kuyruğu göstergeleri
+register_gauge("rag_jobs_queued", "Sırada bekleyen belge işleme işi", lambda: job_queue.stats()["queued"])
+register_gauge("rag_jobs_running", "Çalışan belge işleme işi", lambda: job_queue.stats()["running"])
+
 # CORS Ayarları
 app.add_middleware(
     CORSMiddleware,
@@ -57,10 +87,37 @@ async def admin_root():
         return FileResponse(ADMIN_HTML_PATH)
     return {"error": "admin.html dosyası bulunamadı."}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus formatında metrikler (belge işleme süreleri vb.)"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz():
+    """Süreç ayakta mı? Açılış hata ile bittiyse 503 döner."""
+    startup = get_startup_state()
+    alive = startup["status"] != "failed"
+    return JSONResponse(status_code=200 if alive else 503, content={"alive": alive, "startup": startup})
+
+@app.get("/readyz")
+async def readyz():
+    """RAG sistemi yüklendi ve iş kuyruğu çalışıyorsa 200, değilse 503 döner."""
+    ready = is_started() and job_queue.stats()["workers_alive"]
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "startup": get_startup_state()})
+
 @app.post("/api/login")
 def login(username: str = Form(...), password: str = Form(...)):
+    """
+    Kullanıcı adı / şifreyi doğrular ve kısa ömürlü bir oturum anahtarı döner.
+    Diğer endpoint'ler bu anahtarı 'Authorization: Bearer <token>' başlığıyla bekler.
+    """
     if verify_user(username, password):
-        return {"status": "success", "message": "Giriş başarılı"}
+        return {
+            "status": "success",
+            "message": "Giriş başarılı",
+            "token": create_session_token(username),
+            "expires_in": ADMIN_SESSION_TTL_SECONDS,
+        }
     raise HTTPException(status_code=401, detail="Kullanıcı adı veya şifre hatalı")
 
 # ==========================================================
@@ -68,12 +125,43 @@ def login(username: str = Form(...), password: str = Form(...)):
 # ==========================================================
 
 @app.post("/api/logs")
-def list_logs(username: str = Form(...), password: str = Form(...)):
+def list_logs(username: str = Depends(require_admin)):
     """Son yönetici işlemlerini listeler"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401)
     return get_admin_logs(limit=100)
 
+@app.post("/api/analytics/conversations")
+def list_conversations(
+    username: str = Depends(require_admin),
+    limit: int = Form(50),
+    before_id: Optional[int] = Form(None),
+    since: Optional[str] = Form(None),
+    until: Optional[str] = Form(None),
+    ip_address: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    include_response: bool = Form(False)
+):
+    """
+    Sohbet kayıtlarını sayfalı listeler.
+    Sonraki sayfa için dönen 'next_cursor' değeri 'before_id' olarak gönderilir.
+    """
+    return query_conversations(
+        limit=limit, before_id=before_id, since=since, until=until,
+        ip_address=ip_address, model=model, include_response=include_response
+    )
+
+@app.post("/api/analytics/summary")
+def conversation_summary(
+    username: str = Depends(require_admin),
+    since: Optional[str] = Form(None),
+    until: Optional[str] = Form(None),
+    top_n: int = Form(10)
+):
+    """
+    Saatlik / mod / model bazında soru sayıları ve en çok sorulan sorular.
+    since / until sadece saatlik / mod / model sayılarına uygulanır; en çok sorulanlar tüm zamanları kapsar.
+    """
+    return get_conversation_summary(since=since, until=until, top_n=top_n)
+
 # ==========================================================
 # 3. PROMPT YÖNETİMİ (ÇİFT MODLU)
 # ==========================================================
@@ -81,60 +169,28 @@ def list_logs(username: str = Form(...), password: str = Form(...)):
 @app.post("/api/get-prompt")
 def get_prompt(
     prompt_type: str = Form(...), # 'fast' veya 'thinking'
-    username: str = Form(...), 
-    password: str = Form(...)
+    username: str = Depends(require_admin)
 ):
-    """Seçilen modun prompt dosyasını okur"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401)
-    
-    # Hangi dosyaya bakılacağını seç
-    if prompt_type == "thinking":
-        target_file = PROMPT_THINKING_PATH
-    else:
-        target_file = PROMPT_FAST_PATH # Varsayılan fast
-    
-    if os.path.exists(target_file):
-        try:
-            with open(target_file, "r", encoding="utf-8") as f:
-                return {"content": f.read()}
-        except Exception as e:
-            return JSONResponse(status_code=500, content={"detail": str(e)})
-            
-    return {"content": "Bu mod için henüz bir prompt dosyası oluşturulmamış."}
+    """Seçilen modun promptunu döner (ayar deposundaki güncel sürüm)"""
+    return {"content": config_store.snapshot().prompt(prompt_type)}
 
 @app.post("/api/save-prompt")
 def save_prompt(
     content: str = Form(...),
     prompt_type: str = Form(...), 
-    username: str = Form(...), 
-    password: str = Form(...)
+    username: str = Depends(require_admin)
 ):
-    """Seçilen modun prompt dosyasını kaydeder ve Chatbot'u yeniler"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401)
-    
-    # Hedef dosyayı belirle
-    if prompt_type == "thinking":
-        target_file = PROMPT_THINKING_PATH
-    else:
-        target_file = PROMPT_FAST_PATH
-        
+    """
+    Seçilen modun prompt dosyasını kaydeder.
+    Sürüm damgası artırılır; her Chat işçisi yeni promptu bir sonraki istekte alır ve kendini yeniler.
+    """
+    prompt_type = "thinking" if prompt_type == "thinking" else "fast"
     log_action = f"update_prompt_{prompt_type}"
 
     try:
-        # 1. Dosyaya Yaz
-        with open(target_file, "w", encoding="utf-8") as f:
-            f.write(content)
-            
-        log_admin_action(log_action, os.path.basename(target_file), username)
-        
-        # 2. Chatbot'u Dürt (Yenile)
-        try:
-            requests.post(CHAT_API_URL, timeout=5)
-        except:
-            print("⚠️ Chatbot yenilenemedi (Kapalı olabilir).")
-
+        config_store.save_prompt(prompt_type, content)
+        bump_version("config", f"prompt_{prompt_type}")
+        log_admin_action(log_action, f"prompt_{prompt_type}.txt", username)
         return {"message": f"{prompt_type.upper()} Prompt başarıyla güncellendi."}
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": str(e)})
@@ -144,40 +200,29 @@ def save_prompt(
 # ==========================================================
 
 @app.post("/api/get-model-info")
-def get_model_info(username: str = Form(...), password: str = Form(...)):
-    """Mevcut modeli ve yüklü model listesini döner"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401)
+async def get_model_info(username: str = Depends(require_admin)):
+    """Mevcut modeli ve yüklü model listesini (önbellekten) döner"""
     
     return {
         "current_model": get_current_model(),
-        "available_models": get_available_models()
+        "available_models": await get_available_models()
     }
 
 @app.post("/api/set-model")
 def update_model(
     model_name: str = Form(...),
-    username: str = Form(...), 
-    password: str = Form(...)
+    username: str = Depends(require_admin)
 ):
-    """Modeli değiştirir ve sistemi yeniler"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401)
+    """
+    Modeli değiştirir. Ayar deposu değişikliği yayınlar:
+    - Admin tarafındaki RAG servisi hemen yenilenir (Sadece LLM ve zincirler).
+    - Chat işçileri sürüm damgasıyla değişikliği alır, yeni modeli arka planda ısındırır.
+    """
     
-    # 1. Ayarı Kaydet
     if set_current_model(model_name):
+        bump_version("config", f"model: {model_name}")
         log_admin_action("change_model", model_name, username)
-        
-        # 2. Chatbot'u Yenile
-        try:
-            requests.post(CHAT_API_URL, timeout=10)
-        except:
-            print("Chatbot yenilenemedi.")
-            
-        # 3. Admin tarafındaki RAG servisini de yenile
-        initialize_rag()
-        
-        return {"message": f"Model '{model_name}' olarak güncellendi."}
+        return {"message": f"Model '{model_name}' olarak güncellendi. Model yüklenene kadar önceki model cevap vermeye devam eder."}
     
     return JSONResponse(status_code=500, content={"detail": "Model kaydedilemedi."})
 
@@ -186,10 +231,8 @@ def update_model(
 # ==========================================================
 
 @app.post("/api/list-files")
-def list_staging_files(username: str = Form(...), password: str = Form(...)):
+def list_staging_files(username: str = Depends(require_admin)):
     """Taslak klasöründeki dosyaları listeler"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401, detail="Yetkisiz erişim")
     
     files = []
     if os.path.exists(STAGING_PATH):
@@ -199,12 +242,9 @@ def list_staging_files(username: str = Form(...), password: str = Form(...)):
 @app.post("/api/upload")
 def upload_staging(
     file: UploadFile = File(...), 
-    username: str = Form(...), 
-    password: str = Form(...)
+    username: str = Depends(require_admin)
 ):
     """Dosyaya zaman damgası ekleyerek taslağa kaydeder"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401, detail="Yetkisiz erişim")
     
     try:
         if not os.path.exists(STAGING_PATH):
@@ -228,12 +268,9 @@ def upload_staging(
 @app.post("/api/delete")
 def delete_staging_file(
     filename: str = Form(...), 
-    username: str = Form(...), 
-    password: str = Form(...)
+    username: str = Depends(require_admin)
 ):
     """Taslak klasöründen dosya siler (Kalıcı silme)"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401, detail="Yetkisiz erişim")
     
     file_path = os.path.join(STAGING_PATH, filename)
     if os.path.exists(file_path):
@@ -248,10 +285,8 @@ def delete_staging_file(
 # ==========================================================
 
 @app.post("/api/list-production-files")
-def list_production_files(username: str = Form(...), password: str = Form(...)):
+def list_production_files(username: str = Depends(require_admin)):
     """Canlı 'belgelerim' klasörünü listeler"""
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401, detail="Yetkisiz erişim")
     
     files = []
     if os.path.exists(DATA_PATH):
@@ -261,15 +296,12 @@ def list_production_files(username: str = Form(...), password: str = Form(...)):
 @app.post("/api/delete-production")
 def unpublish_file(
     filename: str = Form(...), 
-    username: str = Form(...), 
-    password: str = Form(...)
+    username: str = Depends(require_admin)
 ):
     """
     Canlı dosyayı SİLMEZ, TASLAK (Staging) klasörüne geri taşır.
     (Yayından kaldırma / Unpublish işlemi)
     """
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401, detail="Yetkisiz erişim")
     
     prod_file = os.path.join(DATA_PATH, filename)
     staging_target = os.path.join(STAGING_PATH, filename)
@@ -279,13 +311,13 @@ def unpublish_file(
             # SİLME YERİNE TAŞIMA
             shutil.move(prod_file, staging_target)
             
+            # Parçaları vektör veritabanından da sil (Yoksa aramada çıkmaya devam eder)
+            remove_file_from_index(filename)
+            
             log_admin_action("unpublish", filename, username)
             
-            # Chatbot'un (Port 8000) veritabanını yenilemesi için sinyal gönderiyoruz.
-            try:
-                requests.post(CHAT_API_URL, timeout=2)
-            except:
-                pass
+            # Chat işçileri korpus sürümünün değiştiğini bir sonraki istekte görür
+            bump_version("corpus", f"unpublish: {filename}")
                 
             return {"message": f"'{filename}' yayından kaldırıldı ve taslağa taşındı."}
         except Exception as e:
@@ -299,18 +331,15 @@ def unpublish_file(
 
 @app.post("/api/process")
 def process_file(
-    background_tasks: BackgroundTasks,
     filename: str = Form(...), 
-    username: str = Form(...), 
-    password: str = Form(...)
+    username: str = Depends(require_admin)
 ):
     """
     1. Dosyayı Taslak -> Canlı (belgelerim) klasörüne taşır.
-    2. Veritabanına işler (Ingest).
-    3. Chat API'ye 'Yenilen' sinyali gönderir.
+    2. Veritabanına işleme (Ingest) işini kuyruğa ekler.
+    3. İş bitince korpus sürümü artırılır (Chat işçileri aramayı yeniler).
+    İlerleme /api/jobs/{job_id} ile izlenir.
     """
-    if not verify_user(username, password): 
-        raise HTTPException(status_code=401, detail="Yetkisiz erişim")
 
     staging_file = os.path.join(STAGING_PATH, filename)
     prod_file = os.path.join(DATA_PATH, filename)
@@ -324,24 +353,133 @@ def process_file(
         
         log_admin_action("process", filename, username)
 
-        # B. Arkaplanda işlemleri başlat (Kullanıcıyı bekletmemek için)
-        background_tasks.add_task(ingest_and_notify, prod_file)
+        # B. İşi kuyruğa ekle (Kullanıcıyı bekletmemek için)
+        job = job_queue.submit("ingest", {"filename": filename}, created_by=username)
 
-        return {"message": f"'{filename}' onaylandı. İşleniyor..."}
+        return {"message": f"'{filename}' onaylandı. İşleniyor...", "job_id": job["id"]}
     except Exception as e: 
         return JSONResponse(status_code=500, content={"detail": str(e)})
 
-def ingest_and_notify(file_path):
+def run_ingest_job(payload, ctx):
+    """İş kuyruğu işleyicisi: Canlıya alınan dosyayı indeksler ve korpus sürümünü artırır."""
+    file_path = os.path.join(DATA_PATH, payload["filename"])
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Dosya canlıda bulunamadı: {payload['filename']}")
+
     print(f"⚙️ Admin: İşleniyor -> {file_path}")
-    success = ingest_new_file(file_path)
-    if success:
-        print(f"✅ Admin: Veritabanı güncellendi. Chat API ({CHAT_API_URL}) uyarılıyor...")
-        try:
-            # 2. Chat API'yi dürt (Webhook)
-            r = requests.post(CHAT_API_URL, timeout=5)
-            if r.status_code == 200:
-                print("✅ Chat API başarıyla yenilendi.")
-            else:
-                print(f"⚠️ Chat API yenilenemedi: {r.status_code}")
-        except Exception as e:
-            print(f"❌ Chat API'ye ulaşılamadı (Kapalı olabilir): {e}")
\ No newline at end of file
+    added = ingest_new_file(file_path, progress=ctx)
+    if added:
+        print("✅ Admin: Veritabanı güncellendi.")
+        bump_version("corpus", f"publish: {payload['filename']}")
+    return {"chunks_added": added}
+
+def rollback_ingest(payload):
+    """İptal edilen / hiç tamamlanamayan işleme: Yarım yazılan parçalar silinir, dosya taslağa geri döner."""
+    filename = payload["filename"]
+    prod_file = os.path.join(DATA_PATH, filename)
+    remove_file_from_index(filename)
+    if os.path.exists(prod_file):
+        shutil.move(prod_file, os.path.join(STAGING_PATH, filename))
+    log_admin_action("process_rollback", filename, "system")
+    bump_version("corpus", f"rollback: {filename}")
+
+def run_sync_job(payload, ctx):
+    """İş kuyruğu işleyicisi: 'belgelerim' klasörünü indeksle eşitler."""
+    report = sync_with_data_folder(progress=ctx)
+    if report["new"] or report["changed"] or report["removed"]:
+        bump_version("corpus", "index_sync")
+    return report
+
+# ==========================================================
+# 8. İNDEKS SENKRONİZASYONU
+# ==========================================================
+
+@app.post("/api/index-sync")
+def index_sync(
+    dry_run: bool = Form(True),
+    username: str = Depends(require_admin)
+):
+    """
+    'belgelerim' klasörünü vektör veritabanıyla eşitler.
+    dry_run=True (varsayılan) ise sadece neyin değişeceğini raporlar.
+    dry_run=False ise eşitleme işi kuyruğa eklenir ve iş kaydı döner.
+    """
+
+    try:
+        if dry_run:
+            return sync_with_data_folder(dry_run=True)
+        job = job_queue.submit("sync", created_by=username, unique=True)
+        log_admin_action("index_sync", f"iş #{job['id']}", username)
+        return {"message": "İndeks senkronizasyonu kuyruğa alındı.", "job_id": job["id"], "job": job}
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": str(e)})
+
+@app.post("/api/index-maintenance")
+def index_maintenance(
+    dry_run: bool = Form(True),
+    username: str = Depends(require_admin)
+):
+    """
+    Sahipsiz (dosyası kaldırılmış) ve tekrarlanan parçaları raporlar.
+    dry_run=False ise bu parçaları siler.
+    """
+
+    try:
+        report = clean_index(dry_run=dry_run)
+        if not dry_run and report.get("purged_chunks"):
+            log_admin_action("index_purge", f"-{report['purged_chunks']} parça", username)
+            bump_version("corpus", "index_purge")
+        return report
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"detail": str(e)})
+
+# ==========================================================
+# 9. ARKA PLAN İŞLERİ (Belge işleme kuyruğu)
+# ==========================================================
+
+@app.post("/api/jobs")
+def list_jobs(
+    status: Optional[str] = Form(None),
+    limit: int = Form(50),
+    username: str = Depends(require_admin)
+):
+    """Son işleri (isteğe bağlı duruma göre) ve kuyruk özetini listeler"""
+    return {"jobs": job_queue.list(status=status, limit=min(limit, 500)), "stats": job_queue.stats()}
+
+@app.post("/api/jobs/{job_id}")
+def job_detail(job_id: int, username: str = Depends(require_admin)):
+    """Tek bir işin durumu ve ilerlemesi (sayfa, embed edilen / yazılan parça)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "İş bulunamadı"})
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: int, username: str = Depends(require_admin)):
+    """Bekleyen işi iptal eder; çalışan iş ilk fırsatta durur ve yaptıkları geri alınır"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "İş bulunamadı"})
+    log_admin_action("job_cancel", f"iş #{job_id}", username)
+    return job
+
+@app.post("/api/jobs/{job_id}/retry")
+def retry_job(job_id: int, username: str = Depends(require_admin)):
+    """Başarısız veya iptal edilmiş işi tekrar kuyruğa alır"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": "İş bulunamadı"})
+    if job["status"] not in ("failed", "cancelled"):
+        return JSONResponse(status_code=409, content={"detail": "Sadece başarısız veya iptal edilmiş işler tekrar denenebilir"})
+    retried = job_queue.retry(job_id)
+    if retried is None:
+        # Kontrol ile güncelleme arasında durum değişti (örn. başka bir istek tekrar kuyruğa aldı)
+        return JSONResponse(status_code=409, content={"detail": "Sadece başarısız veya iptal edilmiş işler tekrar denenebilir"})
+    if job["kind"] == "ingest":
+        # İptal / hata sonrası dosya taslağa geri alınmıştı; tekrar canlıya taşınır.
+        # İşçi dosya taşınmadan işi alırsa deneme FileNotFoundError ile biter ve beklemeyle tekrar denenir.
+        staging_file = os.path.join(STAGING_PATH, job["payload"]["filename"])
+        if os.path.exists(staging_file):
+            shutil.move(staging_file, os.path.join(DATA_PATH, job["payload"]["filename"]))
+    log_admin_action("job_retry", f"iş #{job_id}", username)
+    return retried
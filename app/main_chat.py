@@ -1,13 +1,27 @@
+# Açılış süresi ölçümü ilk importla başlar (startup_service hafiftir)
+from app.services.startup_service import run_startup, mark_imports_done, get_startup_state, is_started
 from fastapi import FastAPI, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import asyncio
+import json
 import os
+import traceback
 
 # Modeller ve Servisler
 from app.models.schemas import Question, Answer
-from app.services.rag_service import initialize_rag, get_answer
-from app.services.logging_service import init_db
+from app.services.rag_service import initialize_rag, reload_rag, get_answer, stream_answer
+from app.services.logging_service import init_db, start_log_writer, stop_log_writer, conversation_log_writer
+from app.services.cache_service import answer_cache
+from app.services import rag_service
+from app.services.metrics_service import render_prometheus, register_gauge
+from app.services.generation_scheduler import SchedulerRejected
+from app.services.model_warmup import get_model_state, is_model_ready
+from app.services.memory_service import conversation_memory
+from app.services.config_store import config_store
+from app.services.corpus_version import read_versions
+from app.core.config import MODEL_WARMUP_ENABLED, STARTUP_BACKGROUND_INIT
 
 # Frontend Dosyası
 INDEX_HTML_PATH = "index.html"
@@ -16,14 +30,34 @@ INDEX_HTML_PATH = "index.html"
 async def lifespan(app: FastAPI):
     """
     Sunucu açılırken çalışacak işlemler.
-    1. Log veritabanını (SQLite) hazırla.
-    2. RAG sistemini (LLM, Embedding, ChromaDB) belleğe yükle.
+    1. Log veritabanını (SQLite) hazırla ve log yazıcısını başlat.
+    2. Ayar dosyalarını (model, promptlar) belleğe al ve değişikliklerini izlemeye başla.
+    3. RAG sistemini (LLM, Embedding, ChromaDB) belleğe yükle ve sohbet modelini Ollama'da ısındır.
+       Bu adım arka planda yapılır; sunucu hemen açılır, hazır olunca /readyz 200 döner.
+    Kapanışta log kuyruğundaki kayıtlar yazılmadan çıkılmaz.
     """
     print("--- CHAT SUNUCUSU BAŞLATILIYOR ---")
+    mark_imports_done()
     init_db()
-    initialize_rag()
+    start_log_writer()
+    config_store.start_watcher()
+    run_startup(lambda: initialize_rag(warm_up=MODEL_WARMUP_ENABLED), background=STARTUP_BACKGROUND_INIT)
     yield
     print("--- CHAT SUNUCUSU KAPATILIYOR ---")
+    config_store.stop_watcher()
+    stop_log_writer()
+
+# /metrics için anlık göstergeler
+register_gauge("rag_answer_cache_hits", "Cevap önbelleği isabet sayısı", lambda: answer_cache.hits)
+register_gauge("rag_answer_cache_misses", "Cevap önbelleği ıskalama sayısı", lambda: answer_cache.misses)
+register_gauge("rag_log_queue_depth", "Yazılmayı bekleyen sohbet logu sayısı", lambda: conversation_log_writer.stats()["queue_depth"])
+register_gauge("rag_log_last_flush_ms", "Son log yazma (flush) süresi", lambda: conversation_log_writer.last_flush_ms)
+register_gauge("rag_generation_in_flight", "Ollama'da çalışan üretim sayısı", lambda: rag_service.generation_scheduler.in_flight)
+register_gauge("rag_generation_queue_depth", "Üretim sırası bekleyen istek sayısı", lambda: rag_service.generation_scheduler.stats()["queued"])
+
+def _rejected_response(e: SchedulerRejected):
+    """Kuyruk dolu cevabı: 429 (kullanıcı sınırı) veya 503 (sistem yoğun) + Retry-After."""
+    return JSONResponse(status_code=e.status_code, content={"detail": e.detail}, headers={"Retry-After": str(e.retry_after)})
 
 # Uygulamayı Oluştur
 app = FastAPI(title="Chat API (User)", version="4.0", lifespan=lifespan)
@@ -68,29 +102,154 @@ async def ask(
     #     client_ip = forwarded.split(",")[0]
 
     # 2. Servise Soruyu, Modu ve IP'yi Gönder
-    response_text = await get_answer(
-        query=body.query, 
-        mode=body.mode,       # <-- "Hızlı" veya "Düşünen" mod bilgisi
-        ip_address=client_ip, # <-- Loglama için IP adresi
-        background_tasks=background_tasks
-    )
+    try:
+        response_text = await get_answer(
+            query=body.query, 
+            mode=body.mode,       # <-- "Hızlı" veya "Düşünen" mod bilgisi
+            ip_address=client_ip, # <-- Loglama için IP adresi
+            background_tasks=background_tasks,
+            history=body.history,
+            conversation_id=body.conversation_id
+        )
+    except SchedulerRejected as e:
+        return _rejected_response(e)
     
     return Answer(response=response_text)
 
-# --- 3. YENİLEME SİNYALİ (Admin API Burayı Tetikler) ---
+# --- 2.1 SOHBET API (AKIŞ / STREAMING) ---
+@app.post("/soru-sor/stream")
+async def ask_stream(
+    raw_request: Request,
+    body: Question,
+    background_tasks: BackgroundTasks
+):
+    """
+    /soru-sor ile aynı girdiyi alır, cevabı Server-Sent Events (SSE) olarak akıtır.
+    Her token bir 'data:' satırı olarak gönderilir; son olay 'done' tipindedir
+    ve ilk token süresini (ttft_ms) içerir. Üretim sırasında hata olursa önce
+    'error' (status 500) sonra 'done' olayı gönderilir.
+    """
+    client_ip = raw_request.client.host
+
+    # Kuyruk zaten doluysa akışı hiç başlatma (HTTP durumu başlıklardan önce belirlenmeli)
+    try:
+        rag_service.generation_scheduler.check_admission(body.mode, client_ip)
+    except SchedulerRejected as e:
+        return _rejected_response(e)
+
+    async def event_source():
+        try:
+            async for event in stream_answer(
+                query=body.query,
+                mode=body.mode,
+                ip_address=client_ip,
+                background_tasks=background_tasks,
+                history=body.history,
+                conversation_id=body.conversation_id
+            ):
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            # Başlıklar gönderildiği için 500 dönülemez; hata /soru-sor'daki gibi izlenebilsin diye
+            # tam olarak loglanır, istemciye hata olayı ve ardından akışı bitiren olay gönderilir.
+            print(f"❌ Akış Hatası: {e}")
+            traceback.print_exc()
+            error = {"type": "error", "status": 500, "detail": "Cevap üretilirken bir hata oluştu."}
+            yield f"data: {json.dumps(error, ensure_ascii=False)}\n\n"
+            yield f"data: {json.dumps({'type': 'done', 'ttft_ms': None, 'total_ms': None}, ensure_ascii=False)}\n\n"
+
+    # background_tasks FastAPI tarafından bu cevaba bağlanır; log kaydı akış bitince çalışır.
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- 3. ELLE YENİLEME ---
 @app.post("/refresh-db")
-async def refresh_database():
+async def refresh_database(background_tasks: BackgroundTasks):
     """
-    Veritabanı güncellendiğinde veya Prompt/Model değiştiğinde
-    Admin API bu endpointi çağırarak sistemi canlı olarak yeniler.
+    Bu işçiyi elle yeniler (Bakım / hata ayıklama için).
+    Admin API artık bu endpointi çağırmaz: Yayınlama, yayından kaldırma, prompt ve model
+    değişikliklerinde sürüm damgası (chroma_db_text_version.json) artırılır ve her işçi
+    bunu bir sonraki istekte görüp sadece etkilenen kısmı yeniler.
+    Yenileme arka planda yapılır; durum /readyz üzerinden izlenebilir.
     """
+    print("📥 YENİLEME İSTEĞİ ALINDI. RAG sistemi güncelleniyor...")
+    background_tasks.add_task(_reload_in_background)
+    return {"status": "success", "message": "RAG sistemi yenileniyor."}
+
+def _reload_in_background():
     try:
-        print("📥 YENİLEME SİNYALİ ALINDI. RAG sistemi güncelleniyor...")
-        
-        # RAG sistemini (LLM, Promptlar, Vektör DB) yeniden başlat
-        initialize_rag()
-        
-        return {"status": "success", "message": "RAG sistemi başarıyla yenilendi."}
+        config_store.refresh()
+        reload_rag()
+        # Chroma görünümü de tazelenir (Başka süreçteki yazmalar)
+        rag_service.refresh_from_version_stamp(force_corpus=True)
     except Exception as e:
         print(f"❌ Yenileme Hatası: {e}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+
+# --- SAĞLIK KONTROLLERİ ---
+@app.get("/healthz")
+async def healthz():
+    """
+    Süreç ayakta mı? (Liveness) Açılış sürerken de 200 döner; sadece açılış hata ile
+    bittiyse 503 döner (süreç yeniden başlatılmalı).
+    """
+    startup = get_startup_state()
+    alive = startup["status"] != "failed"
+    return JSONResponse(status_code=200 if alive else 503, content={"alive": alive, "startup": startup})
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Cevap vermeye hazır mı? (Readiness) Açılış bitti, arama indeksi (Chroma / retrieval sunucusu)
+    ve runtime hazır, (ısındırma açıksa) şu an cevap veren model Ollama'da yüklüyse 200, değilse 503 döner.
+    Model değişimi sürerken eski model cevap vermeye devam ettiğinden işçi hazır sayılır.
+    """
+    rt = rag_service.runtime
+    model = get_model_state(rt.model if rt is not None else None)
+    components = await asyncio.to_thread(rag_service.readiness)
+    components["model"] = rt is not None and (not MODEL_WARMUP_ENABLED or is_model_ready(rt.model))
+    ready = is_started() and all(components.values())
+    content = {"ready": ready, "startup": get_startup_state()["status"], "components": components, "model": model}
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+# --- 4. İSTATİSTİKLER ---
+def _retrieval_stats():
+    """
+    Retrieval sunucusu kullanılıyorsa bu işçinin bağlantı ve sunucunun batch istatistikleri.
+    Sunucuya istek attığı (cevap gelmezse zaman aşımına kadar beklediği) için thread'de çağrılır.
+    """
+    client = rag_service.retrieval_client
+    if client is None:
+        return {"backend": "local"}
+    try:
+        server = client.call("stats")
+    except Exception as e:
+        server = {"error": str(e)}
+    return {"backend": "remote", "client": client.stats(), "server": server, "worker_pid": os.getpid()}
+
+@app.get("/stats")
+async def stats():
+    """Önbellek, embedding batch, üretim kuyruğu, ayar deposu ve log yazıcısı istatistiklerini döner."""
+    batcher = rag_service.embedding_batcher
+    return {
+        "cache": answer_cache.stats(),
+        "generation_queue": rag_service.generation_scheduler.stats(),
+        "model": get_model_state(),
+        "memory": conversation_memory.stats(),
+        "startup": get_startup_state(),
+        "config": config_store.stats(),
+        "versions": {
+            "stamp": read_versions(),
+            "runtime_corpus": rag_service.runtime.corpus_version if rag_service.runtime else None,
+        },
+        "retrieval": await asyncio.to_thread(_retrieval_stats),
+        "embedding_batcher": batcher.stats() if batcher else None,
+        "log_writer": conversation_log_writer.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus formatında aşama süreleri, token hızları ve göstergeler."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
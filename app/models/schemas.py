@@ -1,10 +1,13 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class Question(BaseModel):
     query: str
     mode: str = "fast" # <-- YENİ: "fast" veya "thinking" olabilir
+    # Önceki mesajlar (eskiden yeniye): [{"role": "user"|"assistant", "content": "..."}]
+    # veya [{"query": "...", "response": "..."}]
     history: List[Dict[str, Any]] = []
+    conversation_id: Optional[str] = None  # Verilirse konuşma özeti bu id ile saklanır
 
 class Answer(BaseModel):
     response: str
\ No newline at end of file
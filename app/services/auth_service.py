@@ -1,24 +1,152 @@
+import base64
+import hashlib
+import hmac
 import json
-import os
-from app.core.config import USERS_JSON_PATH
+import secrets
+import threading
+import time
+from typing import Optional
 
-def verify_user(username, password):
+from fastapi import Form, Header, HTTPException
+
+from app.core.config import ADMIN_SESSION_SECRET, ADMIN_SESSION_TTL_SECONDS, ADMIN_ALLOW_FORM_CREDENTIALS
+from app.services.config_store import config_store
+
+PASSWORD_HASH_ITERATIONS = 200_000
+
+# ==========================================================
+# 1. ŞİFRE ÖZETLERİ (PBKDF2-SHA256)
+# ==========================================================
+
+def hash_password(password, salt=None, iterations=PASSWORD_HASH_ITERATIONS):
+    """users.json'a yazılacak 'pbkdf2_sha256$iterasyon$tuz$özet' metnini üretir."""
+    salt = salt or secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), iterations)
+    return f"pbkdf2_sha256${iterations}${salt}${digest.hex()}"
+
+def check_password(password, stored_hash):
+    try:
+        algorithm, iterations, salt, expected = stored_hash.split("$")
+    except ValueError:
+        return False
+    if algorithm != "pbkdf2_sha256":
+        return False
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt.encode("utf-8"), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+# ==========================================================
+# 2. KULLANICI TABLOSU (Ayar deposundaki users.json'dan türetilir)
+# ==========================================================
+
+_users = {}                 # kullanıcı adı -> şifre özeti
+_users_file_version = None  # Tablonun türetildiği users.json sürümü
+_users_lock = threading.Lock()
+
+def _load_users():
     """
-    Kullanıcı adı ve şifreyi users.json dosyasından kontrol eder.
+    Kullanıcı tablosunu döner; users.json değiştiyse (ayar deposu yeni sürüm yayınladıysa)
+    tekrar oluşturur. Dosyada iki biçim desteklenir:
+      {"username": "...", "password_hash": "pbkdf2_sha256$..."}  (önerilen)
+      {"username": "...", "password": "..."}                     (eski, düz metin; bellekte özetlenir)
     """
-    if not os.path.exists(USERS_JSON_PATH):
-        return False # Dosya yoksa kimse giremez
+    global _users, _users_file_version
+    snapshot = config_store.snapshot()
+    version = snapshot.file_versions.get("users")
+    if version == _users_file_version:
+        return _users
 
-    try:
-        with open(USERS_JSON_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            users = data.get("users", [])
-            
-            for user in users:
-                if user["username"] == username and user["password"] == password:
-                    return True
-    except Exception as e:
-        print(f"Auth Hatası: {e}")
+    with _users_lock:
+        if version == _users_file_version:
+            return _users
+        users = {}
+        plaintext = []
+        for user in snapshot.users:
+            if user.get("password_hash"):
+                users[user["username"]] = user["password_hash"]
+            elif "password" in user:
+                # Tuz kullanıcı adından türetilir: Yeniden başlatınca oturum izleri (ver) değişmesin
+                salt = hashlib.sha256(user["username"].encode("utf-8")).hexdigest()[:32]
+                users[user["username"]] = hash_password(user["password"], salt=salt)
+                plaintext.append(user["username"])
+        if plaintext:
+            print(f"⚠️ users.json düz metin şifre içeriyor ({', '.join(plaintext)}). "
+                  f"'python -m app.services.auth_service <şifre>' ile üretilen password_hash kullanın.")
+
+        _users, _users_file_version = users, version
+        print(f"🔐 Kullanıcı tablosu yüklendi: {len(users)} kullanıcı")
+        return _users
+
+def verify_user(username, password):
+    """Kullanıcı adı ve şifreyi bellekteki kullanıcı tablosuna göre kontrol eder."""
+    stored = _load_users().get(username)
+    if stored is None or password is None:
         return False
-    
-    return False
\ No newline at end of file
+    return check_password(password, stored)
+
+# ==========================================================
+# 3. OTURUM ANAHTARLARI (HMAC imzalı, kısa ömürlü)
+# ==========================================================
+
+# Sabit bir anahtar verilmezse her açılışta yenisi üretilir (yeniden başlatınca tekrar giriş gerekir)
+_secret = (ADMIN_SESSION_SECRET or secrets.token_hex(32)).encode("utf-8")
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _user_version(username):
+    """Şifre değişince / kullanıcı silinince eski oturumlar geçersiz olsun diye özetin kısa izi."""
+    stored = _users.get(username)
+    return hashlib.sha256(stored.encode("utf-8")).hexdigest()[:12] if stored else None
+
+def create_session_token(username, ttl_seconds=ADMIN_SESSION_TTL_SECONDS):
+    payload = {"sub": username, "exp": int(time.time()) + ttl_seconds, "ver": _user_version(username)}
+    body = _b64(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signature = _b64(hmac.new(_secret, body.encode("ascii"), hashlib.sha256).digest())
+    return f"{body}.{signature}"
+
+def verify_session_token(token):
+    """Geçerli bir anahtar için kullanıcı adını, aksi halde None döner (diske gidilmez)."""
+    try:
+        body, signature = token.split(".")
+        expected = _b64(hmac.new(_secret, body.encode("ascii"), hashlib.sha256).digest())
+        if not hmac.compare_digest(signature, expected):
+            return None
+        payload = json.loads(_unb64(body))
+    except Exception:
+        return None
+    if payload.get("exp", 0) < time.time():
+        return None
+    _load_users()  # users.json değiştiyse tabloyu yeniler (diske gitmez)
+    if payload.get("ver") != _user_version(payload.get("sub")):
+        return None
+    return payload["sub"]
+
+def require_admin(
+    authorization: Optional[str] = Header(None),
+    username: Optional[str] = Form(None),
+    password: Optional[str] = Form(None),
+):
+    """
+    Admin endpoint'leri için FastAPI bağımlılığı; kullanıcı adını döner.
+    'Authorization: Bearer <anahtar>' başlığı gerekir. ADMIN_ALLOW_FORM_CREDENTIALS açıksa
+    eski istemciler (betikler) için form alanlarıyla kullanıcı adı / şifre de kabul edilir.
+    """
+    if authorization and authorization.lower().startswith("bearer "):
+        user = verify_session_token(authorization[7:].strip())
+        if user:
+            return user
+        raise HTTPException(status_code=401, detail="Oturum süresi doldu, tekrar giriş yapın.")
+    if ADMIN_ALLOW_FORM_CREDENTIALS and username and verify_user(username, password):
+        return username
+    raise HTTPException(status_code=401, detail="Yetkisiz erişim")
+
+if __name__ == "__main__":
+    # users.json için şifre özeti üretir: python -m app.services.auth_service <şifre>
+    import sys
+    if len(sys.argv) != 2:
+        print("Kullanım: python -m app.services.auth_service <şifre>")
+        sys.exit(1)
+    print(hash_password(sys.argv[1]))
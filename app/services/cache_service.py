@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TTL_SECONDS,
+    SEMANTIC_CACHE_THRESHOLDS,
+)
+
+def make_version_stamp(*parts):
+    """
+    Model adı, prompt metinleri ve koleksiyon bilgisinden kısa bir sürüm damgası üretir.
+    Parçalardan herhangi biri değişirse damga da değişir.
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+class SemanticAnswerCache:
+    """
+    Sorgu embedding'ine göre anahtarlanan cevap önbelleği.
+    - Her mod ('fast' / 'thinking') için ayrı bir benzerlik eşiği vardır.
+    - Boyut sınırlıdır (LRU) ve her kaydın bir yaşam süresi (TTL) vardır.
+    - Sürüm damgası (Chroma + prompt + model) değişince tüm kayıtlar silinir.
+    """
+
+    def __init__(self, max_entries=SEMANTIC_CACHE_MAX_ENTRIES, ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS, thresholds=None, enabled=SEMANTIC_CACHE_ENABLED):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.thresholds = thresholds or SEMANTIC_CACHE_THRESHOLDS
+        self.version = None
+        self._generation = 0  # Her temizlemede artar (set_version / invalidate)
+        self._entries = OrderedDict()  # key -> {"mode", "vector", "query", "response", "created"}
+        self._lock = threading.Lock()
+        self._next_key = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def set_version(self, version):
+        """Sürüm damgasını günceller; damga değiştiyse önbellek boşaltılır."""
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+                self._generation += 1
+
+    def invalidate(self, reason=""):
+        """Tüm kayıtları siler (refresh-db, yeni belge, model değişimi)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            self._generation += 1
+        print(f"🧹 Cevap önbelleği temizlendi. {reason}".strip())
+
+    def current_version(self):
+        """
+        Cevap üretimine başlamadan önce alınır ve store(..., version=...) ile geri verilir.
+        Üretim sürerken önbellek temizlendiyse (yeni belge, model / prompt değişimi) eski
+        korpusla üretilen cevap yeni sürüm altında saklanmaz.
+        """
+        with self._lock:
+            return (self.version, self._generation)
+
+    def lookup(self, mode, vector):
+        """
+        Aynı moddaki en benzer kaydı bulur. Benzerlik eşiği aşılırsa cevabı döner,
+        aksi halde None döner.
+        """
+        if not self.enabled:
+            self.misses += 1
+            return None
+        threshold = self.thresholds.get(mode, self.thresholds.get("fast", 0.95))
+        query_vec = _normalize(vector)
+        now = time.time()
+
+        with self._lock:
+            self._evict_expired(now)
+            keys = [k for k, e in self._entries.items() if e["mode"] == mode]
+            if keys:
+                matrix = np.stack([self._entries[k]["vector"] for k in keys])
+                scores = matrix @ query_vec
+                best = int(np.argmax(scores))
+                if scores[best] >= threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]["response"]
+            self.misses += 1
+            return None
+
+    def store(self, mode, query, vector, response, version=None):
+        """
+        Yeni cevabı kaydeder; kapasite aşılırsa en eski kullanılan kayıt silinir.
+        version (current_version()) verildiyse ve o zamandan beri önbellek temizlendiyse kayıt atılır.
+        """
+        if not self.enabled or not response:
+            return
+        with self._lock:
+            if version is not None and version != (self.version, self._generation):
+                return
+            self._entries[self._next_key] = {
+                "mode": mode,
+                "vector": _normalize(vector),
+                "query": query,
+                "response": response,
+                "created": time.time(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "version": self.version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _evict_expired(self, now):
+        expired = [k for k, e in self._entries.items() if now - e["created"] > self.ttl_seconds]
+        for k in expired:
+            del self._entries[k]
+            self.evictions += 1
+
+def _normalize(vector):
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+# Uygulama genelinde tek önbellek
+answer_cache = SemanticAnswerCache()
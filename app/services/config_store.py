@@ -0,0 +1,294 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+from app.core.config import (
+    SETTINGS_FILE_PATH,
+    PROMPT_FAST_PATH,
+    PROMPT_THINKING_PATH,
+    USERS_JSON_PATH,
+    CONFIG_WATCH_INTERVAL_SECONDS,
+)
+
+DEFAULT_MODEL = "gemma3:12b"
+
+# --- VARSAYILAN PROMPTLAR (İKİ AYRI MOD İÇİN) ---
+
+# A. Hızlı Mod Varsayılanı
+DEFAULT_PROMPT_FAST = """Sen kurumsal bir asistansın. Görevin sadece bilgi vermektir.
+    Sadece aşağıdaki 'Bağlam' içindeki bilgileri kullan.
+    Cevaba doğrudan başla. Kısa, net ve öz ol.
+
+    Bağlam: {context}
+    Soru: {question}
+    Cevap:"""
+
+# B. Düşünen Mod Varsayılanı
+DEFAULT_PROMPT_THINKING = """Sen kıdemli bir analist ve kurumsal danışmansın.
+    Görevin:
+    1. Aşağıdaki 'Bağlam' bilgisini detaylıca analiz et.
+    2. Soruyu cevaplamadan önce, bağlamdaki bilgilerin soruyla ilişkisini kur.
+    3. Adım adım düşün ve detaylı, kapsamlı bir açıklama yap.
+    4. Eğer varsa, prosedürleri madde madde açıkla.
+
+    Bağlam (Dokümanlar):
+    {context}
+
+    Soru:
+    {question}
+
+    Detaylı Analiz ve Cevap:"""
+
+# İzlenen dosyalar: anahtar -> yol
+_FILES = {
+    "settings": SETTINGS_FILE_PATH,
+    "prompt_fast": PROMPT_FAST_PATH,
+    "prompt_thinking": PROMPT_THINKING_PATH,
+    "users": USERS_JSON_PATH,
+}
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Ayar dosyalarının bir anki hali (değiştirilemez). Her değişiklikte version bir artar."""
+    version: int
+    settings: dict
+    prompt_fast: str
+    prompt_thinking: str
+    users: list
+    file_versions: dict = field(default_factory=dict)  # dosya anahtarı -> o dosyanın kaç kez değiştiği
+    loaded_at: float = 0.0
+
+    @property
+    def chat_model(self):
+        return self.settings.get("chat_model", DEFAULT_MODEL)
+
+    def prompt(self, prompt_type):
+        return self.prompt_thinking if prompt_type == "thinking" else self.prompt_fast
+
+def _read_json(path):
+    """JSON dosyasını okur; dosya yoksa boş sözlük, bozuksa None (son geçerli değer korunur)."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"❌ Ayar dosyası okunamadı ({os.path.basename(path)}): {e}")
+        return None
+
+def _read_prompt(path, default_text):
+    """
+    Prompt metnini okur. Dosya yoksa (veya boşsa) varsayılan metin döner ve
+    dosya oluşturulur (Admin panelinde boş görünmesin diye).
+    """
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content:
+                print(f"✅ Prompt yüklendi: {os.path.basename(path)}")
+                return content
+        except Exception as e:
+            print(f"❌ Hata ({path}): {e}")
+            return None
+
+    try:
+        _write_atomic(path, default_text)
+    except Exception:
+        pass
+    return default_text
+
+def _write_atomic(path, text):
+    """Geçici dosyaya yazıp yer değiştirir; okuyan süreç yarım dosya görmez."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+class ConfigStore:
+    """
+    settings.json, prompt_fast.txt, prompt_thinking.txt ve users.json için merkezi önbellek.
+    - Dosyalar bir kez okunur; istekler snapshot() ile bellekteki kopyayı kullanır (disk okuması yok).
+    - Arka plandaki izleyici dosyaların mtime/boyutuna bakar, değişen dosyayı okuyup
+      yeni bir sürüm (snapshot) yayınlar ve abonelere bildirir.
+    - Bu süreçteki yazmalar (set_chat_model, save_prompt) dosyaya yazılır ve beklemeden yayınlanır;
+      diğer süreç değişikliği izleyici üzerinden alır.
+    Aboneler, değişikliği yakalayan iş parçacığında callback(snapshot, changed_keys) olarak çağrılır.
+    """
+
+    def __init__(self, files=None, interval=CONFIG_WATCH_INTERVAL_SECONDS):
+        self.files = dict(files or _FILES)
+        self.interval = interval
+        self._snapshot = None
+        self._stamps = {}
+        self._lock = threading.RLock()
+        self._subscribers = []
+        self._thread = None
+        self._stop = threading.Event()
+
+        # İstatistikler
+        self.reloads = 0
+        self.last_check_ms = 0.0
+
+    # --- Okuma ---
+    def snapshot(self):
+        """Güncel ayarlar. İlk çağrıda dosyalar okunur, sonrası bellekten döner."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._publish(self._load(set(self.files)))
+                snapshot = self._snapshot
+        return snapshot
+
+    def subscribe(self, callback):
+        """Ayarlar değiştiğinde callback(snapshot, changed_keys) çağrılır. Aynı callback iki kez eklenmez."""
+        with self._lock:
+            if callback not in self._subscribers:
+                self._subscribers.append(callback)
+
+    # --- Yazma ---
+    def set_chat_model(self, model_name):
+        """Seçili modeli settings.json'a yazar (diğer ayarlar korunur)."""
+        with self._lock:
+            settings = {**self.snapshot().settings, "chat_model": model_name}
+            _write_atomic(self.files["settings"], json.dumps(settings, indent=2))
+        self.refresh()
+
+    def save_prompt(self, prompt_type, content):
+        key = "prompt_thinking" if prompt_type == "thinking" else "prompt_fast"
+        with self._lock:
+            _write_atomic(self.files[key], content)
+        self.refresh()
+
+    # --- İzleme ---
+    def refresh(self):
+        """Dosyaların değişip değişmediğine bakar; değişenleri okuyup yeni sürüm yayınlar. Değişen anahtarları döner."""
+        started = time.perf_counter()
+        with self._lock:
+            if self._snapshot is None:
+                self.snapshot()
+                return set()
+            changed = {key for key, path in self.files.items() if _file_stamp(path) != self._stamps.get(key)}
+            if changed:
+                changed = self._publish(self._load(changed))
+            snapshot = self._snapshot
+        self.last_check_ms = (time.perf_counter() - started) * 1000
+
+        # Aboneler kilit dışında çağrılır (RAG yenilemesi / model ısındırma uzun sürebilir)
+        if changed:
+            self._notify(snapshot, changed)
+        return changed
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_watcher(self):
+        self.snapshot()
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop_watcher(self, timeout=5):
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "file_versions": dict(snapshot.file_versions) if snapshot else {},
+            "chat_model": snapshot.chat_model if snapshot else None,
+            "watching": self.running,
+            "reloads": self.reloads,
+            "last_check_ms": round(self.last_check_ms, 3),
+        }
+
+    # --- İç işleyiş ---
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ Ayar izleyici hatası: {e}")
+
+    def _load(self, keys):
+        """Verilen dosyaları okur; okunamayan dosya için önceki değer kalır. Yeni değerleri döner."""
+        values = {}
+        for key in keys:
+            path = self.files[key]
+            # Damga okumadan önce alınır: Okuma sırasında yazılırsa bir sonraki kontrolde tekrar okunur
+            self._stamps[key] = _file_stamp(path)
+            if key == "settings":
+                data = _read_json(path)
+                value = data if isinstance(data, dict) else None
+            elif key == "users":
+                data = _read_json(path)
+                value = data.get("users", []) if isinstance(data, dict) else None
+            else:
+                value = _read_prompt(path, DEFAULT_PROMPT_THINKING if key == "prompt_thinking" else DEFAULT_PROMPT_FAST)
+                # Varsayılan dosya yeni oluşturulduysa tekrar okumaya gerek yok
+                self._stamps[key] = _file_stamp(path)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def _publish(self, values):
+        """Yeni snapshot'ı oluşturur. Gerçekten değişen anahtarları döner."""
+        previous = self._snapshot
+        if previous is None:
+            snapshot = ConfigSnapshot(
+                version=1,
+                settings=values.get("settings", {}),
+                prompt_fast=values.get("prompt_fast", DEFAULT_PROMPT_FAST),
+                prompt_thinking=values.get("prompt_thinking", DEFAULT_PROMPT_THINKING),
+                users=values.get("users", []),
+                file_versions={key: 1 for key in self.files},
+                loaded_at=time.time(),
+            )
+            self._snapshot = snapshot
+            return set(values)
+
+        # Sadece dokunulup içeriği aynı kalan dosyalar yeni sürüm üretmez
+        changed = {key for key, value in values.items() if getattr(previous, key) != value}
+        if not changed:
+            return set()
+        file_versions = dict(previous.file_versions)
+        for key in changed:
+            file_versions[key] = file_versions.get(key, 0) + 1
+        snapshot = replace(
+            previous,
+            version=previous.version + 1,
+            file_versions=file_versions,
+            loaded_at=time.time(),
+            **{key: values[key] for key in changed},
+        )
+        self._snapshot = snapshot
+        self.reloads += 1
+        print(f"🔁 Ayarlar güncellendi (sürüm {snapshot.version}): {', '.join(sorted(changed))}")
+        return changed
+
+    def _notify(self, snapshot, changed):
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot, changed)
+            except Exception as e:
+                print(f"❌ Ayar aboneliği hatası ({getattr(callback, '__name__', callback)}): {e}")
+
+# Süreç genelinde tek depo (API'lerin lifespan'inde izleyici başlatılır)
+config_store = ConfigStore()
@@ -0,0 +1,175 @@
+import re
+import threading
+from functools import lru_cache
+
+from app.core.config import (
+    LOCAL_EMBEDDING_PATH,
+    CONTEXT_TOKEN_SAFETY_FACTOR,
+    CONTEXT_MIN_CHUNK_TOKENS,
+    CONTEXT_DUPLICATE_THRESHOLD,
+)
+
+CHUNK_SEPARATOR = "\n\n"
+_MIN_OVERLAP_CHARS = 30
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# ==========================================================
+# 1. TOKEN SAYIMI
+# ==========================================================
+
+_tokenizer = None
+_tokenizer_loaded = False
+_tokenizer_lock = threading.Lock()
+
+def _get_tokenizer():
+    """
+    bge-m3 klasöründeki tokenizer'ı (XLM-R, Türkçe için iyi bir yaklaşım) bir kez yükler.
+    Yüklenemezse None döner ve karakter tabanlı tahmin kullanılır.
+    """
+    global _tokenizer, _tokenizer_loaded
+    if _tokenizer_loaded:
+        return _tokenizer
+    with _tokenizer_lock:
+        if not _tokenizer_loaded:
+            try:
+                from transformers import AutoTokenizer
+                _tokenizer = AutoTokenizer.from_pretrained(LOCAL_EMBEDDING_PATH)
+                _tokenizer.model_max_length = 10 ** 9  # Uzun metinlerde uyarı basmasın
+            except Exception as e:
+                print(f"⚠️ Tokenizer yüklenemedi, karakter tabanlı tahmin kullanılacak: {e}")
+                _tokenizer = None
+            _tokenizer_loaded = True
+    return _tokenizer
+
+def count_tokens(text):
+    """Metnin sohbet modelindeki yaklaşık token sayısı (güvenlik payı dahil)."""
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        raw = len(tokenizer.encode(text, add_special_tokens=False))
+    else:
+        raw = len(text) / 3.2  # Türkçe metinde ortalama ~3.2 karakter / token
+    return int(raw * CONTEXT_TOKEN_SAFETY_FACTOR) + 1
+
+@lru_cache(maxsize=32)
+def template_tokens(template_text):
+    """Prompt şablonunun {context} ve {question} hariç token maliyeti (şablon başına bir kez hesaplanır)."""
+    return count_tokens(template_text.replace("{context}", "").replace("{question}", ""))
+
+# ==========================================================
+# 2. TEKRAR / ÖRTÜŞME AYIKLAMA
+# ==========================================================
+
+def _merge_overlap(first, second):
+    """
+    first'ün sonu second'ın başıyla örtüşüyorsa (splitter overlap'i) birleşik metni döner, yoksa None.
+    """
+    probe = second[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return None
+    start = first.rfind(probe)
+    while start != -1:
+        tail = first[start:]
+        if second.startswith(tail):
+            return first + second[len(tail):]
+        start = first.rfind(probe, 0, start)
+    return None
+
+def _similarity(words_a, words_b):
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+def dedupe_chunks(docs):
+    """
+    Retriever sırasını (skor sırası) koruyarak:
+    - Aynı sayfadan gelen ve birbirinin devamı olan (örtüşen) parçaları birleştirir,
+    - Başka bir parçanın içinde geçen veya ona çok benzeyen parçaları atar.
+    Dönen liste: [{"text", "source", "page"}], merged ve duplicates sayıları.
+    """
+    items = []
+    merged = duplicates = 0
+    for doc in docs:
+        text = (doc.page_content or "").strip()
+        if not text:
+            continue
+        source, page = doc.metadata.get("source"), doc.metadata.get("page")
+        words = set(_WORD_RE.findall(text.lower()))
+
+        absorbed = False
+        for item in items:
+            if text in item["text"] or _similarity(words, item["words"]) >= CONTEXT_DUPLICATE_THRESHOLD:
+                duplicates += 1
+                absorbed = True
+                break
+            if item["source"] == source and item["page"] == page:
+                combined = _merge_overlap(item["text"], text) or _merge_overlap(text, item["text"])
+                if combined:
+                    item["text"] = combined
+                    item["words"] |= words
+                    merged += 1
+                    absorbed = True
+                    break
+        if not absorbed:
+            items.append({"text": text, "source": source, "page": page, "words": words})
+
+    return [{k: v for k, v in item.items() if k != "words"} for item in items], merged, duplicates
+
+# ==========================================================
+# 3. BÜTÇEYE SIĞDIRMA
+# ==========================================================
+
+def _truncate_to_tokens(text, max_tokens, tokens):
+    """Metni yaklaşık max_tokens'a indirir; mümkünse cümle sonunda keser."""
+    cut = int(len(text) * max_tokens / max(tokens, 1))
+    truncated = text[:cut]
+    boundary = max(truncated.rfind(". "), truncated.rfind("\n"))
+    if boundary > cut // 2:
+        truncated = truncated[:boundary + 1]
+    return truncated.rstrip() + " ..."
+
+def pack_context(docs, budget_tokens):
+    """
+    Parçaları skor sırasıyla bütçeye (token) sığana kadar ekler.
+    Sığmayan son parça, yeterli yer varsa cümle sınırında kısaltılır.
+    (bağlam_metni, rapor) döner.
+    """
+    items, merged, duplicates = dedupe_chunks(docs)
+    separator_tokens = count_tokens(CHUNK_SEPARATOR)
+
+    packed = []
+    used = 0
+    dropped_chunks = dropped_tokens = 0
+    truncated = False
+    for item in items:
+        tokens = count_tokens(item["text"])
+        cost = tokens + (separator_tokens if packed else 0)
+        if used + cost <= budget_tokens:
+            packed.append(item["text"])
+            used += cost
+            continue
+
+        remaining = budget_tokens - used - (separator_tokens if packed else 0)
+        if not truncated and remaining >= CONTEXT_MIN_CHUNK_TOKENS:
+            text = _truncate_to_tokens(item["text"], remaining, tokens)
+            packed.append(text)
+            kept = count_tokens(text)
+            used += kept + (separator_tokens if len(packed) > 1 else 0)
+            dropped_tokens += max(0, tokens - kept)
+            truncated = True
+        else:
+            dropped_chunks += 1
+            dropped_tokens += tokens
+
+    report = {
+        "budget": budget_tokens,
+        "packed_chunks": len(packed),
+        "packed_tokens": used,
+        "dropped_chunks": dropped_chunks,
+        "dropped_tokens": dropped_tokens,
+        "merged": merged,
+        "duplicates": duplicates,
+        "truncated": truncated,
+    }
+    return CHUNK_SEPARATOR.join(packed), report
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from app.core.config import CORPUS_VERSION_PATH, CORPUS_VERSION_CHECK_SECONDS
+
+# Damga dosyası: {"version": toplam, "components": {"corpus": n, "config": m}, "updated_at": ..., "reason": ...}
+# Sayaçlar sadece artar; okuyan süreç bildiği değerden farklıysa ilgili kısmı yeniler.
+
+_lock = threading.Lock()
+_components = {}
+_file_stamp = None
+_checked_at = 0.0
+
+def _read_file():
+    try:
+        with open(CORPUS_VERSION_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {"version": 0, "components": {}}
+    except Exception as e:
+        print(f"⚠️ Sürüm damgası okunamadı: {e}")
+        return None
+    data.setdefault("version", 0)
+    data.setdefault("components", {})
+    return data
+
+def _stat():
+    try:
+        stat = os.stat(CORPUS_VERSION_PATH)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def read_versions(max_age=CORPUS_VERSION_CHECK_SECONDS):
+    """
+    Bileşen sürümlerini döner: {"corpus": n, "config": m}.
+    Dosyanın değişip değişmediğine en fazla max_age saniyede bir bakılır (tek stat çağrısı);
+    içerik sadece dosya değiştiyse okunur. İstek başında çağrılacak kadar ucuzdur.
+    """
+    global _components, _file_stamp, _checked_at
+    now = time.monotonic()
+    if now - _checked_at < max_age:
+        return _components
+    with _lock:
+        _checked_at = now
+        stamp = _stat()
+        if stamp != _file_stamp:
+            data = _read_file()
+            if data is not None:  # Bozuk dosyada son bilinen sürümler kalır
+                _components = dict(data["components"])
+                _file_stamp = stamp
+        return _components
+
+def bump_version(component, reason=""):
+    """
+    Bileşenin sayacını bir artırır ve damgayı atomik olarak yazar (Admin API).
+    Okuyan süreçler değişikliği bir sonraki kontrolde görür. Yeni sayacı döner.
+    """
+    global _components, _file_stamp
+    with _lock:
+        data = _read_file() or {"version": 0, "components": {}}
+        data["components"][component] = data["components"].get(component, 0) + 1
+        data["version"] += 1
+        data["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        data["reason"] = reason
+
+        tmp_path = CORPUS_VERSION_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, CORPUS_VERSION_PATH)
+
+        _components = dict(data["components"])
+        _file_stamp = _stat()
+    print(f"🔖 Sürüm damgası: {component} -> {data['components'][component]} {reason}")
+    return data["components"][component]
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import EMBED_BATCH_MAX_SIZE, EMBED_BATCH_MAX_WAIT_MS
+
+class EmbeddingBatcher:
+    """
+    Eşzamanlı isteklerin sorgularını birkaç milisaniye içinde toplayıp
+    tek bir batch halinde encode eder.
+    - Encode işlemi olay döngüsü dışında, tek bir özel thread'de çalışır.
+    - Thread meşgulken gelen sorgular birikir ve bir sonraki batch'e eklenir.
+    - Sonuç vektörleri bekleyen isteklere geri dağıtılır.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS):
+        self._encode = encode_fn  # list[str] -> list[list[float]]
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-batcher")
+        self._pending = []        # [(metin, future)]
+        self._timer = None
+        self._busy = False
+
+        # İstatistikler
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.encode_seconds = 0.0
+
+    async def embed(self, text):
+        """Tek bir sorgunun vektörünü döner (batch'lenmiş olarak hesaplanır)."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None and not self._busy:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": len(self._pending),
+            "encode_seconds": round(self.encode_seconds, 3),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Encoder meşgulse bekleyenler iş bitince toplu olarak gönderilir
+        if self._busy or not self._pending:
+            return
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        self._busy = True
+
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self._executor, self._timed_encode, [text for text, _ in batch])
+        task.add_done_callback(lambda f: self._fan_out(batch, f))
+
+    def _timed_encode(self, texts):
+        started = time.perf_counter()
+        vectors = self._encode(texts)
+        self.encode_seconds += time.perf_counter() - started
+        return vectors
+
+    def _fan_out(self, batch, task):
+        self._busy = False
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        error = task.exception()
+        vectors = None if error else task.result()
+        for i, (_, future) in enumerate(batch):
+            if future.done():  # İstek iptal edilmiş olabilir
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(vectors[i])
+
+        # Beklerken biriken sorguları hemen gönder
+        if self._pending:
+            self._flush()
@@ -0,0 +1,213 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from app.core.config import (
+    GENERATION_MAX_IN_FLIGHT,
+    GENERATION_MAX_QUEUE,
+    GENERATION_MAX_QUEUED_PER_IP,
+    GENERATION_QUEUE_TIMEOUT_SECONDS,
+    GENERATION_PRIORITIES,
+    GENERATION_PRIORITY_AGING_SECONDS,
+)
+from app.services.metrics_service import GENERATION_REJECTED, record_stage
+
+class SchedulerRejected(Exception):
+    """İstek kabul edilmedi; HTTP cevabına status_code ve Retry-After olarak yansıtılır."""
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("mode", "ip", "future", "enqueued_at")
+
+    def __init__(self, mode, ip, future):
+        self.mode = mode
+        self.ip = ip
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+class GenerationScheduler:
+    """
+    Ollama'ya giden üretimlerin kabul kontrolü ve adil sıralaması.
+    - Aynı anda en fazla max_in_flight üretim çalışır; diğerleri kuyrukta bekler.
+    - Öncelik moda göredir (fast > thinking). Uzun süre bekleyen düşük öncelikli
+      istekler aging_seconds sonra öne alınır (açlık olmaz).
+    - Aynı öncelikte IP'ler sırayla (round-robin) hizmet alır; tek bir kullanıcı
+      çok soru gönderse de diğerlerini bekletmez.
+    - Kuyruk doluysa 503, tek IP'nin sırası doluysa 429 ile Retry-After önerilir.
+    """
+
+    def __init__(
+        self,
+        max_in_flight=GENERATION_MAX_IN_FLIGHT,
+        max_queue=GENERATION_MAX_QUEUE,
+        max_queued_per_ip=GENERATION_MAX_QUEUED_PER_IP,
+        queue_timeout=GENERATION_QUEUE_TIMEOUT_SECONDS,
+        priorities=GENERATION_PRIORITIES,
+        aging_seconds=GENERATION_PRIORITY_AGING_SECONDS,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queued_per_ip = max_queued_per_ip
+        self.queue_timeout = queue_timeout
+        self.priorities = dict(priorities)
+        self.aging_seconds = aging_seconds
+
+        self.in_flight = 0
+        self._queues = {}          # öncelik -> OrderedDict(ip -> deque[_Waiter]) (IP sırası = round-robin sırası)
+        self._queued = 0
+        self._queued_per_ip = {}
+
+        # İstatistikler (Retry-After tahmini için ortalama üretim süresi dahil)
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_service_seconds = 5.0
+
+    # --- Kabul kontrolü ---
+    def check_admission(self, mode, ip):
+        """
+        Kuyruğa girmeden önce sınırları kontrol eder; aşılıyorsa SchedulerRejected fırlatır.
+        Akış (streaming) cevabında HTTP durumunu başlıklar gönderilmeden belirlemek için de kullanılır.
+        """
+        if self.in_flight < self.max_in_flight and self._queued == 0:
+            return
+        if self._queued_per_ip.get(ip, 0) >= self.max_queued_per_ip:
+            self._reject(mode, "per_ip", 429, "Çok fazla bekleyen sorunuz var, lütfen önceki cevapları bekleyin.")
+        if self._queued >= self.max_queue:
+            self._reject(mode, "queue_full", 503, "Sistem şu anda çok yoğun, lütfen biraz sonra tekrar deneyin.")
+
+    @asynccontextmanager
+    async def slot(self, mode, ip):
+        """
+        async with scheduler.slot(mode, ip): ...  -> blok süresince bir üretim hakkı tutulur.
+        Bekleme süresi 'queue_wait' aşaması olarak metriklere yazılır.
+        """
+        started = time.monotonic()
+        await self._acquire(mode, ip)
+        record_stage("queue_wait", time.monotonic() - started)
+        granted_at = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - granted_at
+            self.avg_service_seconds = 0.9 * self.avg_service_seconds + 0.1 * elapsed
+            self._release()
+
+    def retry_after(self):
+        """Kuyruğun boşalması için tahmini süre (saniye)."""
+        waiting = self._queued + self.in_flight
+        return max(1, math.ceil(waiting * self.avg_service_seconds / max(1, self.max_in_flight)))
+
+    def stats(self):
+        queued_by_mode = {}
+        for queue in self._queues.values():
+            for waiters in queue.values():
+                for waiter in waiters:
+                    queued_by_mode[waiter.mode] = queued_by_mode.get(waiter.mode, 0) + 1
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self._queued,
+            "queued_by_mode": queued_by_mode,
+            "queued_ips": len(self._queued_per_ip),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_service_seconds": round(self.avg_service_seconds, 2),
+        }
+
+    # --- İç işleyiş ---
+    async def _acquire(self, mode, ip):
+        self.check_admission(mode, ip)
+        if self.in_flight < self.max_in_flight and self._queued == 0:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        waiter = _Waiter(mode, ip, asyncio.get_running_loop().create_future())
+        self._enqueue(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if self._cancel(waiter):
+                self._reject(mode, "timeout", 503, "Sıra bekleme süresi doldu, lütfen tekrar deneyin.")
+        except asyncio.CancelledError:
+            # İstemci bağlantıyı kapattı: Sıradaysa çıkar, hak verilmişse geri bırak
+            if not self._cancel(waiter):
+                self._release()
+            raise
+        self.admitted += 1
+
+    def _enqueue(self, waiter):
+        priority = self.priorities.get(waiter.mode, max(self.priorities.values(), default=0))
+        queue = self._queues.setdefault(priority, OrderedDict())
+        queue.setdefault(waiter.ip, deque()).append(waiter)
+        self._queued += 1
+        self._queued_per_ip[waiter.ip] = self._queued_per_ip.get(waiter.ip, 0) + 1
+
+    def _cancel(self, waiter):
+        """Bekleyen isteği kuyruktan çıkarır. Zaten hak verilmişse False döner."""
+        if waiter.future.done():
+            return False
+        waiter.future.cancel()
+        for queue in self._queues.values():
+            waiters = queue.get(waiter.ip)
+            if waiters and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del queue[waiter.ip]
+                self._forget(waiter)
+                break
+        return True
+
+    def _forget(self, waiter):
+        self._queued -= 1
+        remaining = self._queued_per_ip.get(waiter.ip, 1) - 1
+        if remaining:
+            self._queued_per_ip[waiter.ip] = remaining
+        else:
+            self._queued_per_ip.pop(waiter.ip, None)
+
+    def _release(self):
+        self.in_flight -= 1
+        while self.in_flight < self.max_in_flight:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+    def _next_waiter(self):
+        """En yüksek öncelikli kuyruktan, sıradaki IP'nin en eski isteğini seçer."""
+        now = time.monotonic()
+        best_priority = None
+        for priority, queue in self._queues.items():
+            if not queue:
+                continue
+            # Sıradaki IP'nin en eski isteği uzun süredir bekliyorsa en yüksek önceliğe yükselir
+            head = next(iter(queue.values()))[0]
+            effective = priority if now - head.enqueued_at < self.aging_seconds else min(self.priorities.values(), default=0) - 1
+            if best_priority is None or effective < best_priority[0]:
+                best_priority = (effective, priority)
+        if best_priority is None:
+            return None
+
+        queue = self._queues[best_priority[1]]
+        ip, waiters = next(iter(queue.items()))
+        waiter = waiters.popleft()
+        # Round-robin: Bu IP'nin kalan istekleri sıranın sonuna geçer
+        del queue[ip]
+        if waiters:
+            queue[ip] = waiters
+        self._forget(waiter)
+        return waiter
+
+    def _reject(self, mode, reason, status_code, detail):
+        self.rejected += 1
+        GENERATION_REJECTED.inc(mode=mode, reason=reason)
+        raise SchedulerRejected(status_code, detail, self.retry_after())
@@ -0,0 +1,70 @@
+import hashlib
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.core.config import RETRIEVER_K, RETRIEVAL_MODE, HYBRID_CANDIDATES, HYBRID_RRF_K
+from app.services.lexical_index import get_lexical_index
+
+class HybridRetriever(BaseRetriever):
+    """
+    Yoğun (bge-m3 / Chroma) ve kelime tabanlı (BM25) aramayı
+    Reciprocal Rank Fusion (RRF) ile birleştiren retriever.
+    Ürün ve sistem adları (Rollmech, E-PCR, Mikado...) gibi birebir eşleşmeler
+    yoğun aramada kaçsa bile BM25 ile bulunur.
+    """
+
+    vectorstore: Any
+    k: int = RETRIEVER_K
+    candidates: int = HYBRID_CANDIDATES
+    mode: str = RETRIEVAL_MODE   # "hybrid" veya "dense"
+    lexical_index: Any = None    # Verilmezse uygulamanın ortak BM25 indeksi kullanılır
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search(query)
+
+    def search(self, query: str, query_vector=None) -> List[Document]:
+        """
+        Sorguya en uygun k parçayı döner.
+        query_vector verilirse embedding tekrar hesaplanmaz.
+        """
+        if query_vector is not None:
+            dense = self.vectorstore.similarity_search_by_vector(query_vector, k=self.candidates)
+        else:
+            dense = self.vectorstore.similarity_search(query, k=self.candidates)
+
+        if self.mode != "hybrid":
+            return dense[:self.k]
+
+        index = self.lexical_index if self.lexical_index is not None else get_lexical_index()
+        lexical = index.search(query, k=self.candidates)
+        return self._fuse(dense, [chunk_id for chunk_id, _ in lexical])
+
+    def _fuse(self, dense_docs, lexical_ids):
+        scores = {}
+        docs = {}
+        for rank, doc in enumerate(dense_docs):
+            key = _doc_key(doc)
+            docs[key] = doc
+            scores[key] = scores.get(key, 0.0) + 1.0 / (HYBRID_RRF_K + rank + 1)
+        for rank, chunk_id in enumerate(lexical_ids):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (HYBRID_RRF_K + rank + 1)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:self.k]
+
+        # Sadece BM25 ile bulunan parçaların metni Chroma'dan okunur
+        missing = [key for key in ranked if key not in docs]
+        if missing:
+            found = self.vectorstore.get(ids=missing, include=["documents", "metadatas"])
+            for chunk_id, text, meta in zip(found["ids"], found["documents"], found["metadatas"]):
+                docs[chunk_id] = Document(id=chunk_id, page_content=text, metadata=meta or {})
+
+        return [docs[key] for key in ranked if key in docs]
+
+def _doc_key(doc):
+    """Chroma id'si varsa onu, yoksa içerikten türetilen anahtarı kullanır."""
+    if getattr(doc, "id", None):
+        return doc.id
+    return "sha1:" + hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
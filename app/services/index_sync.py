@@ -0,0 +1,411 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from app.core.config import (
+    DATA_PATH,
+    INDEX_MANIFEST_PATH,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    INDEX_WRITE_BATCH_SIZE,
+)
+from app.services.pdf_loader import iter_pdf_documents
+from app.services.cache_service import answer_cache
+from app.services.lexical_index import get_lexical_index, save_lexical_index, reset_lexical_index
+
+# Aynı süreçte senkronizasyon ve canlı belge ekleme aynı anda çalışmasın
+_index_lock = threading.RLock()
+
+# ==========================================================
+# 1. MANIFEST (Hangi dosya, hangi hash, hangi parça id'leri)
+# ==========================================================
+
+def load_manifest():
+    """Manifest dosyasını okur. Yoksa veya bozuksa boş manifest döner."""
+    if os.path.exists(INDEX_MANIFEST_PATH):
+        try:
+            with open(INDEX_MANIFEST_PATH, "r", encoding="utf-8") as f:
+                data = json.load(f)
+                data.setdefault("files", {})
+                return data
+        except Exception as e:
+            print(f"⚠️ Manifest okunamadı, boş kabul ediliyor: {e}")
+    return {"version": 1, "files": {}}
+
+def save_manifest(manifest):
+    """Manifest'i önce geçici dosyaya yazar, sonra atomik olarak değiştirir."""
+    tmp_path = INDEX_MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, INDEX_MANIFEST_PATH)
+
+def file_fingerprint(file_path, previous=None):
+    """
+    Dosyanın boyut, değiştirilme zamanı ve SHA-256 özetini döner.
+    Boyut ve zaman önceki kayıtla aynıysa dosya tekrar okunmaz.
+    """
+    stat = os.stat(file_path)
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+        return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": previous["sha256"]}
+
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": h.hexdigest()}
+
+def make_chunk_ids(source, count, start=0):
+    """Kaynağa bağlı, deterministik parça id'leri: 'dosya.pdf::0', 'dosya.pdf::1', ..."""
+    return [f"{source}::{i}" for i in range(start, start + count)]
+
+def make_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """İndeksleme ve değerlendirme aracının ortak kullandığı metin bölücü."""
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+
+# ==========================================================
+# 2. PLANLAMA (Dry-run)
+# ==========================================================
+
+def plan_sync(data_path=DATA_PATH, manifest=None):
+    """
+    Klasör ile manifest'i karşılaştırır.
+    Dönen sözlük: new / changed / removed / unchanged dosya adları ve yeni parmak izleri.
+    """
+    manifest = manifest or load_manifest()
+    known = manifest["files"]
+
+    on_disk = []
+    if os.path.exists(data_path):
+        on_disk = sorted(f for f in os.listdir(data_path) if f.lower().endswith(".pdf"))
+
+    plan = {"new": [], "changed": [], "removed": [], "unchanged": [], "fingerprints": {}}
+    for filename in on_disk:
+        previous = known.get(filename)
+        try:
+            fingerprint = file_fingerprint(os.path.join(data_path, filename), previous)
+        except OSError as e:
+            print(f"   ❌ Okunamadı ({filename}): {e}")
+            continue
+        plan["fingerprints"][filename] = fingerprint
+
+        if previous is None:
+            plan["new"].append(filename)
+        elif previous.get("sha256") != fingerprint["sha256"]:
+            plan["changed"].append(filename)
+        else:
+            plan["unchanged"].append(filename)
+
+    plan["removed"] = sorted(set(known) - set(on_disk))
+    return plan
+
+# ==========================================================
+# 3. SENKRONİZASYON
+# ==========================================================
+
+def sync_index(vectorstore, data_path=DATA_PATH, dry_run=False, rebuild=False, progress=None):
+    """
+    'belgelerim' klasörünü Chroma ile eşitler:
+    - Yeni / değişen PDF'ler embed edilir (eski parçaları silinir).
+    - Klasörden kaldırılan PDF'lerin parçaları silinir.
+    - Değişmeyen dosyalara dokunulmaz.
+    dry_run=True ise hiçbir şey yazılmaz, sadece ne değişeceği raporlanır.
+    rebuild=True ise eski manifest yok sayılır (Chroma klasörü sıfırdan kurulurken).
+    progress verilirse ilerleme bildirilir (bkz. _write_file_chunks).
+    """
+    started = time.perf_counter()
+    with _index_lock:
+        if rebuild:
+            manifest = {"version": 1, "files": {}}
+            reset_lexical_index()
+        else:
+            manifest = load_manifest()
+        plan = plan_sync(data_path, manifest)
+
+        report = {
+            "dry_run": dry_run,
+            "new": plan["new"],
+            "changed": plan["changed"],
+            "removed": plan["removed"],
+            "unchanged": len(plan["unchanged"]),
+            "chunks_added": 0,
+            "chunks_deleted": 0,
+            "failed": {},
+        }
+
+        if dry_run:
+            report["chunks_deleted"] = sum(len(manifest["files"][f].get("chunk_ids", [])) for f in plan["changed"] + plan["removed"])
+            report["seconds"] = round(time.perf_counter() - started, 2)
+            return report
+
+        # A. Kaldırılan dosyalar
+        for filename in plan["removed"]:
+            entry = manifest["files"].pop(filename)
+            ids = set(entry.get("chunk_ids", [])) | set(_ids_for_source(vectorstore, filename))
+            _delete_chunks(vectorstore, ids)
+            report["chunks_deleted"] += len(ids)
+            print(f"   🗑️ {filename}: {len(ids)} parça silindi.")
+
+        # B. Yeni ve değişen dosyalar (sayfalar paralel okunur, dosya dosya yazılır)
+        to_index = plan["new"] + plan["changed"]
+        if to_index:
+            paths = [os.path.join(data_path, f) for f in to_index]
+            file_stats = {}
+            # Bir dosyanın grubu, sıradaki dosyanın ilk sayfası gelince üretilir; o ana kadar
+            # dosyanın tüm sayfa aralıkları okunmuş ve hataları file_stats'a yazılmıştır.
+            for filename, pages in _group_by_source(iter_pdf_documents(paths, file_stats=file_stats)):
+                if _extraction_failed(file_stats, filename):
+                    _report(progress, files=1)
+                    continue
+                added, deleted = _write_file_chunks(vectorstore, filename, pages, manifest, plan["fingerprints"][filename], progress)
+                report["chunks_added"] += added
+                report["chunks_deleted"] += deleted
+                _report(progress, files=1)
+
+            # Okunamayan dosyaların eski parçaları ve manifest kaydı korunur (sonraki senkronda tekrar denenir)
+            report["failed"] = {f: file_stats[f]["errors"] for f in to_index if _extraction_failed(file_stats, f)}
+            for filename, errors in report["failed"].items():
+                print(f"   ⚠️ {filename}: okunamadı, eski parçalar korunuyor ({'; '.join(errors)})")
+
+            # Hiç metin çıkmayan dosyalar da manifest'e girsin (her seferinde tekrar okunmasın)
+            for filename in to_index:
+                if filename in report["failed"]:
+                    continue
+                if filename not in manifest["files"] or manifest["files"][filename]["sha256"] != plan["fingerprints"][filename]["sha256"]:
+                    _, deleted = _write_file_chunks(vectorstore, filename, [], manifest, plan["fingerprints"][filename])
+                    report["chunks_deleted"] += deleted
+
+        if plan["removed"] or to_index:
+            save_manifest(manifest)
+            save_lexical_index()
+            answer_cache.invalidate("(İndeks senkronize edildi)")
+
+    report["seconds"] = round(time.perf_counter() - started, 2)
+    print(f"🔁 İndeks senkronizasyonu: {len(report['new'])} yeni, {len(report['changed'])} değişen, "
+          f"{len(report['removed'])} silinen dosya | +{report['chunks_added']} / -{report['chunks_deleted']} parça "
+          f"({report['seconds']} sn)")
+    return report
+
+def index_file(vectorstore, file_path, pages, progress=None):
+    """
+    Tek bir PDF'in (canlı belge ekleme) sayfalarını indeksler ve manifest'i günceller.
+    pages bir üreteç olabilir; sayfalar geldikçe parçalanıp yazılır.
+    Eklenen parça sayısını döner.
+    """
+    filename = os.path.basename(file_path)
+    with _index_lock:
+        manifest = load_manifest()
+        fingerprint = file_fingerprint(file_path)
+        added, _ = _write_file_chunks(vectorstore, filename, pages, manifest, fingerprint, progress)
+        save_manifest(manifest)
+        save_lexical_index()
+    return added
+
+def remove_file(vectorstore, filename):
+    """
+    Yayından kaldırılan dosyanın tüm parçalarını (manifest + metadata.source) siler.
+    Silinen parça sayısını döner.
+    """
+    with _index_lock:
+        manifest = load_manifest()
+        entry = manifest["files"].pop(filename, {})
+        ids = set(entry.get("chunk_ids", [])) | set(_ids_for_source(vectorstore, filename))
+        _delete_chunks(vectorstore, ids)
+        save_manifest(manifest)
+        save_lexical_index()
+    print(f"   🗑️ {filename}: {len(ids)} parça indeksten silindi.")
+    return len(ids)
+
+# ==========================================================
+# 4. BAKIM (Sahipsiz ve tekrarlanan parçalar)
+# ==========================================================
+
+def find_index_issues(vectorstore, data_path=DATA_PATH, page_size=1000):
+    """
+    Chroma'daki tüm parçaları tarar:
+    - orphans: Kaynak dosyası artık 'belgelerim'de olmayan parçalar
+    - duplicates: Aynı dosyanın eski (uuid id'li) kopyaları; dosya kaynak tabanlı id'lerle
+      ('dosya.pdf::0') tekrar indekslendiyse bunlar fazlalıktır
+    - duplicate_files: İçeriği aynı olan dosya grupları (dosya SHA-256'sı veya çıkarılan metin aynı)
+    - cross_file_duplicate_chunks: Başka bir yayındaki dosyada da birebir geçen parça sayısı
+    Farklı dosyalar arasındaki ve dosya içindeki tekrarlar SİLİNMEZ, sadece raporlanır:
+    İki dosya da yayında olduğu sürece parçaları indekste kalmalıdır (biri kaldırılırsa
+    diğerinin içeriği kaybolmasın; manifest'teki SHA değişmediği için sync geri eklemez).
+    """
+    on_disk = set()
+    if os.path.exists(data_path):
+        on_disk = {f for f in os.listdir(data_path) if f.lower().endswith(".pdf")}
+
+    rows = []
+    offset = 0
+    while True:
+        batch = vectorstore.get(include=["metadatas", "documents"], limit=page_size, offset=offset)
+        if not batch["ids"]:
+            break
+        for chunk_id, meta, text in zip(batch["ids"], batch["metadatas"], batch["documents"]):
+            rows.append((chunk_id, (meta or {}).get("source"), hashlib.sha1((text or "").encode("utf-8")).hexdigest()))
+        offset += len(batch["ids"])
+
+    orphans = [chunk_id for chunk_id, source, _ in rows if source not in on_disk]
+    orphan_set = set(orphans)
+
+    live = [row for row in rows if row[0] not in orphan_set]
+
+    # Eski (uuid) id'li parçalar, kaynakları kaynak tabanlı id'lerle yeniden yazılmışsa fazlalıktır
+    keyed_sources = {source for chunk_id, source, _ in live if chunk_id.startswith(f"{source}::")}
+    duplicates = [
+        chunk_id for chunk_id, source, _ in live
+        if source in keyed_sources and not chunk_id.startswith(f"{source}::")
+    ]
+
+    # Dosyalar arası tekrarlar (sadece rapor)
+    digests_by_source = {}
+    sources_by_digest = {}
+    for chunk_id, source, digest in live:
+        if chunk_id.startswith(f"{source}::"):
+            digests_by_source.setdefault(source, set()).add(digest)
+            sources_by_digest.setdefault(digest, set()).add(source)
+    cross_file = sum(
+        1 for chunk_id, source, digest in live
+        if chunk_id.startswith(f"{source}::") and len(sources_by_digest[digest]) > 1
+    )
+
+    groups = {}
+    for filename, entry in load_manifest()["files"].items():
+        groups.setdefault(("sha256", entry.get("sha256")), set()).add(filename)
+    for source, digests in digests_by_source.items():
+        groups.setdefault(("text", frozenset(digests)), set()).add(source)
+    duplicate_files = sorted({tuple(sorted(names)) for names in groups.values() if len(names) > 1})
+
+    return {
+        "total_chunks": len(rows),
+        "orphans": orphans,
+        "duplicates": duplicates,
+        "duplicate_files": [list(names) for names in duplicate_files],
+        "cross_file_duplicate_chunks": cross_file,
+    }
+
+def purge_index_issues(vectorstore, data_path=DATA_PATH, dry_run=True):
+    """
+    Sahipsiz ve tekrarlanan parçaları raporlar; dry_run=False ise sahipsiz parçaları ve
+    dosyaların eski (uuid id'li) kopyalarını siler, manifest'teki parça listelerini günceller.
+    Aynı içerikli farklı dosyalar (duplicate_files) silinmez; hangisinin kaldırılacağına yönetici karar verir.
+    """
+    with _index_lock:
+        issues = find_index_issues(vectorstore, data_path)
+        report = {
+            "dry_run": dry_run,
+            "total_chunks": issues["total_chunks"],
+            "orphan_chunks": len(issues["orphans"]),
+            "duplicate_chunks": len(issues["duplicates"]),
+            "duplicate_files": issues["duplicate_files"],
+            "cross_file_duplicate_chunks": issues["cross_file_duplicate_chunks"],
+        }
+        if dry_run:
+            return report
+
+        purged = set(issues["orphans"]) | set(issues["duplicates"])
+        _delete_chunks(vectorstore, purged)
+
+        manifest = load_manifest()
+        for entry in manifest["files"].values():
+            entry["chunk_ids"] = [i for i in entry.get("chunk_ids", []) if i not in purged]
+        save_manifest(manifest)
+        save_lexical_index()
+
+        if purged:
+            answer_cache.invalidate("(İndeks temizlendi)")
+        report["purged_chunks"] = len(purged)
+
+    print(f"🧹 İndeks bakımı: {report['orphan_chunks']} sahipsiz, {report['duplicate_chunks']} tekrarlanan parça silindi.")
+    return report
+
+def _extraction_failed(file_stats, filename):
+    return bool(file_stats.get(filename, {}).get("errors"))
+
+def _group_by_source(documents):
+    """Sıralı Document akışını (kaynak, [sayfalar]) gruplarına ayırır."""
+    current, pages = None, []
+    for doc in documents:
+        source = doc.metadata["source"]
+        if current is not None and source != current:
+            yield current, pages
+            pages = []
+        current = source
+        pages.append(doc)
+    if current is not None:
+        yield current, pages
+
+def _write_file_chunks(vectorstore, filename, pages, manifest, fingerprint, progress=None):
+    """
+    Bir dosyanın parçalarını kaynak tabanlı id'lerle yazar (upsert),
+    o kaynağa ait artık kullanılmayan eski parçaları siler ve manifest kaydını günceller.
+    Sayfalar tek tek parçalanır ve INDEX_WRITE_BATCH_SIZE'lık gruplar halinde yazılır.
+    progress(pages=.., chunks_embedded=.., chunks_written=..) artışlarla çağrılır;
+    fırlattığı hata (örn. iş iptali) yazmayı durdurur, manifest güncellenmez.
+    """
+    previous = manifest["files"].get(filename, {})
+    old_ids = set(previous.get("chunk_ids", [])) | set(_ids_for_source(vectorstore, filename))
+
+    new_ids = []
+    batch = []
+    for chunk in _iter_chunks(pages, progress):
+        batch.append(chunk)
+        if len(batch) >= INDEX_WRITE_BATCH_SIZE:
+            new_ids.extend(_write_batch(vectorstore, filename, len(new_ids), batch, progress))
+            batch = []
+    if batch:
+        new_ids.extend(_write_batch(vectorstore, filename, len(new_ids), batch, progress))
+
+    stale = old_ids - set(new_ids)
+    _delete_chunks(vectorstore, stale)
+
+    manifest["files"][filename] = {
+        **fingerprint,
+        "chunk_ids": new_ids,
+        "indexed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    print(f"   ✅ {filename}: {len(new_ids)} parça yazıldı, {len(stale)} eski parça silindi.")
+    return len(new_ids), len(stale)
+
+def _iter_chunks(pages, progress=None):
+    """Sayfaları sırayla parçalar (her sayfa kendi içinde bölünür)."""
+    splitter = make_splitter()
+    for page in pages:
+        _report(progress, pages=1)
+        yield from splitter.split_documents([page])
+
+def _write_batch(vectorstore, filename, first_index, chunks, progress=None):
+    ids = make_chunk_ids(filename, len(chunks), start=first_index)
+    texts = [c.page_content for c in chunks]
+    # Embedding ve yazma ayrı adımlar (ilerleme ikisi için ayrı raporlanır);
+    # Chroma.add_documents da aynı şekilde embed edip upsert eder.
+    vectors = vectorstore.embeddings.embed_documents(texts)
+    _report(progress, chunks_embedded=len(chunks))
+    vectorstore._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=[c.metadata for c in chunks])
+    # Kelime (BM25) indeksi de aynı id'lerle güncellenir
+    get_lexical_index().add(ids, texts)
+    _report(progress, chunks_written=len(chunks))
+    return ids
+
+def _report(progress, **increments):
+    if progress is not None:
+        progress(**increments)
+
+def _ids_for_source(vectorstore, source):
+    """Chroma'da verilen kaynağa (metadata.source) ait tüm parça id'leri."""
+    try:
+        return vectorstore.get(where={"source": source}, include=[])["ids"]
+    except Exception as e:
+        print(f"⚠️ Kaynak parçaları okunamadı ({source}): {e}")
+        return []
+
+def _delete_chunks(vectorstore, ids):
+    ids = list(ids)
+    get_lexical_index().remove(ids)
+    for i in range(0, len(ids), INDEX_WRITE_BATCH_SIZE):
+        vectorstore.delete(ids=ids[i:i + INDEX_WRITE_BATCH_SIZE])
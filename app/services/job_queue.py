@@ -0,0 +1,382 @@
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from app.core.config import (
+    JOBS_DB_PATH,
+    JOB_WORKERS,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_DELAY_SECONDS,
+    JOB_POLL_SECONDS,
+    JOB_PROGRESS_SAVE_SECONDS,
+)
+
+# İş durumları
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_JOB_COLUMNS = (
+    "id, kind, payload, status, attempts, max_attempts, progress, result, error, "
+    "created_by, created_at, started_at, finished_at, run_after, cancel_requested"
+)
+
+class JobCancelled(Exception):
+    """Çalışan iş iptal edildi; işleyici ilerleme bildirirken fırlatılır."""
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+class JobContext:
+    """
+    İşleyiciye verilen ilerleme nesnesi.
+    ctx(pages=1) / ctx.advance(chunks_written=32) sayaçları artırır; iş iptal edildiyse
+    JobCancelled fırlatır. İlerleme veritabanına en fazla JOB_PROGRESS_SAVE_SECONDS'ta bir yazılır.
+    """
+
+    def __init__(self, queue, job):
+        self._queue = queue
+        self.job_id = job["id"]
+        self.attempt = job["attempts"]
+        # Her deneme sayaçları sıfırdan başlatır (önceki denemenin ilerlemesi üstüne eklenmez)
+        self.progress = {}
+        self._saved_at = 0.0
+
+    def advance(self, **increments):
+        for key, value in increments.items():
+            self.progress[key] = self.progress.get(key, 0) + value
+        self._save()
+        self.check_cancelled()
+
+    __call__ = advance
+
+    def check_cancelled(self):
+        if self._queue.is_cancel_requested(self.job_id):
+            raise JobCancelled()
+
+    def _save(self, force=False):
+        now = time.monotonic()
+        if force or now - self._saved_at >= JOB_PROGRESS_SAVE_SECONDS:
+            self._saved_at = now
+            self._queue._update(self.job_id, progress=json.dumps(self.progress))
+
+class JobQueue:
+    """
+    SQLite'ta kalıcı, sınırlı sayıda işçiyle çalışan arka plan iş kuyruğu (Admin API).
+    - submit(kind, payload) işi kaydeder ve hemen döner; işçiler sırayla (id sırası) alır.
+    - Hata alan iş JOB_MAX_ATTEMPTS'e kadar, artan beklemeyle tekrar kuyruğa girer.
+    - cancel(): Bekleyen iş hemen iptal edilir; çalışan iş bir sonraki ilerleme bildiriminde durur.
+    - Süreç kapanırken yarım kalan işler bir sonraki açılışta tekrar kuyruğa alınır.
+    İşleyiciler register(kind, handler, on_cancel) ile eklenir:
+        handler(payload, ctx) -> sonuç (JSON'a çevrilebilir)
+        on_cancel(payload)    -> iptal / kalıcı hata sonrası temizlik (isteğe bağlı)
+    """
+
+    def __init__(self, db_path=JOBS_DB_PATH, workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS,
+                 retry_delay=JOB_RETRY_DELAY_SECONDS, poll_seconds=JOB_POLL_SECONDS):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_seconds = poll_seconds
+        self._handlers = {}
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._cancel_requested = set()
+        self._cancel_lock = threading.Lock()
+
+    # --- Kurulum ---
+    def register(self, kind, handler, on_cancel=None):
+        self._handlers[kind] = (handler, on_cancel)
+
+    def init_db(self):
+        """Tabloyu oluşturur; önceki çalışmadan 'running' kalan işleri tekrar kuyruğa alır."""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER DEFAULT 0,
+                    max_attempts INTEGER,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_by TEXT,
+                    created_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    run_after REAL DEFAULT 0,
+                    cancel_requested INTEGER DEFAULT 0
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)")
+            resumed = conn.execute(
+                "UPDATE jobs SET status = ?, run_after = 0 WHERE status = ?", (QUEUED, RUNNING)
+            ).rowcount
+            if resumed:
+                print(f"♻️ Yarım kalan {resumed} iş tekrar kuyruğa alındı.")
+            # Kapanmadan önce istenen iptaller
+            for (job_id,) in conn.execute("SELECT id FROM jobs WHERE cancel_requested = 1 AND status = ?", (QUEUED,)):
+                self._cancel_requested.add(job_id)
+        finally:
+            conn.close()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🧵 İş kuyruğu başlatıldı ({self.workers} işçi)")
+
+    def stop(self, timeout=10):
+        """İşçileri durdurur. Çalışan iş süre içinde bitmezse bir sonraki açılışta tekrar alınır."""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # --- İş yönetimi ---
+    def submit(self, kind, payload=None, created_by=None, unique=False):
+        """
+        İşi kuyruğa ekler ve kaydını döner.
+        unique=True ise aynı türde ve aynı içerikte bekleyen / çalışan iş varsa o döner.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Bilinmeyen iş türü: {kind}")
+        payload_text = json.dumps(payload or {}, ensure_ascii=False, sort_keys=True)
+        conn = self._connect()
+        try:
+            if unique:
+                row = conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM jobs WHERE kind = ? AND payload = ? AND status IN (?, ?) ORDER BY id LIMIT 1",
+                    (kind, payload_text, *ACTIVE_STATUSES),
+                ).fetchone()
+                if row:
+                    return self._row_to_job(row)
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, payload, status, max_attempts, progress, created_by, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, payload_text, QUEUED, self.max_attempts, "{}", created_by, _now()),
+            ).lastrowid
+        finally:
+            conn.close()
+        self._notify()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        conn = self._connect()
+        try:
+            row = conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_job(row) if row else None
+
+    def list(self, status=None, limit=50):
+        query = f"SELECT {_JOB_COLUMNS} FROM jobs"
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        conn = self._connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel(self, job_id):
+        """Bekleyen işi iptal eder, çalışan işe iptal isteği bırakır. Güncel kaydı (veya None) döner."""
+        job = self.get(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return job
+        with self._cancel_lock:
+            self._cancel_requested.add(job_id)
+        conn = self._connect()
+        try:
+            cancelled_now = conn.execute(
+                "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, _now(), job_id, QUEUED),
+            ).rowcount
+            if not cancelled_now:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+        finally:
+            conn.close()
+        if cancelled_now:
+            self._forget_cancel(job_id)
+            self._cleanup(job)
+        return self.get(job_id)
+
+    def retry(self, job_id):
+        """
+        Başarısız veya iptal edilmiş işi deneme sayacını sıfırlayarak tekrar kuyruğa alır.
+        Güncel kaydı döner; iş bulunamadıysa veya bu arada durumu değiştiyse None döner.
+        """
+        conn = self._connect()
+        try:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, error = NULL, result = NULL, progress = '{}', "
+                "run_after = 0, cancel_requested = 0, started_at = NULL, finished_at = NULL "
+                "WHERE id = ? AND status IN (?, ?)",
+                (QUEUED, job_id, FAILED, CANCELLED),
+            ).rowcount
+        finally:
+            conn.close()
+        if not updated:
+            return None
+        self._notify()
+        return self.get(job_id)
+
+    def is_cancel_requested(self, job_id):
+        return job_id in self._cancel_requested
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        finally:
+            conn.close()
+        return {
+            "workers": self.workers,
+            "workers_alive": self.running,
+            **{status: counts.get(status, 0) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)},
+        }
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    # --- İşçi ---
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"❌ İş kuyruğu okunamadı: {e}")
+                job = None
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_seconds)
+                continue
+            self._execute(job)
+
+    def _claim(self):
+        """Sıradaki uygun işi tek transaction'da 'running' olarak işaretleyip döner."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE status = ? AND run_after <= ? ORDER BY id LIMIT 1",
+                (QUEUED, time.time()),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, error = NULL WHERE id = ?",
+                (RUNNING, _now(), row[0]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        job = self._row_to_job(row)
+        job["status"], job["attempts"] = RUNNING, job["attempts"] + 1
+        return job
+
+    def _execute(self, job):
+        handler, _ = self._handlers.get(job["kind"], (None, None))
+        ctx = JobContext(self, job)
+        started = time.perf_counter()
+        print(f"⚙️ İş #{job['id']} başladı: {job['kind']} {job['payload']} (deneme {job['attempts']}/{job['max_attempts']})")
+        try:
+            if handler is None:
+                raise ValueError(f"Bilinmeyen iş türü: {job['kind']}")
+            ctx.check_cancelled()
+            result = handler(job["payload"], ctx)
+        except JobCancelled:
+            self._cancelled(job, ctx)
+        except Exception as e:
+            if self.is_cancel_requested(job["id"]):
+                self._cancelled(job, ctx)
+            elif job["attempts"] < job["max_attempts"]:
+                delay = self.retry_delay * job["attempts"]
+                self._update(job["id"], status=QUEUED, error=str(e), run_after=time.time() + delay,
+                             progress=json.dumps(ctx.progress))
+                print(f"⚠️ İş #{job['id']} hata verdi, {delay} sn sonra tekrar denenecek: {e}")
+            else:
+                self._finish(job, ctx, FAILED, error=str(e))
+                self._cleanup(job)
+                print(f"❌ İş #{job['id']} başarısız: {e}")
+        else:
+            self._finish(job, ctx, SUCCEEDED, result=result)
+            print(f"✅ İş #{job['id']} tamamlandı ({time.perf_counter() - started:.1f} sn)")
+        finally:
+            self._forget_cancel(job["id"])
+
+    def _cancelled(self, job, ctx):
+        self._finish(job, ctx, CANCELLED, error="İptal edildi")
+        self._cleanup(job)
+        print(f"🛑 İş #{job['id']} iptal edildi.")
+
+    def _finish(self, job, ctx, status, result=None, error=None):
+        self._update(
+            job["id"], status=status, finished_at=_now(), error=error,
+            result=json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+            progress=json.dumps(ctx.progress),
+        )
+
+    def _cleanup(self, job):
+        _, on_cancel = self._handlers.get(job["kind"], (None, None))
+        if on_cancel is None:
+            return
+        try:
+            on_cancel(job["payload"])
+        except Exception as e:
+            print(f"⚠️ İş #{job['id']} temizliği yapılamadı: {e}")
+
+    def _forget_cancel(self, job_id):
+        with self._cancel_lock:
+            self._cancel_requested.discard(job_id)
+
+    def _notify(self):
+        with self._wakeup:
+            self._wakeup.notify()
+
+    # --- Veritabanı ---
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _update(self, job_id, **values):
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        conn = self._connect()
+        try:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values.values(), job_id))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(zip([c.strip() for c in _JOB_COLUMNS.split(",")], row))
+        for key in ("payload", "progress", "result"):
+            job[key] = json.loads(job[key]) if job[key] else ({} if key != "result" else None)
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+# Admin API süreci genelinde tek kuyruk (lifespan'de başlatılır)
+job_queue = JobQueue()
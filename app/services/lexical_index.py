@@ -0,0 +1,191 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from app.core.config import LEXICAL_INDEX_PATH, LEXICAL_STEM_LENGTH
+
+# Türkçe büyük/küçük harf dönüşümü (I -> ı, İ -> i); str.lower() bunu yanlış yapar
+_TR_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+# Kullanıcılar çoğu zaman Türkçe karakter kullanmadan yazar ("onaylanir", "KPI"); eşleşme için sadeleştirilir
+_TR_FOLD = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+_WORD_RE = re.compile(r"[0-9a-z]+(?:-[0-9a-z]+)*")
+
+# Aramada ayırt ediciliği olmayan sık kelimeler
+STOPWORDS = {
+    "ve", "veya", "ile", "bir", "bu", "su", "da", "de", "mi", "mu",
+    "icin", "gibi", "daha", "cok", "en", "ne", "nasil", "nedir", "neden", "nerede",
+    "hangi", "kadar", "olan", "olarak", "ise", "ya", "ki", "her", "tum", "ben", "sen",
+    "biz", "siz", "onu", "bunu", "var", "yok", "nelerdir",
+}
+
+def tokenize(text):
+    """
+    Türkçe uyumlu basit tokenizer:
+    - Türkçe küçük harfe çevirme (İ/I) ve Türkçe karakterlerin sadeleştirilmesi (ş -> s, ı -> i ...)
+    - Tireli kelimeler hem parçalarıyla hem birleşik halleriyle ("e-pcr" -> e, pcr, epcr)
+    - İlk N karakter kökleme (Türkçe ekler için etkili ve hızlı bir yöntem)
+    """
+    if not text:
+        return []
+    text = text.translate(_TR_LOWER).lower().translate(_TR_FOLD)
+    tokens = []
+    for word in _WORD_RE.findall(text):
+        parts = word.split("-")
+        candidates = parts + (["".join(parts)] if len(parts) > 1 else [])
+        for token in candidates:
+            if len(token) < 2 or token in STOPWORDS:
+                continue
+            tokens.append(token[:LEXICAL_STEM_LENGTH])
+    return tokens
+
+class LexicalIndex:
+    """
+    Parça id'lerine göre tutulan BM25 ters indeksi.
+    Sadece terim frekansları saklanır; metinler Chroma'dan okunur.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}       # chunk_id -> {"len": int, "tf": {terim: adet}}
+        self.postings = {}   # terim -> {chunk_id: adet}
+        self.total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, ids, texts):
+        """Parçaları ekler; aynı id zaten varsa günceller (upsert)."""
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                self._remove_one(chunk_id)
+                tf = Counter(tokenize(text))
+                length = sum(tf.values())
+                self.docs[chunk_id] = {"len": length, "tf": dict(tf)}
+                self.total_len += length
+                for term, count in tf.items():
+                    self.postings.setdefault(term, {})[chunk_id] = count
+
+    def remove(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                self._remove_one(chunk_id)
+
+    def search(self, query, k=10):
+        """BM25 skoruna göre en iyi k parçayı [(chunk_id, skor), ...] olarak döner."""
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            avgdl = self.total_len / n or 1.0
+            scores = {}
+            for term in set(tokenize(query)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for chunk_id, tf in posting.items():
+                    dl = self.docs[chunk_id]["len"]
+                    denom = tf + self.k1 * (1 - self.b + self.b * dl / avgdl)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / denom
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path=LEXICAL_INDEX_PATH):
+        """Önce geçici dosyaya yazar, sonra atomik olarak değiştirir."""
+        with self._lock:
+            data = {"version": 1, "k1": self.k1, "b": self.b, "docs": self.docs}
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=LEXICAL_INDEX_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        index = cls(k1=data.get("k1", 1.5), b=data.get("b", 0.75))
+        index.docs = data.get("docs", {})
+        for chunk_id, doc in index.docs.items():
+            index.total_len += doc["len"]
+            for term, count in doc["tf"].items():
+                index.postings.setdefault(term, {})[chunk_id] = count
+        return index
+
+    def _remove_one(self, chunk_id):
+        doc = self.docs.pop(chunk_id, None)
+        if not doc:
+            return
+        self.total_len -= doc["len"]
+        for term in doc["tf"]:
+            posting = self.postings.get(term)
+            if posting:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+
+# --- Süreç içi tek örnek (dosya değişince yeniden yüklenir) ---
+_index = None
+_index_mtime = None
+_load_lock = threading.Lock()
+
+def get_lexical_index():
+    """
+    Diskteki indeksi döner. Başka bir süreç (Admin API) dosyayı güncellediyse
+    yeni sürüm yüklenir.
+    """
+    global _index, _index_mtime
+    try:
+        mtime = os.path.getmtime(LEXICAL_INDEX_PATH)
+    except OSError:
+        mtime = None
+
+    with _load_lock:
+        if _index is None or (mtime is not None and mtime != _index_mtime):
+            if mtime is not None:
+                try:
+                    _index = LexicalIndex.load(LEXICAL_INDEX_PATH)
+                except Exception as e:
+                    print(f"⚠️ Kelime indeksi okunamadı: {e}")
+                    _index = _index or LexicalIndex()
+            else:
+                _index = _index or LexicalIndex()
+            _index_mtime = mtime
+        return _index
+
+def reset_lexical_index():
+    """Süreçteki indeksi boşaltır (Veritabanı sıfırdan kurulurken)."""
+    global _index
+    with _load_lock:
+        _index = LexicalIndex()
+
+def save_lexical_index():
+    """Süreçteki indeksi diske yazar (İndeks yazma işlemlerinin sonunda çağrılır)."""
+    global _index_mtime
+    index = get_lexical_index()
+    index.save(LEXICAL_INDEX_PATH)
+    _index_mtime = os.path.getmtime(LEXICAL_INDEX_PATH)
+
+def ensure_lexical_index(vectorstore, page_size=1000):
+    """
+    Disk üzerinde kelime indeksi yoksa Chroma'daki parçalardan bir kez oluşturur
+    (Mevcut kurulumlar için tek seferlik geçiş).
+    """
+    if os.path.exists(LEXICAL_INDEX_PATH):
+        return get_lexical_index()
+
+    print("🔤 Kelime (BM25) indeksi oluşturuluyor...")
+    index = get_lexical_index()
+    offset = 0
+    while True:
+        batch = vectorstore.get(include=["documents"], limit=page_size, offset=offset)
+        if not batch["ids"]:
+            break
+        index.add(batch["ids"], batch["documents"])
+        offset += len(batch["ids"])
+    save_lexical_index()
+    print(f"✅ Kelime indeksi hazır: {len(index)} parça.")
+    return index
@@ -1,7 +1,20 @@
+import json
+import queue
+import re
 import sqlite3
+import threading
+import time
 from datetime import datetime
 # Config dosyasından tanımladığımız iki ayrı veritabanı yolunu alıyoruz
-from app.core.config import LOG_DB_PATH, ADMIN_LOG_DB_PATH
+from app.core.config import (
+    LOG_DB_PATH, ADMIN_LOG_DB_PATH, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL_SECONDS, LOG_QUEUE_MAX,
+    METRICS_PERSIST_PER_REQUEST
+)
+
+_INSERT_CONVERSATION_SQL = '''
+    INSERT INTO conversation_logs (timestamp, user_query, bot_response, context_used, model_name, ip_address, timings)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
 
 def init_db():
     """
@@ -24,6 +37,40 @@ def init_db():
                 ip_address TEXT
             )
         ''')
+        # Sonradan eklenen sütunlar (eski veritabanları için)
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(conversation_logs)")}
+        if "timings" not in columns:
+            cursor.execute("ALTER TABLE conversation_logs ADD COLUMN timings TEXT")  # Aşama süreleri (JSON)
+        # Analiz sorguları için indeksler
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_logs_timestamp ON conversation_logs (timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_logs_ip ON conversation_logs (ip_address)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_logs_model ON conversation_logs (model_name)')
+        # Saatlik özet (rollup) tabloları - panolar geçmişi tekrar taramasın diye
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_rollup_hourly (
+                bucket TEXT,
+                mode TEXT,
+                model_name TEXT,
+                questions INTEGER DEFAULT 0,
+                PRIMARY KEY (bucket, mode, model_name)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_top_queries (
+                query_key TEXT PRIMARY KEY,
+                sample_query TEXT,
+                questions INTEGER DEFAULT 0,
+                last_seen TEXT
+            )
+        ''')
+        # "En çok sorulanlar" sorgusu tüm tabloyu sıralamasın
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_conversation_top_queries_questions ON conversation_top_queries (questions DESC)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                name TEXT PRIMARY KEY,
+                last_id INTEGER
+            )
+        ''')
         conn.commit()
         conn.close()
     except Exception as e:
@@ -50,21 +97,150 @@ def init_db():
         
     print(f"📁 Log veritabanları kontrol edildi:\n   - Sohbet: {LOG_DB_PATH}\n   - Admin:  {ADMIN_LOG_DB_PATH}")
 
-def log_conversation(query: str, response: str, context: str, model: str, ip_address: str = "Bilinmiyor"):
+class ConversationLogWriter:
+    """
+    Sohbet loglarını tek bir uzun ömürlü SQLite bağlantısı (WAL modu) ile yazan arka plan yazıcısı.
+    - log_conversation kaydı sadece kuyruğa ekler (istek beklemez).
+    - Kayıtlar LOG_BATCH_SIZE adede ulaşınca veya LOG_FLUSH_INTERVAL_SECONDS dolunca tek transaction'da yazılır.
+    - stop() kuyruktaki her şeyi yazıp bağlantıyı kapatır (FastAPI lifespan kapanışında).
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path=LOG_DB_PATH, batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL_SECONDS, max_queue=LOG_QUEUE_MAX):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+
+        # İstatistikler
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="conversation-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """Kuyruğu boşaltır ve yazıcıyı durdurur."""
+        if not self.running:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(self, row):
+        try:
+            self._queue.put(row, timeout=1)
+        except queue.Full:
+            self.dropped += 1
+            print("❌ Sohbet log kuyruğu dolu, kayıt düşürüldü.")
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        try:
+            stopping = False
+            while not stopping:
+                batch = []
+                deadline = None
+                while len(batch) < self.batch_size:
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if batch:
+                    self._flush(conn, batch)
+            # Durdurma sinyalinden sonra kalanları da yaz
+            rest = []
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not self._STOP:
+                    rest.append(item)
+            if rest:
+                self._flush(conn, rest)
+        finally:
+            conn.close()
+
+    def _flush(self, conn, batch):
+        started = time.perf_counter()
+        try:
+            conn.executemany(_INSERT_CONVERSATION_SQL, batch)
+            conn.commit()
+            self.written += len(batch)
+            written = True
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"❌ Sohbet Loglama Hatası: {e}")
+            written = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+        # Özet tabloları yazıcıyla birlikte güncel tutulur (pano isteği beklemez)
+        if written:
+            refresh_rollups()
+
+# Süreç genelinde tek yazıcı (Chat API lifespan'inde başlatılır)
+conversation_log_writer = ConversationLogWriter()
+
+def start_log_writer():
+    conversation_log_writer.start()
+
+def stop_log_writer():
+    print("💾 Sohbet log kuyruğu boşaltılıyor...")
+    conversation_log_writer.stop()
+
+def log_conversation(query: str, response: str, context: str, model: str, ip_address: str = "Bilinmiyor", timings: dict = None):
     """
     Kullanıcı sohbetini 'chat_history.db' dosyasına kaydeder.
+    Yazıcı çalışıyorsa kayıt kuyruğa alınır, çalışmıyorsa doğrudan yazılır.
+    timings: İsteğin aşama süreleri (METRICS_PERSIST_PER_REQUEST açıksa JSON olarak saklanır)
     """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    timings_json = json.dumps(timings, ensure_ascii=False) if timings and METRICS_PERSIST_PER_REQUEST else None
+    row = (now, query, response, context, model, ip_address, timings_json)
+
+    if conversation_log_writer.running:
+        conversation_log_writer.enqueue(row)
+        return
+
     try:
         conn = sqlite3.connect(LOG_DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.execute('''
-            INSERT INTO conversation_logs (timestamp, user_query, bot_response, context_used, model_name, ip_address)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (now, query, response, context, model, ip_address))
-        
+        conn.execute(_INSERT_CONVERSATION_SQL, row)
         conn.commit()
         conn.close()
     except Exception as e:
@@ -103,4 +279,167 @@ def get_admin_logs(limit=50):
         return [{"action": r[0], "filename": r[1], "user": r[2], "date": r[3]} for r in rows]
     except Exception as e:
         print(f"Log Okuma Hatası: {e}")
-        return []
\ No newline at end of file
+        return []
+
+# ==========================================================
+# SOHBET ANALİZİ (chat_history.db)
+# ==========================================================
+
+def _mode_from_context(context_used):
+    """context_used alanından modu çıkarır: 'PDF (Thinking Mode)' -> 'thinking'"""
+    return "thinking" if context_used and "Thinking" in context_used else "fast"
+
+def _query_key(query):
+    """Aynı sorunun farklı yazımlarını (büyük harf, noktalama, boşluk) tek anahtarda toplar."""
+    text = (query or "").replace("I", "ı").replace("İ", "i").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()[:200]
+
+def refresh_rollups(batch_size=5000):
+    """
+    Son özetlemeden sonra eklenen kayıtları (id > last_id) saatlik özet ve
+    en çok sorulan sorular tablolarına ekler. Geçmiş tekrar taranmaz.
+    Her parti tek bir IMMEDIATE transaction'dır: last_id okuma, ekleme ve last_id güncelleme
+    birlikte yapılır; aynı anda çalışan iki çağrı (log yazıcısı, pano istekleri) aynı kayıtları
+    iki kez saymaz. İşlenen kayıt sayısını döner.
+    """
+    processed = 0
+    conn = None
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH, isolation_level=None)  # Transaction'lar elle yönetilir
+        cursor = conn.cursor()
+
+        while True:
+            cursor.execute("BEGIN IMMEDIATE")
+            row = cursor.execute("SELECT last_id FROM rollup_state WHERE name = 'conversations'").fetchone()
+            last_id = row[0] if row else 0
+            rows = cursor.execute('''
+                SELECT id, timestamp, user_query, context_used, model_name
+                FROM conversation_logs WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, batch_size)).fetchall()
+            if not rows:
+                cursor.execute("COMMIT")
+                break
+
+            hourly = {}
+            top = {}
+            for _, timestamp, user_query, context_used, model_name in rows:
+                bucket = (timestamp or "")[:13] + ":00"
+                key = (bucket, _mode_from_context(context_used), model_name or "")
+                hourly[key] = hourly.get(key, 0) + 1
+
+                query_key = _query_key(user_query)
+                if query_key:
+                    count, _, _ = top.get(query_key, (0, None, None))
+                    top[query_key] = (count + 1, user_query, timestamp)
+
+            cursor.executemany('''
+                INSERT INTO conversation_rollup_hourly (bucket, mode, model_name, questions) VALUES (?, ?, ?, ?)
+                ON CONFLICT(bucket, mode, model_name) DO UPDATE SET questions = questions + excluded.questions
+            ''', [(*key, count) for key, count in hourly.items()])
+            cursor.executemany('''
+                INSERT INTO conversation_top_queries (query_key, sample_query, questions, last_seen) VALUES (?, ?, ?, ?)
+                ON CONFLICT(query_key) DO UPDATE SET
+                    questions = questions + excluded.questions,
+                    sample_query = excluded.sample_query,
+                    last_seen = excluded.last_seen
+            ''', [(key, sample, count, seen) for key, (count, sample, seen) in top.items()])
+
+            last_id = rows[-1][0]
+            cursor.execute('''
+                INSERT INTO rollup_state (name, last_id) VALUES ('conversations', ?)
+                ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id
+            ''', (last_id,))
+            cursor.execute("COMMIT")
+            processed += len(rows)
+    except Exception as e:
+        print(f"❌ Özet (Rollup) Hatası: {e}")
+    finally:
+        if conn is not None:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+    return processed
+
+def query_conversations(limit=50, before_id=None, since=None, until=None, ip_address=None, model=None, include_response=False):
+    """
+    Sohbet kayıtlarını en yeniden eskiye, sayfalı (keyset) olarak döner.
+    - before_id: Bir önceki sayfanın 'next_cursor' değeri
+    - since / until: 'YYYY-MM-DD HH:MM:SS' formatında zaman aralığı
+    Cevap metni varsayılan olarak kısaltılmış (200 karakter) gelir.
+    """
+    limit = max(1, min(int(limit), 500))
+    conditions, params = [], []
+    if before_id is not None:
+        conditions.append("id < ?"); params.append(before_id)
+    if since:
+        conditions.append("timestamp >= ?"); params.append(since)
+    if until:
+        conditions.append("timestamp < ?"); params.append(until)
+    if ip_address:
+        conditions.append("ip_address = ?"); params.append(ip_address)
+    if model:
+        conditions.append("model_name = ?"); params.append(model)
+
+    response_column = "bot_response" if include_response else "substr(bot_response, 1, 200)"
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f'''
+        SELECT id, timestamp, user_query, {response_column}, context_used, model_name, ip_address
+        FROM conversation_logs {where} ORDER BY id DESC LIMIT ?
+    '''
+
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        rows = conn.execute(sql, (*params, limit)).fetchall()
+        conn.close()
+    except Exception as e:
+        print(f"Log Okuma Hatası: {e}")
+        return {"items": [], "next_cursor": None}
+
+    items = [{
+        "id": r[0], "date": r[1], "query": r[2], "response": r[3],
+        "mode": _mode_from_context(r[4]), "context": r[4], "model": r[5], "ip": r[6],
+    } for r in rows]
+    return {"items": items, "next_cursor": items[-1]["id"] if len(items) == limit else None}
+
+def get_conversation_summary(since=None, until=None, top_n=10):
+    """
+    Pano için özet istatistikler (rollup tablolarından okunur):
+    saatlik soru sayısı, mod ve model dağılımı, en çok sorulan sorular.
+    since / until saat dilimi formatındadır: 'YYYY-MM-DD HH:00' ve saatlik / mod / model
+    sayılarını sınırlar. En çok sorulan sorular tüm zamanları kapsar (sorgu başına tek
+    toplam tutulur); yanıttaki top_queries_range bunu belirtir.
+    Özetler log yazıcısı tarafından güncel tutulur; buradaki çağrı sadece yazıcı dışında
+    (doğrudan) yazılmış kayıtları yakalar, yeni kayıt yoksa tek bir indeksli sorgudur.
+    """
+    refresh_rollups()
+
+    conditions, params = [], []
+    if since:
+        conditions.append("bucket >= ?"); params.append(since)
+    if until:
+        conditions.append("bucket < ?"); params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    try:
+        conn = sqlite3.connect(LOG_DB_PATH)
+        cursor = conn.cursor()
+        per_hour = cursor.execute(f"SELECT bucket, SUM(questions) FROM conversation_rollup_hourly {where} GROUP BY bucket ORDER BY bucket", params).fetchall()
+        per_mode = cursor.execute(f"SELECT mode, SUM(questions) FROM conversation_rollup_hourly {where} GROUP BY mode", params).fetchall()
+        per_model = cursor.execute(f"SELECT model_name, SUM(questions) FROM conversation_rollup_hourly {where} GROUP BY model_name", params).fetchall()
+        top = cursor.execute('''
+            SELECT sample_query, questions, last_seen FROM conversation_top_queries
+            ORDER BY questions DESC LIMIT ?
+        ''', (top_n,)).fetchall()
+        conn.close()
+    except Exception as e:
+        print(f"Log Okuma Hatası: {e}")
+        return {"per_hour": [], "per_mode": {}, "per_model": {}, "top_queries": [], "top_queries_range": "all_time"}
+
+    return {
+        "per_hour": [{"hour": b, "questions": c} for b, c in per_hour],
+        "per_mode": {m: c for m, c in per_mode},
+        "per_model": {m: c for m, c in per_model},
+        "top_queries": [{"query": q, "questions": c, "last_seen": t} for q, c, t in top],
+        "top_queries_range": "all_time",
+    }
@@ -0,0 +1,242 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import (
+    MEMORY_MAX_TOKENS,
+    MEMORY_SUMMARY_MAX_TOKENS,
+    MEMORY_RECENT_MESSAGES,
+    MEMORY_MESSAGE_MAX_TOKENS,
+    MEMORY_CACHE_MAX_CONVERSATIONS,
+    MEMORY_CACHE_TTL_SECONDS,
+)
+from app.services.context_packer import count_tokens
+
+# Bu kelimeleri (zamir, "peki", "aynı" ...) içeren sorular önceki konuşmaya atıf yapıyor kabul edilir
+_REFERENCE_WORDS = {
+    "o", "bu", "şu", "onu", "bunu", "şunu", "onun", "bunun", "onda", "bunda", "ona", "buna",
+    "orada", "burada", "oraya", "peki", "aynı", "bunlar", "onlar", "bunları", "onları",
+    "öbürü", "diğeri", "devam", "başka", "ayrıca",
+}
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+CONDENSE_PROMPT = """Aşağıdaki sohbet geçmişine göre kullanıcının son sorusunu, geçmişi bilmeyen birinin de anlayacağı tek bir soru olarak yeniden yaz.
+Sistem, uygulama ve belge adlarını açıkça yaz. Sadece soruyu yaz, açıklama ekleme.
+
+Sohbet geçmişi:
+{memory}
+
+Son soru: {question}
+
+Bağımsız soru:"""
+
+SUMMARY_PROMPT = """Aşağıdaki konuşma özetini ve yeni mesajları birleştirerek güncel bir özet yaz.
+Kullanıcının sorduğu konuları, adı geçen sistem / uygulama adlarını, linkleri ve verilen önemli adımları koru.
+En fazla 5 cümle yaz, sadece özeti yaz.
+
+Mevcut özet:
+{summary}
+
+Yeni mesajlar:
+{messages}
+
+Güncel özet:"""
+
+# ==========================================================
+# 1. GEÇMİŞİN OKUNMASI
+# ==========================================================
+
+def normalize_history(history):
+    """
+    Question.history içeriğini [(rol, metin)] listesine çevirir. Desteklenen biçimler:
+    - {"role": "user" | "assistant", "content": "..."}
+    - {"query": "...", "response": "..."}   (bir soru-cevap çifti)
+    """
+    messages = []
+    for item in history or []:
+        if not isinstance(item, dict):
+            continue
+        if "role" in item:
+            role = "user" if item.get("role") in ("user", "human") else "assistant"
+            content = str(item.get("content") or "").strip()
+            if content:
+                messages.append((role, content))
+        else:
+            if item.get("query"):
+                messages.append(("user", str(item["query"]).strip()))
+            if item.get("response"):
+                messages.append(("assistant", str(item["response"]).strip()))
+    return messages
+
+def conversation_key(conversation_id, ip_address, messages):
+    """
+    Konuşma özetinin anahtarı, her zaman istemcinin IP adresiyle birlikte üretilir:
+    Başka bir istemci aynı conversation_id'yi gönderse bile o konuşmanın özetini okuyamaz / ezemez.
+    Konuşma id'si yoksa IP + ilk sorudan kararlı bir anahtar üretilir.
+    """
+    if conversation_id:
+        scope = f"id\x00{conversation_id}"
+    else:
+        scope = "q\x00" + next((text for role, text in messages if role == "user"), "")
+    return hashlib.sha1(f"{ip_address}\x00{scope}".encode("utf-8")).hexdigest()[:16]
+
+def needs_rewrite(question):
+    """
+    Soru önceki konuşmaya atıf yapıyor mu? (Zamir / 'peki' gibi kelimeler içeren sorular)
+    Sadece kısa olması yetmez: "VPN şifremi nasıl sıfırlarım?" kendi başına anlaşılır ve
+    gereksiz bir LLM çağrısına (üretim sırası) yol açmamalı.
+    """
+    words = _WORD_RE.findall(question.lower())
+    return any(word in _REFERENCE_WORDS for word in words)
+
+def messages_digest(messages):
+    """Mesaj listesinin özeti; kayıtlı konuşma özetinin hangi mesajları kapsadığını doğrulamak için."""
+    h = hashlib.sha1()
+    for role, text in messages:
+        h.update(f"{role}\x00{text}\x01".encode("utf-8"))
+    return h.hexdigest()
+
+def _clip(text, max_tokens):
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[:int(len(text) * max_tokens / tokens)].rstrip() + " ..."
+
+def format_messages(messages):
+    labels = {"user": "Kullanıcı", "assistant": "Asistan"}
+    return "\n".join(f"{labels[role]}: {_clip(text, MEMORY_MESSAGE_MAX_TOKENS)}" for role, text in messages)
+
+# ==========================================================
+# 2. KONUŞMA ÖZETLERİ (Sunucu tarafı önbellek)
+# ==========================================================
+
+class ConversationMemory:
+    """
+    Konuşma başına dönen (rolling) özetleri tutar.
+    Her kayıt, geçmişin ilk 'covered' mesajını özetler; yeni tur geldiğinde
+    sadece özetin dışında kalan eski mesajlar özete eklenir (tüm geçmiş tekrar özetlenmez).
+    """
+
+    def __init__(self, max_conversations=MEMORY_CACHE_MAX_CONVERSATIONS, ttl_seconds=MEMORY_CACHE_TTL_SECONDS):
+        self.max_conversations = max_conversations
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # anahtar -> {"summary", "covered", "digest", "updated"}
+        self._lock = threading.Lock()
+        self.summaries = 0
+        self.rewrites = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["updated"] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(entry)
+
+    def get_valid(self, key, messages):
+        """
+        Kayıt, bu geçmişin ilk 'covered' mesajını özetliyorsa döner; aksi halde boş kayıt döner.
+        Aynı anahtara düşen farklı konuşmalar (aynı IP'den "merhaba" ile başlayan iki sohbet)
+        veya düzenlenmiş / dallanmış geçmişler başka bir konuşmanın özetini almaz.
+        """
+        entry = self.get(key)
+        if entry is None or entry["covered"] > len(messages) or entry.get("digest") != messages_digest(messages[:entry["covered"]]):
+            return {"summary": "", "covered": 0}
+        return entry
+
+    def put(self, key, summary, covered, digest):
+        with self._lock:
+            self._entries[key] = {"summary": summary, "covered": covered, "digest": digest, "updated": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_conversations:
+                self._entries.popitem(last=False)
+
+    def build_block(self, key, messages):
+        """
+        Prompta girecek hafıza metnini ve özetlenmeyi bekleyen mesaj sayısını döner.
+        - Son MEMORY_RECENT_MESSAGES mesaj aynen,
+        - Daha eskiler önbellekteki özetle; özetin henüz kapsamadığı eski mesajlar
+          bu tur için kısaltılmış halleriyle eklenir (özet arka planda güncellenir).
+        Toplam uzunluk MEMORY_MAX_TOKENS ile sınırlıdır; sığmayan en eski kısım atılır.
+        """
+        if not messages:
+            return "", 0
+        older_count = max(0, len(messages) - MEMORY_RECENT_MESSAGES)
+        entry = self.get_valid(key, messages)
+        covered = min(entry["covered"], older_count)
+
+        parts = []
+        if entry["summary"] and covered:
+            parts.append(f"Önceki konuşmanın özeti: {entry['summary']}")
+        pending = messages[covered:older_count]
+        recent = messages[older_count:]
+
+        # Bütçe: En yeni mesajlardan geriye doğru doldur
+        lines = []
+        budget = MEMORY_MAX_TOKENS - sum(count_tokens(p) for p in parts)
+        for message in reversed(pending + recent):
+            line = format_messages([message])
+            cost = count_tokens(line)
+            if cost > budget:
+                break
+            lines.insert(0, line)
+            budget -= cost
+        if lines:
+            parts.append("\n".join(lines))
+
+        block = "[ÖNCEKİ KONUŞMA]\n" + "\n\n".join(parts) + "\n\n" if parts else ""
+        return block, len(pending)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {"conversations": size, "summaries": self.summaries, "rewrites": self.rewrites}
+
+conversation_memory = ConversationMemory()
+
+# ==========================================================
+# 3. LLM İLE YENİDEN YAZMA VE ÖZETLEME
+# ==========================================================
+
+async def rewrite_question(llm, question, memory_block):
+    """Takip sorusunu arama için bağımsız bir soruya çevirir. Başarısız olursa soru aynen döner."""
+    try:
+        output = await llm.ainvoke(CONDENSE_PROMPT.format(memory=memory_block.strip(), question=question))
+    except Exception as e:
+        print(f"⚠️ Soru yeniden yazılamadı: {e}")
+        return question
+
+    rewritten = (output or "").strip().splitlines()[0].strip(" \"'") if (output or "").strip() else ""
+    # Model saçmalarsa (boş veya çok uzun çıktı) orijinal soru kullanılır
+    if not rewritten or len(rewritten) > max(200, len(question) * 6):
+        return question
+    conversation_memory.rewrites += 1
+    return rewritten
+
+async def update_summary(llm, key, messages):
+    """
+    Son pencerenin dışına çıkan (özetlenmemiş) mesajları mevcut özete ekler.
+    Cevaptan sonra arka planda çalışır; kullanıcı beklemez.
+    """
+    older_count = max(0, len(messages) - MEMORY_RECENT_MESSAGES)
+    entry = conversation_memory.get_valid(key, messages)
+    if older_count <= entry["covered"]:
+        return
+
+    new_messages = messages[entry["covered"]:older_count]
+    prompt = SUMMARY_PROMPT.format(summary=entry["summary"] or "(yok)", messages=format_messages(new_messages))
+    try:
+        summary = (await llm.ainvoke(prompt) or "").strip()
+    except Exception as e:
+        print(f"⚠️ Konuşma özeti güncellenemedi: {e}")
+        return
+    if summary:
+        conversation_memory.put(
+            key, _clip(summary, MEMORY_SUMMARY_MAX_TOKENS), older_count, messages_digest(messages[:older_count])
+        )
+        conversation_memory.summaries += 1
@@ -0,0 +1,235 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# ==========================================================
+# 1. METRİK TİPLERİ (Prometheus metin formatı)
+# ==========================================================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+class Histogram:
+    """Etiketli, sabit kovalı (bucket) basit histogram."""
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiket değerleri -> [kova sayıları, toplam, adet]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                base = _format_labels(self.labels, key)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le=bound)} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le='+Inf')} {count}")
+                lines.append(f"{self.name}_sum{base} {total:.6f}")
+                lines.append(f"{self.name}_count{base} {count}")
+        return lines
+
+class Counter:
+    """Etiketli, sadece artan sayaç."""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+def _format_labels(names, values, le=None):
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# ==========================================================
+# 2. KAYITLI METRİKLER
+# ==========================================================
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "RAG isteğinin aşama bazında süresi (embed, queue_wait, retrieve, prompt_format, ttft, chain, ollama_*)",
+    labels=("stage", "mode"),
+)
+OLLAMA_TOKENS_PER_SECOND = Histogram(
+    "ollama_generation_tokens_per_second",
+    "Ollama üretim hızı (eval_count / eval_duration)",
+    labels=("model",),
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 80, 120),
+)
+OLLAMA_PROMPT_TOKENS = Histogram(
+    "ollama_prompt_tokens",
+    "Ollama'nın işlediği prompt token sayısı (prompt_eval_count)",
+    labels=("model",),
+    buckets=(64, 128, 256, 512, 1024, 2048, 3072, 4096, 8192),
+)
+OLLAMA_OUTPUT_TOKENS = Histogram(
+    "ollama_output_tokens",
+    "Ollama'nın ürettiği token sayısı (eval_count)",
+    labels=("model",),
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens",
+    "Prompta giren (packed) ve bütçeye sığmadığı için atılan (dropped) bağlam tokenları",
+    labels=("mode", "kind"),
+    buckets=(0, 64, 128, 256, 512, 1024, 1536, 2048, 3072, 4096),
+)
+REQUESTS_TOTAL = Counter("rag_requests_total", "Cevaplanan soru sayısı", labels=("mode", "cache"))
+GENERATION_REJECTED = Counter(
+    "rag_generation_rejected_total",
+    "Kuyruk dolu / zaman aşımı nedeniyle reddedilen üretim istekleri",
+    labels=("mode", "reason"),
+)
+
+_registry = [
+    STAGE_SECONDS, OLLAMA_TOKENS_PER_SECOND, OLLAMA_PROMPT_TOKENS, OLLAMA_OUTPUT_TOKENS, CONTEXT_TOKENS,
+    REQUESTS_TOTAL, GENERATION_REJECTED,
+]
+_gauges = []  # (isim, açıklama, fonksiyon)
+
+def register_gauge(name, help_text, fn):
+    """Anlık değerini fonksiyondan okuyan gösterge (kuyruk derinliği vb.) ekler."""
+    _gauges.append((name, help_text, fn))
+
+def render_prometheus():
+    """Tüm metrikleri Prometheus metin formatında döner (/metrics)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for name, help_text, fn in _gauges:
+        try:
+            value = fn()
+        except Exception:
+            continue
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+# ==========================================================
+# 3. İSTEK BAZINDA ZAMANLAMA (Trace)
+# ==========================================================
+
+_current_trace = ContextVar("rag_trace", default=None)
+
+def start_trace(mode):
+    """Yeni bir istek izi başlatır; aşama süreleri bu sözlükte toplanır."""
+    trace = {"mode": mode, "stages": {}, "ollama": {}, "context": {}, "memory": {}}
+    _current_trace.set(trace)
+    return trace
+
+def get_trace():
+    return _current_trace.get()
+
+def record_stage(stage, seconds):
+    trace = _current_trace.get()
+    mode = trace["mode"] if trace else "-"
+    STAGE_SECONDS.observe(seconds, stage=stage, mode=mode)
+    if trace is not None:
+        trace["stages"][stage] = round(trace["stages"].get(stage, 0.0) + seconds, 4)
+
+def record_context(report):
+    """Bağlam paketleme raporunu (token bütçesi) metriklere ve istek izine yazar."""
+    trace = _current_trace.get()
+    mode = trace["mode"] if trace else "-"
+    CONTEXT_TOKENS.observe(report["packed_tokens"], mode=mode, kind="packed")
+    CONTEXT_TOKENS.observe(report["dropped_tokens"], mode=mode, kind="dropped")
+    if trace is not None:
+        trace["context"] = report
+
+@contextmanager
+def timed(stage):
+    """with timed("retrieve"): ... bloğunun süresini ölçer."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def trace_summary(trace):
+    """Log kaydına eklenecek özet (ms cinsinden aşama süreleri + Ollama sayaçları)."""
+    if not trace:
+        return None
+    return {
+        "mode": trace["mode"],
+        "stages_ms": {k: round(v * 1000, 1) for k, v in trace["stages"].items()},
+        "ollama": trace["ollama"],
+        "context": trace["context"],
+        "memory": trace["memory"],
+    }
+
+class OllamaStatsCallback(BaseCallbackHandler):
+    """
+    Ollama'nın cevapla birlikte döndüğü sayaçları (prompt_eval_count, eval_count,
+    *_duration) okuyup metriklere ve o anki istek izine yazar.
+    """
+
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs):
+        try:
+            info = response.generations[0][0].generation_info or {}
+        except (IndexError, AttributeError):
+            return
+        if not info:
+            return
+
+        model = info.get("model", "")
+        prompt_tokens = info.get("prompt_eval_count") or 0
+        output_tokens = info.get("eval_count") or 0
+        eval_seconds = (info.get("eval_duration") or 0) / 1e9
+        prompt_seconds = (info.get("prompt_eval_duration") or 0) / 1e9
+        load_seconds = (info.get("load_duration") or 0) / 1e9
+
+        if prompt_tokens:
+            OLLAMA_PROMPT_TOKENS.observe(prompt_tokens, model=model)
+        if output_tokens:
+            OLLAMA_OUTPUT_TOKENS.observe(output_tokens, model=model)
+        if output_tokens and eval_seconds:
+            OLLAMA_TOKENS_PER_SECOND.observe(output_tokens / eval_seconds, model=model)
+        record_stage("ollama_load", load_seconds)
+        record_stage("ollama_prompt_eval", prompt_seconds)
+        record_stage("ollama_generation", eval_seconds)
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace["ollama"].update({
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "tokens_per_second": round(output_tokens / eval_seconds, 2) if eval_seconds else None,
+            })
@@ -0,0 +1,121 @@
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+from app.core.config import OLLAMA_BASE_URL, MODEL_KEEP_ALIVE, MODEL_WARMUP_TIMEOUT_SECONDS
+from app.core.config import MODEL_WARMUP_RETRY_SECONDS, MODEL_WARMUP_RETRY_MAX_SECONDS
+from app.services.metrics_service import record_stage
+
+# Modellerin Ollama'daki durumu, model başına (/readyz ve /stats için)
+# state: "cold" (henüz yüklenmedi) | "loading" | "ready" | "error"
+# Model değişirken eski model, yenisi ısınıp boşaltılana kadar "ready" kalır.
+_state_lock = threading.Lock()
+_model_states = {}   # model -> {"model", "state", "warmup_seconds", "error", "attempts", "updated_at"}
+_last_model = None   # En son ısındırılmaya çalışılan model
+_retry_threads = {}  # model -> yeniden deneme thread'i
+
+def _set_state(model, **values):
+    global _last_model
+    with _state_lock:
+        state = _model_states.setdefault(
+            model, {"model": model, "state": "cold", "warmup_seconds": None, "error": None, "attempts": 0}
+        )
+        state.update(values, updated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        _last_model = model
+
+def get_model_state(model=None):
+    """Modelin durumu; model verilmezse en son ısındırılmaya çalışılan modelin durumu döner."""
+    with _state_lock:
+        state = _model_states.get(model if model is not None else _last_model)
+        return dict(state) if state else {"model": model, "state": "cold", "warmup_seconds": None, "error": None, "attempts": 0}
+
+def is_model_ready(model=None):
+    """Model ısındı mı? model verilirse o modelin hazır olup olmadığına bakar."""
+    return get_model_state(model)["state"] == "ready"
+
+def warm_up_model(model, options=None, keep_alive=MODEL_KEEP_ALIVE, prompt=None, on_ready=None):
+    """
+    Modeli tek tokenlık bir üretimle belleğe yükler ve keep_alive ile sabitler.
+    options, LLM'in kullandığı seçeneklerle (num_ctx, num_gpu...) aynı olmalıdır;
+    aksi halde Ollama ilk gerçek istekte modeli farklı ayarla tekrar yükler.
+    prompt olarak şablonun sabit başı verilirse bu kısım KV önbelleğine alınmış olur.
+    Başarılıysa True döner. Başarısız olursa arka planda artan aralıklarla (MODEL_WARMUP_RETRY_SECONDS'tan
+    MODEL_WARMUP_RETRY_MAX_SECONDS'a kadar) tekrar denenir; Ollama sonradan açılırsa model hazır olur
+    ve on_ready(model) çağrılır.
+    """
+    if _attempt_warm_up(model, options, keep_alive, prompt):
+        return True
+    _schedule_retry(model, options, keep_alive, prompt, on_ready)
+    return False
+
+def _attempt_warm_up(model, options, keep_alive, prompt):
+    _set_state(model, state="loading", error=None, warmup_seconds=None)
+    with _state_lock:
+        _model_states[model]["attempts"] += 1
+    print(f"🔥 Model ısındırılıyor: {model} (keep_alive={keep_alive})")
+    started = time.perf_counter()
+    payload = {
+        "model": model,
+        "prompt": prompt or "Merhaba",
+        "stream": False,
+        "keep_alive": keep_alive,
+        "options": {**(options or {}), "num_predict": 1},
+    }
+    try:
+        response = requests.post(f"{OLLAMA_BASE_URL}/api/generate", json=payload, timeout=MODEL_WARMUP_TIMEOUT_SECONDS)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"❌ Model ısındırılamadı ({model}): {e}")
+        _set_state(model, state="error", error=str(e))
+        return False
+
+    seconds = time.perf_counter() - started
+    load_seconds = (response.json().get("load_duration") or 0) / 1e9
+    record_stage("model_warmup", seconds)
+    _set_state(model, state="ready", warmup_seconds=round(seconds, 2))
+    print(f"✅ Model hazır: {model} ({seconds:.1f} sn, yükleme {load_seconds:.1f} sn)")
+    return True
+
+def _schedule_retry(model, options, keep_alive, prompt, on_ready=None):
+    """Isındırmayı arka planda, model hazır olana veya başka bir model seçilene kadar tekrar dener."""
+    with _state_lock:
+        thread = _retry_threads.get(model)
+        if thread is not None and thread.is_alive():
+            return
+
+        def run():
+            delay = MODEL_WARMUP_RETRY_SECONDS
+            while True:
+                time.sleep(delay)
+                with _state_lock:
+                    state = _model_states.get(model)
+                    # Model boşaltıldıysa / başka model seçildiyse ya da başka yoldan ısındıysa dur
+                    if _last_model != model or state is None or state["state"] == "ready":
+                        return
+                if _attempt_warm_up(model, options, keep_alive, prompt):
+                    if on_ready is not None:
+                        on_ready(model)
+                    return
+                delay = min(delay * 2, MODEL_WARMUP_RETRY_MAX_SECONDS)
+
+        thread = threading.Thread(target=run, name=f"warmup-retry-{model}", daemon=True)
+        _retry_threads[model] = thread
+        thread.start()
+    print(f"🔁 Isındırma {MODEL_WARMUP_RETRY_SECONDS} sn sonra tekrar denenecek: {model}")
+
+def unload_model(model):
+    """Modeli Ollama belleğinden (VRAM/RAM) hemen boşaltır (keep_alive=0)."""
+    try:
+        response = requests.post(
+            f"{OLLAMA_BASE_URL}/api/generate", json={"model": model, "keep_alive": 0}, timeout=30
+        )
+        response.raise_for_status()
+        with _state_lock:
+            _model_states.pop(model, None)
+        print(f"🧹 Önceki model bellekten boşaltıldı: {model}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Model boşaltılamadı ({model}): {e}")
+        return False
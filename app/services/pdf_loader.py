@@ -1,7 +1,12 @@
+import multiprocessing
 import os
+import time
 import fitz  # pymupdf
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from langchain_core.documents import Document
+from app.core.config import PDF_INGEST_WORKERS, PDF_PAGES_PER_TASK
 
 def clean_text(text):
     """
@@ -16,83 +21,124 @@ def clean_text(text):
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
-def load_single_pdf(file_path):
-    """Admin paneli için tek dosya okuyucu"""
-    documents = []
-    if not os.path.exists(file_path): return []
-    
+def iter_pdf_pages(file_path):
+    """
+    Tek dosyayı sayfa sayfa okur ve temizlenmiş sayfa Document'lerini üretir.
+    Tüm metin bellekte birleştirilmez; 500 sayfalık dosyalarda da bellek sabit kalır.
+    Metadata soğuk kurulumla aynıdır: {"source": dosya_adı, "page": sayfa_no}
+    """
+    if not os.path.exists(file_path): return
+
+    filename = os.path.basename(file_path)
+    # Açılamayan dosya hata fırlatır; boş dosya gibi manifest'e yazılmasın
+    doc = fitz.open(file_path)
+
     try:
-        doc = fitz.open(file_path)
-        filename = os.path.basename(file_path)
-        full_text = ""
-        
         for page_num, page in enumerate(doc):
-            text = page.get_text()
-            if text.strip():
-                full_text += text + " "
-        
-        cleaned = clean_text(full_text)
-        if cleaned:
-            documents.append(Document(page_content=cleaned, metadata={"source": filename, "page": 1}))
-            
+            cleaned_text = clean_text(page.get_text())
+            if len(cleaned_text) > 10: # En az 10 karakter olsun
+                yield Document(page_content=cleaned_text, metadata={"source": filename, "page": page_num + 1})
+    finally:
         doc.close()
-    except: pass
-    return documents
 
-def load_pdfs_text_only(directory_path):
+def _extract_page_range(file_path, start, end):
+    """
+    Süreç havuzu işçisi: Bir PDF'in [start, end) sayfa aralığını okur ve temizler.
+    (sayfa_no, metin) listesi ile geçen süreyi döner.
+    """
+    started = time.perf_counter()
+    pages = []
+    doc = fitz.open(file_path)
+    try:
+        for page_num in range(start, end):
+            # En basit okuma yöntemi (blocks yerine text)
+            cleaned_text = clean_text(doc.load_page(page_num).get_text())
+            # Eğer sayfa doluysa ekle
+            if len(cleaned_text) > 10: # En az 10 karakter olsun
+                pages.append((page_num + 1, cleaned_text))
+    finally:
+        doc.close()
+    return pages, time.perf_counter() - started
+
+def _plan_page_ranges(file_paths, pages_per_task, file_stats):
+    """Her dosyayı sayfa aralıklarına böler: [(dosya, başlangıç, bitiş), ...]"""
+    tasks = []
+    for file_path in file_paths:
+        try:
+            with fitz.open(file_path) as doc:
+                page_count = doc.page_count
+        except Exception as e:
+            print(f"   ❌ Hata ({os.path.basename(file_path)}): {e}")
+            _file_stats_for(file_stats, os.path.basename(file_path))["errors"].append(str(e))
+            continue
+        for start in range(0, page_count, pages_per_task):
+            tasks.append((file_path, start, min(page_count, start + pages_per_task)))
+    return tasks
+
+def iter_pdf_documents(file_paths, workers=PDF_INGEST_WORKERS, pages_per_task=PDF_PAGES_PER_TASK, file_stats=None):
     """
-    Klasördeki PDF'leri okur (DEBUG MODU AKTİF)
+    Verilen PDF'leri (gerekirse süreç havuzunda paralel) okur ve sayfa
+    Document'lerini dosya + sayfa sırasına göre (deterministik) üretir.
+    file_stats sözlüğü verilirse dosya başına {pages, chars, seconds, errors} doldurulur.
+    errors boş değilse dosya (ya da bir sayfa aralığı) okunamamıştır; o dosyanın
+    sayfaları eksiktir ve indekse yazılmamalıdır.
     """
-    documents = []
-    
-    if not os.path.exists(directory_path):
-        print(f"❌ Klasör bulunamadı: {directory_path}")
-        return []
+    if file_stats is None:
+        file_stats = {}
+    tasks = _plan_page_ranges(file_paths, pages_per_task, file_stats)
 
-    pdf_files = [f for f in os.listdir(directory_path) if f.lower().endswith('.pdf')]
-    
-    if not pdf_files:
-        print("⚠️ Klasörde PDF dosyası yok.")
-        return []
+    if workers <= 1 or len(tasks) <= 1:
+        results = (_safe_call(_extract_page_range, *task) for task in tasks)
+        yield from _collect(tasks, results, file_stats)
+        return
 
-    print(f"✨ PDF Okuma Başlıyor: {len(pdf_files)} dosya...")
+    pool_size = min(workers, len(tasks))
+    # "spawn": sunucu süreci thread'li (uvicorn, iş kuyruğu, retrieval sunucusu); fork edilen
+    # işçi, başka thread'in tuttuğu bir kilidi kopyalayıp kilitlenebilir.
+    with ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Aynı anda en fazla 2 x işçi kadar aralık havuzda bekler; tüketici yavaşsa okuma da yavaşlar
+        # (biten ama tüketilmeyen sonuçlar tüm korpusun metnini bellekte biriktirmez).
+        pending = iter(tasks)
+        futures = deque()
 
-    total_pages = 0
-    empty_files = 0
+        def submit_next():
+            task = next(pending, None)
+            if task is not None:
+                futures.append(pool.submit(_extract_page_range, *task))
 
-    for filename in pdf_files:
-        file_path = os.path.join(directory_path, filename)
-        try:
-            doc = fitz.open(file_path)
-            file_text_length = 0
-            
-            for page_num, page in enumerate(doc):
-                # En basit okuma yöntemi (blocks yerine text)
-                raw_text = page.get_text()
-                
-                # Temizle
-                cleaned_text = clean_text(raw_text)
-                
-                # Eğer sayfa doluysa ekle
-                if len(cleaned_text) > 10: # En az 10 karakter olsun
-                    documents.append(Document(
-                        page_content=cleaned_text, 
-                        metadata={"source": filename, "page": page_num+1}
-                    ))
-                    file_text_length += len(cleaned_text)
-                    total_pages += 1
-            
-            doc.close()
-            
-            # --- DEBUG ÇIKTISI ---
-            if file_text_length > 0:
-                print(f"   ✅ {filename}: {file_text_length} karakter okundu.")
-            else:
-                print(f"   ⚠️ {filename}: BOŞ! (Metin okunamadı - Resim olabilir)")
-                empty_files += 1
-                
-        except Exception as e:
-            print(f"   ❌ Hata ({filename}): {e}")
-            
-    print(f"📊 SONUÇ: {len(documents)} parça metin çıkarıldı. {empty_files} dosya boş görünüyor.")
-    return documents
\ No newline at end of file
+        for _ in range(2 * pool_size):
+            submit_next()
+
+        def ordered_results():
+            # Sonuçlar gönderim sırasıyla alınır; her alınan sonucun yerine sıradaki aralık gönderilir
+            while futures:
+                future = futures.popleft()
+                submit_next()
+                yield _safe_call(future.result)
+
+        yield from _collect(tasks, ordered_results(), file_stats)
+
+def _safe_call(fn, *args):
+    """Hata fırlatmak yerine hatayı sonuç olarak döner (bir dosya tüm okumayı durdurmasın)."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+def _file_stats_for(file_stats, filename):
+    return file_stats.setdefault(filename, {"pages": 0, "chars": 0, "seconds": 0.0, "errors": []})
+
+def _collect(tasks, results, file_stats):
+    for (file_path, start, end), result in zip(tasks, results):
+        filename = os.path.basename(file_path)
+        stats = _file_stats_for(file_stats, filename)
+        if isinstance(result, Exception):
+            print(f"   ❌ Hata ({filename}, sayfa {start + 1}-{end}): {result}")
+            stats["errors"].append(f"sayfa {start + 1}-{end}: {result}")
+            continue
+        pages, elapsed = result
+        stats["seconds"] += elapsed
+        for page_num, text in pages:
+            stats["pages"] += 1
+            stats["chars"] += len(text)
+            yield Document(page_content=text, metadata={"source": filename, "page": page_num})
@@ -0,0 +1,63 @@
+import re
+
+_PLACEHOLDER_RE = re.compile(r"(\{context\}|\{question\})")
+_MAX_LABEL_CHARS = 60  # "Bağlam:", "Soru:", "Detaylı Analiz ve Cevap:" gibi kısa başlıklar
+
+def _split_label(segment):
+    """
+    Yer tutucudan önceki metni (talimatlar, başlık) olarak ayırır.
+    Başlık: Yer tutucudan hemen önceki kısa satır ("Bağlam:", "Soru: ").
+    """
+    stripped = segment.rstrip()
+    trailing = segment[len(stripped):]
+    newline = stripped.rfind("\n")
+    body, label = (stripped[:newline], stripped[newline + 1:]) if newline >= 0 else ("", stripped)
+    if len(label) > _MAX_LABEL_CHARS:
+        return stripped, ""
+    return body, label + (trailing if label else "")
+
+def _strip_blank_lines(text):
+    """Baştaki ve sondaki boş satırları atar; satır girintilerine dokunmaz."""
+    lines = text.splitlines()
+    while lines and not lines[0].strip():
+        lines.pop(0)
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return "\n".join(lines)
+
+def prefix_stable_template(text):
+    """
+    Prompt şablonunu Ollama'nın KV önbelleğini en iyi kullanacak sıraya dizer:
+        sabit talimatlar -> {context} -> {question} -> cevap başlığı
+    Ollama, bir önceki istekle ortak olan en uzun başlangıcı (prefix) tekrar hesaplamaz.
+    Talimatlar bağlamdan sonra gelirse ya da soru bağlamdan önce gelirse her istekte
+    yeniden işlenir. Yer tutucuların arasında / sonrasında kalan talimat satırları başa
+    taşınır. Sadece parçaların etrafındaki boş satırlar atılır; satır girintileri (liste,
+    kod örneği) korunur. Her yer tutucu tam bir kez geçmiyorsa şablon olduğu gibi döner
+    (baştaki / sondaki boş satırlar hariç).
+    """
+    text = _strip_blank_lines(text)
+    parts = _PLACEHOLDER_RE.split(text)
+    if len(parts) != 5 or {parts[1], parts[3]} != {"{context}", "{question}"}:
+        return text
+
+    head, first, middle, second, tail = parts
+    head_body, first_label = _split_label(head)
+    middle_body, second_label = _split_label(middle)
+    labels = {first: first_label, second: second_label}
+
+    # Son satır kısa bir başlıksa ("Cevap:") sonda kalır, diğer satırlar talimattır
+    tail_lines = _strip_blank_lines(tail).splitlines()
+    cue = ""
+    if tail_lines and len(tail_lines[-1]) <= _MAX_LABEL_CHARS:
+        cue = tail_lines.pop()
+    tail_body = _strip_blank_lines("\n".join(tail_lines))
+
+    instructions = "\n\n".join(_strip_blank_lines(part) for part in (head_body, middle_body, tail_body) if part.strip())
+    layout = f"{instructions}\n\n{labels['{context}']}{{context}}\n\n{labels['{question}']}{{question}}"
+    return layout + (f"\n\n{cue}" if cue else "")
+
+def static_prefix(template):
+    """Şablonun her istekte aynı kalan baş kısmı (ilk yer tutucuya kadar)."""
+    match = _PLACEHOLDER_RE.search(template)
+    return template[:match.start()] if match else template
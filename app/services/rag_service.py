@@ -1,60 +1,165 @@
 import os
-import torch
+import time
+import threading
+from dataclasses import dataclass
 from fastapi import BackgroundTasks
-from langchain_ollama import OllamaLLM
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+# torch, sentence-transformers (langchain_huggingface), chromadb (langchain_chroma) ve
+# langchain_ollama ağır modüllerdir; açılışı uzatmamak için kullanıldıkları fonksiyonda import edilir.
+from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 
 # Config ve Servis Importları
-# DİKKAT: İki ayrı prompt yolu import edildi
-from app.core.config import CHAT_MODEL, CHROMA_PATH, LOCAL_EMBEDDING_PATH, DATA_PATH, APP_LINKS, PROMPT_FAST_PATH, PROMPT_THINKING_PATH
-from app.services.pdf_loader import load_pdfs_text_only, load_single_pdf
+from app.core.config import CHROMA_PATH, LOCAL_EMBEDDING_PATH, DATA_PATH, APP_LINKS, OLLAMA_BASE_URL
+from app.core.config import MODEL_KEEP_ALIVE, MODEL_UNLOAD_PREVIOUS, LLM_NUM_CTX, CONTEXT_OUTPUT_RESERVE, PROMPT_LAYOUT
+from app.core.config import MEMORY_ENABLED, MEMORY_REWRITE_ENABLED, MEMORY_LLM_MAX_OUTPUT_TOKENS
+from app.core.config import RETRIEVAL_BACKEND, RETRIEVAL_CONNECT_WAIT_SECONDS
+from app.services.pdf_loader import iter_pdf_pages
+from app.services.index_sync import sync_index, index_file, remove_file, purge_index_issues
 from app.services.logging_service import log_conversation
-from app.services.settings_service import get_current_model
+from app.services.config_store import config_store
+from app.services.corpus_version import read_versions
+from app.services.startup_service import startup_phase
+from app.services.cache_service import answer_cache, make_version_stamp
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.lexical_index import ensure_lexical_index
+from app.services.hybrid_retriever import HybridRetriever
+from app.services.retrieval_client import RetrievalClient, RemoteEmbeddings, RemoteRetriever
+from app.services.generation_scheduler import GenerationScheduler, SchedulerRejected
+from app.services.model_warmup import warm_up_model, unload_model, is_model_ready
+from app.services.context_packer import pack_context, count_tokens, template_tokens
+from app.services.prompt_layout import prefix_stable_template, static_prefix
+from app.services.memory_service import (
+    conversation_memory, normalize_history, conversation_key, needs_rewrite, rewrite_question, update_summary
+)
+from app.services.metrics_service import (
+    OllamaStatsCallback, REQUESTS_TOTAL, start_trace, get_trace, trace_summary, timed, record_stage, record_context
+)
 
 # Global Değişkenler
-rag_chain_fast = None      # Hızlı Mod Zinciri
-rag_chain_thinking = None  # Düşünen Mod Zinciri
-retriever = None
+# Ağır kaynaklar (süreç boyunca bellekte kalır, yenilemede tekrar yüklenmez)
 vectorstore = None
 embeddings = None
-current_active_model = None
+# RETRIEVAL_BACKEND="remote" ise embedding ve arama retrieval sunucusunda yapılır
+retrieval_client = None
 
-def load_prompt_from_file(file_path, default_text):
+# Hafif, değiştirilebilir kısım: Zincirler, LLM ve retriever tek bir nesnede tutulur.
+# Yenileme sırasında yeni nesne hazırlanıp tek atamayla değiştirilir; devam eden
+# istekler başladıkları runtime ile bitirir.
+runtime = None
+_reload_lock = threading.Lock()
+_init_lock = threading.RLock()  # Arka plan açılışı ile ilk istekler / işler aynı anda yükleme yapmasın
+_config_stamp_seen = None  # Sürüm damgasındaki en son işlenen "config" sayacı
+_stamp_refresh_thread = None  # Sürüm damgası değişince çalışan arka plan yenilemesi
+_stamp_refresh_guard = threading.Lock()
+embedding_batcher = None  # İlk sorguda, çalışan olay döngüsünde oluşturulur
+# Ollama'ya aynı anda giden üretim sayısını sınırlar; fast soruları thinking analizlerinin arkasında beklemez
+generation_scheduler = GenerationScheduler()
+# Modeli Ollama'da ısındırma / boşaltma sadece sohbeti sunan süreçte yapılır (Admin API yapmaz)
+model_warmup_enabled = False
+
+# LLM seçenekleri; ısındırma isteği de aynı seçeneklerle yapılır (Ollama modeli tekrar yüklemesin)
+LLM_OPTIONS = {"temperature": 0.1, "num_gpu": -1, "num_ctx": LLM_NUM_CTX, "num_thread": 8}
+
+@dataclass(frozen=True)
+class RagRuntime:
+    """Bir anda aktif olan RAG yapılandırması (değiştirilemez)."""
+    model: str
+    llm: object              # OllamaLLM
+    llm_memory: object       # OllamaLLM; soru yeniden yazma / konuşma özeti (kısa çıktı)
+    text_fast: str
+    text_thinking: str
+    config_version: int      # Runtime'ın kurulduğu ayar sürümü (config_store)
+    corpus_version: int      # Runtime'ın gördüğü korpus sürümü (sürüm damgası)
+    retriever: object
+    chain_fast: object       # Hızlı Mod Zinciri
+    chain_thinking: object   # Düşünen Mod Zinciri
+
+def initialize_rag(warm_up=False, writable=False):
     """
-    Belirtilen dosyadan prompt metnini okur.
-    Dosya yoksa varsayılan metni hem döner hem de dosyayı oluşturur.
+    RAG sistemini başlatır.
+    Embedding modeli ve Chroma sadece ilk çağrıda yüklenir; sonraki çağrılar
+    yalnızca reload_rag() ile değişen kısımları yeniler.
+    warm_up=True ise seçili model Ollama'da ısındırılır ve sonraki model
+    değişimlerinde de ısındırma / eski modeli boşaltma yapılır.
+    RETRIEVAL_BACKEND="remote" ise embedding modeli bu süreçte yüklenmez (retrieval sunucusu kullanılır);
+    Chroma sadece writable=True ise (Admin API, belge yazmak için) açılır.
+    Sunucular bunu arka planda çağırır (startup_service); aynı anda gelen çağrılar sırayla çalışır.
     """
-    if os.path.exists(file_path):
+    global vectorstore, embeddings, retrieval_client, model_warmup_enabled, _config_stamp_seen
+
+    with _init_lock:
+        model_warmup_enabled = model_warmup_enabled or warm_up
+
+        if RETRIEVAL_BACKEND == "remote":
+            if retrieval_client is None:
+                retrieval_client = RetrievalClient()
+                print(f"📡 Retrieval sunucusu bekleniyor: {retrieval_client.address}")
+                with startup_phase("retrieval_server"):
+                    if retrieval_client.wait_until_ready(RETRIEVAL_CONNECT_WAIT_SECONDS) is None:
+                        print("⚠️ Retrieval sunucusuna ulaşılamadı; sorular sunucu açılana kadar hata verecek.")
+                embeddings = RemoteEmbeddings(retrieval_client)
+            if writable and vectorstore is None:
+                with startup_phase("chroma"):
+                    vectorstore = _open_vectorstore()
+                with startup_phase("lexical_index"):
+                    ensure_lexical_index(vectorstore)
+        else:
+            load_storage()
+
+        # Model veya prompt dosyası değişince (bu süreçte ya da diğer süreçte) runtime yenilenir
+        config_store.subscribe(_on_config_change)
+        _config_stamp_seen = read_versions(max_age=0).get("config", 0)
+        reload_rag()
+
+def readiness():
+    """
+    /readyz için bileşen durumları: Arama (embedding + Chroma ya da retrieval sunucusu) ve runtime hazır mı?
+    Retrieval sunucusu kullanılıyorsa ping atılır (bloklar; olay döngüsünde doğrudan çağrılmamalı).
+    """
+    if vectorstore is None and retrieval_client is not None:
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if content:
-                    print(f"✅ Prompt yüklendi: {os.path.basename(file_path)}")
-                    return content
-        except Exception as e:
-            print(f"❌ Hata ({file_path}): {e}")
-    
-    # Dosya yoksa varsayılanı oluştur (Admin panelinde boş görünmesin diye)
-    try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(default_text)
-    except: pass
-    
-    return default_text
+            retrieval_client.call("ping")
+            index_ready = True
+        except Exception:
+            index_ready = False
+    else:
+        index_ready = embeddings is not None and vectorstore is not None
+    return {"index": index_ready, "runtime": runtime is not None}
 
-def initialize_rag():
-    global rag_chain_fast, rag_chain_thinking, retriever, vectorstore, embeddings, current_active_model
-    
-    # Güncel modeli ayardan oku
-    selected_model = get_current_model()
-    current_active_model = selected_model
-    
-    print(f"🔄 RAG Sistemi başlatılıyor... Model: {selected_model}")
+def _on_config_change(snapshot, changed):
+    if runtime is not None and changed & {"settings", "prompt_fast", "prompt_thinking"}:
+        if snapshot.chat_model != runtime.model or changed & {"prompt_fast", "prompt_thinking"}:
+            reload_rag()
+
+def load_storage():
+    """
+    Embedding modelini, Chroma'yı ve kelime indeksini bu süreçte yükler (ilk çağrıda).
+    Retrieval sunucusu da bunu kullanır. (embeddings, vectorstore) döner.
+    """
+    global vectorstore, embeddings
+    if embeddings is None:
+        with startup_phase("embedding_model"):
+            embeddings = _load_embeddings()
+
+    if vectorstore is None:
+        with startup_phase("chroma"):
+            vectorstore = _open_vectorstore()
+        # Kelime indeksi yoksa (eski kurulum) Chroma'daki parçalardan oluştur
+        with startup_phase("lexical_index"):
+            ensure_lexical_index(vectorstore)
+    return embeddings, vectorstore
+
+def _ensure_writable_store():
+    """Admin yazma işlemlerinden önce Chroma'nın açık olduğundan emin olur (açılış sürüyorsa bitmesi beklenir)."""
+    if vectorstore is None:
+        with _init_lock:
+            if vectorstore is None:
+                initialize_rag(writable=True)
+
+def _load_embeddings():
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
 
     # --- 1. DONANIM KONTROLÜ ---
     device = "cuda" if torch.cuda.is_available() else "cpu"
@@ -67,101 +172,269 @@ def initialize_rag():
     model_kwargs = {'device': device}
     encode_kwargs = {'normalize_embeddings': True, 'batch_size': 32}
     
-    embeddings = HuggingFaceEmbeddings(
+    return HuggingFaceEmbeddings(
         model_name=LOCAL_EMBEDDING_PATH,
         model_kwargs=model_kwargs,
         encode_kwargs=encode_kwargs
     )
 
+def _open_vectorstore():
+    from langchain_chroma import Chroma
+
     # --- 3. VEKTÖR VERİTABANI ---
     if not os.path.exists(CHROMA_PATH):
         print(f"📂 Veritabanı ({CHROMA_PATH}) bulunamadı, sıfırdan oluşturuluyor...")
-        docs = load_pdfs_text_only(DATA_PATH)
-        if docs:
-            splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=200, length_function=len)
-            chunks = splitter.split_documents(docs)
-            vectorstore = Chroma.from_documents(chunks, embedding=embeddings, persist_directory=CHROMA_PATH)
-            print(f"✅ {len(chunks)} parça bilgi veritabanına işlendi.")
+        store = Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+        # Boş veritabanını klasörle eşitle (PDF'ler paralel okunur, manifest yazılır)
+        report = sync_index(store, DATA_PATH, rebuild=True)
+        if not report["chunks_added"]:
+            print("⚠️ UYARI: Klasörde okunacak PDF bulunamadı. Boş veritabanı oluşturuldu.")
+        return store
+
+    print(f"💾 Mevcut veritabanı yükleniyor: {CHROMA_PATH}")
+    return Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+
+def reload_rag():
+    """
+    Embedding modelini ve Chroma'yı yeniden yüklemeden RAG runtime'ını yeniler.
+    - Model ve promptlar ayar deposunun güncel sürümünden alınır (disk okuması yok).
+    - Model değiştiyse LLM yeniden oluşturulur, değişmediyse mevcut nesne kullanılır.
+    - Retriever ve zincirler yeni runtime için kurulur ve tek atamayla yayına alınır.
+    - Isındırma açıksa yeni model yüklenene kadar istekler eski modelle cevaplanır,
+      geçişten sonra eski model Ollama'dan boşaltılır.
+    """
+    global runtime
+
+    if embeddings is None or (vectorstore is None and retrieval_client is None):
+        initialize_rag()
+        return
+
+    with _reload_lock:
+        previous = runtime
+
+        # Güncel model ve promptlar
+        settings = config_store.snapshot()
+        selected_model = settings.chat_model
+        print(f"🔄 RAG Sistemi yenileniyor... Model: {selected_model}")
+
+        # --- 4. LLM AYARLARI ---
+        if previous is not None and previous.model == selected_model:
+            llm = previous.llm
+            llm_memory = previous.llm_memory
         else:
-            print("⚠️ UYARI: Klasörde okunacak PDF bulunamadı. Boş veritabanı oluşturuluyor.")
-            vectorstore = Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+            from langchain_ollama import OllamaLLM
+            print(f"🤖 Sohbet Modeli: {selected_model}")
+            llm = OllamaLLM(
+                model=selected_model,
+                base_url=OLLAMA_BASE_URL,
+                keep_alive=MODEL_KEEP_ALIVE,  # Boşta kalınca Ollama modeli bellekten atmasın
+                callbacks=[OllamaStatsCallback()],  # Token sayıları ve hız metrikleri
+                **LLM_OPTIONS
+            )
+            # Aynı model ve num_ctx (Ollama tekrar yüklemez), sadece çıktı uzunluğu sınırlı
+            llm_memory = OllamaLLM(
+                model=selected_model,
+                base_url=OLLAMA_BASE_URL,
+                keep_alive=MODEL_KEEP_ALIVE,
+                num_predict=MEMORY_LLM_MAX_OUTPUT_TOKENS,
+                **LLM_OPTIONS
+            )
+
+        # --- 5. PROMPTLAR (Ayar deposundan) ---
+        text_fast = settings.prompt_fast
+        text_thinking = settings.prompt_thinking
+
+        # İlk kullanıcı soğuk model yüklemesini beklemesin.
+        # Isındırma, hızlı modun sabit talimatlarıyla yapılır; ilk istek bu kısmı Ollama önbelleğinden alır.
+        if model_warmup_enabled and not is_model_ready(selected_model):
+            with startup_phase("model_warmup"):
+                warmed = warm_up_model(
+                    selected_model, options=LLM_OPTIONS, prompt=static_prefix(_layout_template(text_fast)),
+                    on_ready=_on_model_warmed,
+                )
+            # Yeni model yüklenemediyse önceki model (hazır) cevap vermeye devam eder;
+            # ısındırma arka planda tekrar denenir, başarılı olunca geçiş yapılır.
+            if not warmed and previous is not None and previous.model != selected_model:
+                print(f"⚠️ {selected_model} henüz hazır değil; {previous.model} cevap vermeye devam ediyor.")
+                return
+
+        # --- 6. ZİNCİRLER VE CEVAP ÖNBELLEĞİ ---
+        corpus_version = previous.corpus_version if previous is not None else read_versions(max_age=0).get("corpus", 0)
+        with startup_phase("runtime"):
+            new_runtime = _assemble_runtime(selected_model, llm, llm_memory, text_fast, text_thinking, settings.version, corpus_version)
+        answer_cache.invalidate("(RAG yenilendi)")
+
+        # Atomik geçiş
+        runtime = new_runtime
+
+        # Önceki model artık kullanılmıyor; VRAM/RAM hemen boşaltılır
+        if model_warmup_enabled and MODEL_UNLOAD_PREVIOUS and previous is not None and previous.model != selected_model:
+            unload_model(previous.model)
+
+    print("⚡ RAG Sistemi Hazır (Çift Modlu)!")
+
+def _on_model_warmed(model):
+    """Tekrar denenen ısındırma başarılı oldu: Model hâlâ seçiliyse runtime ona geçirilir."""
+    if runtime is not None and runtime.model != model and config_store.snapshot().chat_model == model:
+        reload_rag()
+
+def _assemble_runtime(model, llm, llm_memory, text_fast, text_thinking, config_version, corpus_version):
+    """Retriever'ı ve zincirleri kurar, cevap önbelleğinin sürümünü ayarlar (yeni runtime'ı döner)."""
+    # Yoğun (Chroma) + kelime (BM25) araması birleşik retriever
+    if vectorstore is not None:
+        retriever = HybridRetriever(vectorstore=vectorstore)
     else:
-        print(f"💾 Mevcut veritabanı yükleniyor: {CHROMA_PATH}")
-        vectorstore = Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
-
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 4})
-
-    # --- 4. LLM AYARLARI ---
-    print(f"🤖 Sohbet Modeli: {selected_model}")
-    llm = OllamaLLM(
-        model=selected_model,
-        temperature=0.1,
-        num_gpu=-1,       
-        num_ctx=4096,     
-        num_thread=8      
+        retriever = RemoteRetriever(client=retrieval_client)
+    new_runtime = RagRuntime(
+        model=model,
+        llm=llm,
+        llm_memory=llm_memory,
+        text_fast=text_fast,
+        text_thinking=text_thinking,
+        config_version=config_version,
+        corpus_version=corpus_version,
+        retriever=retriever,
+        chain_fast=_build_chain(text_fast, llm, retriever, "fast"),
+        chain_thinking=_build_chain(text_thinking, llm, retriever, "thinking"),
     )
 
-    # --- 5. PROMPTLAR (İKİ AYRI MOD İÇİN) ---
-    
-    # A. Hızlı Mod Varsayılanı
-    default_fast = """Sen kurumsal bir asistansın. Görevin sadece bilgi vermektir.
-    Sadece aşağıdaki 'Bağlam' içindeki bilgileri kullan.
-    Cevaba doğrudan başla. Kısa, net ve öz ol.
-    
-    Bağlam: {context}
-    Soru: {question}
-    Cevap:"""
+    # Koleksiyon, prompt veya model değişirse önbellekteki cevaplar geçersiz olur.
+    answer_cache.set_version(make_version_stamp(
+        _collection_fingerprint(), corpus_version, text_fast, text_thinking, model
+    ))
+    return new_runtime
 
-    # B. Düşünen Mod Varsayılanı
-    default_thinking = """Sen kıdemli bir analist ve kurumsal danışmansın.
-    Görevin:
-    1. Aşağıdaki 'Bağlam' bilgisini detaylıca analiz et.
-    2. Soruyu cevaplamadan önce, bağlamdaki bilgilerin soruyla ilişkisini kur.
-    3. Adım adım düşün ve detaylı, kapsamlı bir açıklama yap.
-    4. Eğer varsa, prosedürleri madde madde açıkla.
+def reopen_vectorstore():
+    """
+    Başka bir süreç (Admin API) Chroma'ya yazdıysa bu süreçteki görünümü yeniler.
+    Chroma aynı klasör için istemciyi süreç içinde önbelleklediğinden önce bu önbellek temizlenir;
+    devam eden aramalar eski nesneyle biter.
+    """
+    from langchain_chroma import Chroma
 
-    Bağlam (Dokümanlar):
-    {context}
+    global vectorstore
+    try:
+        from chromadb.api.client import SharedSystemClient
+        SharedSystemClient.clear_system_cache()
+    except Exception as e:
+        print(f"⚠️ Chroma istemci önbelleği temizlenemedi: {e}")
+    vectorstore = Chroma(persist_directory=CHROMA_PATH, embedding_function=embeddings)
+    return vectorstore
 
-    Soru:
-    {question}
+def refresh_from_version_stamp(force_corpus=False):
+    """
+    Sürüm damgasında değişen bileşenleri yeniler (Chat işçileri):
+    - "config": Ayar dosyaları izleyiciyi beklemeden tekrar kontrol edilir (model / prompt).
+    - "corpus": Chroma görünümü tazelenir, retriever / zincirler ve cevap önbelleği yenilenir.
+      LLM, promptlar ve model ısındırma durumu olduğu gibi kalır.
+    """
+    global runtime, _config_stamp_seen
+    versions = read_versions()
+    config_version = versions.get("config", 0)
+    if config_version != _config_stamp_seen:
+        _config_stamp_seen = config_version
+        config_store.refresh()
 
-    Detaylı Analiz ve Cevap:"""
+    corpus_version = versions.get("corpus", 0)
+    rt = runtime
+    if rt is None or (rt.corpus_version == corpus_version and not force_corpus):
+        return
+    with _reload_lock:
+        rt = runtime
+        if rt.corpus_version == corpus_version and not force_corpus:
+            return
+        print(f"📚 Korpus değişti (sürüm {rt.corpus_version} -> {corpus_version}), arama yenileniyor...")
+        if vectorstore is not None:
+            reopen_vectorstore()
+        new_runtime = _assemble_runtime(
+            rt.model, rt.llm, rt.llm_memory, rt.text_fast, rt.text_thinking, rt.config_version, corpus_version
+        )
+        answer_cache.invalidate("(Korpus değişti)")
+        runtime = new_runtime
 
-    # Dosyalardan Yükle
-    text_fast = load_prompt_from_file(PROMPT_FAST_PATH, default_fast)
-    text_thinking = load_prompt_from_file(PROMPT_THINKING_PATH, default_thinking)
+def stamp_changed(rt):
+    """İstek başında ucuz kontrol: Sürüm damgası runtime'ın bildiğinden farklı mı?"""
+    versions = read_versions()
+    return versions.get("corpus", 0) != rt.corpus_version or versions.get("config", 0) != _config_stamp_seen
 
-    prompt_fast = ChatPromptTemplate.from_template(text_fast)
-    prompt_thinking = ChatPromptTemplate.from_template(text_thinking)
+def _refresh_stamp_in_background():
+    try:
+        refresh_from_version_stamp()
+    except Exception as e:
+        print(f"❌ Sürüm damgası yenileme hatası: {e}")
 
-    # --- 6. ZİNCİRLERİ OLUŞTUR ---
-    
-    # Zincir 1: Hızlı (Fast)
-    rag_chain_fast = (
-        {
-            "question": lambda x: x["question"],
-            "context": lambda x: _get_context_with_links(x["question"])
-        } 
-        | prompt_fast 
-        | llm 
-        | StrOutputParser()
-    )
+def _schedule_stamp_refresh():
+    """Yenilemeyi (tek seferde bir tane) arka plan thread'inde başlatır."""
+    global _stamp_refresh_thread
+    with _stamp_refresh_guard:
+        if _stamp_refresh_thread is not None and _stamp_refresh_thread.is_alive():
+            return
+        _stamp_refresh_thread = threading.Thread(target=_refresh_stamp_in_background, name="stamp-refresh", daemon=True)
+        _stamp_refresh_thread.start()
+
+def _current_runtime():
+    """
+    Güncel runtime. Sürüm damgası değiştiyse yenileme arka planda başlatılır ve istek beklemez:
+    Yeni model ısınırken / Chroma yeniden açılırken mevcut runtime cevap vermeye devam eder,
+    yenisi hazır olunca tek atamayla devreye girer.
+    """
+    rt = runtime
+    if rt is not None and stamp_changed(rt):
+        _schedule_stamp_refresh()
+    return rt
+
+def _layout_template(text):
+    """Ayara göre şablonu KV önbelleği dostu sıraya dizer (bkz. prompt_layout)."""
+    return prefix_stable_template(text) if PROMPT_LAYOUT == "prefix_stable" else text
+
+def prompt_template(template_text):
+    """
+    Zincirin kullandığı prompt nesnesi. OllamaLLM düz metin modeli olduğundan PromptTemplate kullanılır:
+    Ollama'ya giden metin template.format(...) ile birebir aynıdır (ChatPromptTemplate başa "Human: " ekler
+    ve ısındırmanın önbelleğe aldığı sabit başlangıç gerçek isteklerle eşleşmez).
+    """
+    return PromptTemplate.from_template(template_text)
 
-    # Zincir 2: Düşünen (Thinking)
-    rag_chain_thinking = (
+def _build_chain(template_text, llm, retriever, mode):
+    template_text = _layout_template(template_text)
+    prompt = prompt_template(template_text)
+    return (
         {
             "question": lambda x: x["question"],
-            "context": lambda x: _get_context_with_links(x["question"])
+            # Arama, takip sorusunun bağımsız haliyle (retrieval_query) yapılır
+            "context": lambda x: _get_context_with_links(
+                x.get("retrieval_query") or x["question"], retriever, x.get("query_vector"), mode, template_text,
+                memory=x.get("memory", ""), question=x["question"]
+            )
         } 
-        | prompt_thinking 
+        | _timed_prompt(prompt)
         | llm 
         | StrOutputParser()
     )
-    
-    print("⚡ RAG Sistemi Hazır (Çift Modlu)!")
 
-def _get_context_with_links(query):
+def _timed_prompt(prompt):
+    """Prompt formatlama süresini 'prompt_format' aşaması olarak ölçer."""
+    def format_prompt(inputs):
+        with timed("prompt_format"):
+            return prompt.invoke(inputs)
+    return RunnableLambda(format_prompt)
+
+def _collection_fingerprint():
+    """Chroma koleksiyonunun adı ve parça sayısından oluşan basit bir iz."""
+    try:
+        if vectorstore is None:
+            return retrieval_client.call("fingerprint")
+        return f"{vectorstore._collection.name}:{vectorstore._collection.count()}"
+    except Exception:
+        return "unknown"
+
+def _context_budget(mode, template_text, query, injected_links, memory=""):
+    """num_ctx'ten cevap payı, şablon, soru, konuşma hafızası ve link metni düşüldükten sonra parçalara kalan token."""
+    reserve = CONTEXT_OUTPUT_RESERVE.get(mode, CONTEXT_OUTPUT_RESERVE["fast"])
+    used = template_tokens(template_text) + count_tokens(query) + count_tokens(injected_links) + count_tokens(memory)
+    return max(0, LLM_NUM_CTX - reserve - used)
+
+def _get_context_with_links(query, retriever, query_vector=None, mode="fast", template_text="", memory="", question=None):
     # Link Enjeksiyonu
     injected_links = ""
     query_lower = query.lower()
@@ -174,8 +447,9 @@ def _get_context_with_links(query):
     if found_links:
         injected_links = "\n\n[SİSTEM TARAFINDAN BULUNAN ERİŞİM LİNKLERİ]:\n" + "\n".join(found_links) + "\n(Kullanıcıya bu linki vererek cevapla.)\n"
 
-    # PDF Araması
-    docs = retriever.invoke(query)
+    # PDF Araması (Embedding önceden hesaplandıysa tekrar hesaplanmaz)
+    with timed("retrieve"):
+        docs = retriever.search(query, query_vector)
     
     # Debug Çıktısı
     print("\n" + "="*40)
@@ -187,42 +461,173 @@ def _get_context_with_links(query):
         print(f"   [{i+1}] {src}")
     print("="*40 + "\n")
 
-    pdf_context = "\n\n".join([d.page_content for d in docs])
-    return pdf_context + injected_links
+    # Tekrarlanan / örtüşen parçalar ayıklanır, kalanlar skor sırasıyla bütçeye sığdırılır
+    with timed("context_pack"):
+        budget = _context_budget(mode, template_text, question or query, injected_links, memory)
+        pdf_context, report = pack_context(docs, budget)
+    record_context(report)
+    print(f"📦 Bağlam ({mode}): {report['packed_chunks']} parça / {report['packed_tokens']} token paketlendi, "
+          f"{report['dropped_chunks']} parça / {report['dropped_tokens']} token atıldı "
+          f"(bütçe {budget}, birleşen {report['merged']}, tekrar {report['duplicates']})")
+    return memory + pdf_context + injected_links
+
+# --- ADMIN: İNDEKS SENKRONİZASYONU ---
+def sync_with_data_folder(dry_run=False, progress=None):
+    """'belgelerim' klasörünü Chroma ile eşitler (sadece değişen dosyalar embed edilir)."""
+    _ensure_writable_store()
+    return sync_index(vectorstore, DATA_PATH, dry_run=dry_run, progress=progress)
+
+def remove_file_from_index(filename):
+    """Yayından kaldırılan dosyanın parçalarını vektör veritabanından siler."""
+    _ensure_writable_store()
+    deleted = remove_file(vectorstore, filename)
+    answer_cache.invalidate(f"(Belge kaldırıldı: {filename})")
+    return deleted
+
+def clean_index(dry_run=True):
+    """Sahipsiz ve tekrarlanan parçaları raporlar / siler."""
+    _ensure_writable_store()
+    return purge_index_issues(vectorstore, DATA_PATH, dry_run=dry_run)
 
 # --- ADMIN: CANLI BELGE EKLEME ---
-def ingest_new_file(file_path):
+def ingest_new_file(file_path, progress=None):
+    """
+    Dosyayı indeksler; eklenen parça sayısını döner (0 ise metin çıkmamıştır).
+    progress verilirse sayfa / embedding / yazma ilerlemesi bildirilir (Admin iş kuyruğu).
+    """
     global vectorstore, embeddings
-    if not vectorstore: initialize_rag()
+    _ensure_writable_store()
 
     print(f"🔄 Yeni dosya işleniyor: {file_path}")
-    new_docs = load_single_pdf(file_path)
     
-    if new_docs:
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1024, chunk_overlap=200, length_function=len)
-        chunks = splitter.split_documents(new_docs)
-        vectorstore.add_documents(chunks)
+    # Sayfalar tek tek okunup parçalanır ve kaynak tabanlı id'lerle yazılır (manifest güncellenir)
+    with timed("ingest_file"):
+        added = index_file(vectorstore, file_path, iter_pdf_pages(file_path), progress=progress)
+    
+    if added:
         print(f"✅ Eklendi.")
-        return True
-    return False
+        answer_cache.invalidate(f"(Yeni belge: {os.path.basename(file_path)})")
+    return added
 
 # --- KULLANICI: CEVAP ÜRETME (MOD SEÇİMLİ) ---
-async def get_answer(query: str, mode: str, ip_address: str, background_tasks: BackgroundTasks):
+def _select_chain(rt: RagRuntime, mode: str):
+    """
+    Mod bilgisine göre ('fast' veya 'thinking') zinciri ve log etiketini döner.
+    """
+    if mode == "thinking":
+        return rt.chain_thinking, "PDF (Thinking Mode)"
+    return rt.chain_fast, "PDF (Fast Mode)"
+
+async def _embed_query(query: str):
+    """
+    Sorgu embedding'ini olay döngüsünü bloklamadan hesaplar.
+    Eşzamanlı sorgular EmbeddingBatcher ile tek batch'te encode edilir.
+    """
+    global embedding_batcher
+    if embedding_batcher is None:
+        # bge-m3 için sorgu ve doküman encode'u aynıdır (instruction yok)
+        embedding_batcher = EmbeddingBatcher(embeddings.embed_documents)
+    with timed("embed"):
+        return await embedding_batcher.embed(query)
+
+def _prepare_turn(query: str, ip_address: str, history, conversation_id):
+    """
+    Çok turlu konuşma için hafızayı hazırlar (LLM çağrısı yok).
+    Dönen sözlük: retrieval_query (arama için bağımsız soru), memory (prompta girecek özet + son turlar),
+    follow_up (soru önceki konuşmaya atıf yapıyor mu), key ve messages (cevaptan sonra özeti güncellemek için).
+    Önbellek kuralı: Takip soruları önbelleğe bakmaz; hafızayla üretilen cevaplar önbelleğe yazılmaz.
+    """
+    turn = {"retrieval_query": query, "memory": "", "follow_up": False, "key": None, "messages": []}
+    messages = normalize_history(history) if MEMORY_ENABLED else []
+    if not messages:
+        return turn
+
+    key = conversation_key(conversation_id, ip_address, messages)
+    memory, pending = conversation_memory.build_block(key, messages)
+    turn.update(memory=memory, key=key, messages=messages, follow_up=needs_rewrite(query))
+
+    trace = get_trace()
+    if trace is not None:
+        trace["memory"] = {
+            "messages": len(messages),
+            "memory_tokens": count_tokens(memory),
+            "pending_summary": pending,
+            "retrieval_query": None,
+        }
+    return turn
+
+async def _rewrite_follow_up(rt: RagRuntime, turn, query: str, mode: str, ip_address: str):
+    """
+    Takip sorusunu arama için bağımsız bir soruya çevirir; soru değiştiyse True döner.
+    "peki onu nasıl onaylarım?" -> "E-PCR talebi nasıl onaylanır?"
+    Üretim sırasında yer tuttuğu için sadece önbellek kontrolünden sonra çağrılır.
+    """
+    if not (turn["follow_up"] and MEMORY_REWRITE_ENABLED):
+        return False
+    async with generation_scheduler.slot(mode, ip_address):
+        with timed("rewrite"):
+            turn["retrieval_query"] = await rewrite_question(rt.llm_memory, query, turn["memory"])
+    print(f"🧠 Takip sorusu: '{query}' -> '{turn['retrieval_query']}'")
+
+    trace = get_trace()
+    if trace is not None and "memory" in trace:
+        trace["memory"]["retrieval_query"] = turn["retrieval_query"] if turn["retrieval_query"] != query else None
+    return turn["retrieval_query"] != query
+
+def _schedule_summary(background_tasks: BackgroundTasks, rt: RagRuntime, turn, query, response, ip_address):
+    """Cevaptan sonra konuşma özetini arka planda günceller (düşük öncelikle kuyruğa girer)."""
+    if not turn["key"]:
+        return
+    messages = turn["messages"] + [("user", query), ("assistant", response)]
+
+    async def summarize():
+        try:
+            async with generation_scheduler.slot("summary", ip_address):
+                await update_summary(rt.llm_memory, turn["key"], messages)
+        except SchedulerRejected:
+            pass  # Sistem yoğun; özet bir sonraki turda güncellenir
+
+    background_tasks.add_task(summarize)
+
+async def get_answer(query: str, mode: str, ip_address: str, background_tasks: BackgroundTasks, history=None, conversation_id=None):
     """
     Mode parametresine göre ('fast' veya 'thinking') ilgili zinciri çalıştırır.
+    history verilirse takip sorusu bağımsız hale getirilir ve konuşma hafızası prompta eklenir.
+    Kuyruk doluysa SchedulerRejected fırlatır (endpoint 429/503 döner).
     """
-    if not rag_chain_fast: return "Sistem hazırlanıyor..."
+    rt = _current_runtime()  # İstek boyunca aynı runtime kullanılır
+    if rt is None: return "Sistem hazırlanıyor..."
     
     # Zincir Seçimi
-    if mode == "thinking":
-        chain = rag_chain_thinking
-        log_context = "PDF (Thinking Mode)"
+    chain, log_context = _select_chain(rt, mode)
+    trace = start_trace(mode)
+    started = time.perf_counter()
+    turn = _prepare_turn(query, ip_address, history, conversation_id)
+    
+    # Önbellek Kontrolü: Önce orijinal soruyla (ucuz). Aynı embedding retrieval için de kullanılır.
+    # Takip soruları önbellekten cevaplanmaz (cevap konuşmaya bağlıdır).
+    cache_version = answer_cache.current_version()  # Üretim sırasında önbellek temizlenirse cevap saklanmaz
+    query_vector = await _embed_query(query)
+    response = answer_cache.lookup(mode, query_vector) if not turn["follow_up"] else None
+    
+    if response is not None:
+        log_context += " [Cache]"
     else:
-        chain = rag_chain_fast
-        log_context = "PDF (Fast Mode)"
+        if await _rewrite_follow_up(rt, turn, query, mode, ip_address):
+            query_vector = await _embed_query(turn["retrieval_query"])
+        # Sıra gelince çalıştır (önbellekten dönen cevaplar kuyruğa girmez)
+        async with generation_scheduler.slot(mode, ip_address):
+            with timed("chain"):
+                response = await chain.ainvoke({
+                    "question": query, "retrieval_query": turn["retrieval_query"],
+                    "query_vector": query_vector, "memory": turn["memory"],
+                })
+        # Konuşma hafızasıyla üretilen cevaplar o konuşmaya özeldir; ortak önbelleğe yazılmaz.
+        if not turn["memory"]:
+            answer_cache.store(mode, turn["retrieval_query"], query_vector, response, version=cache_version)
     
-    # Çalıştır
-    response = await chain.ainvoke({"question": query})
+    record_stage("request_total", time.perf_counter() - started)
+    REQUESTS_TOTAL.inc(mode=mode, cache="hit" if "[Cache]" in log_context else "miss")
     
     # Asenkron Loglama
     background_tasks.add_task(
@@ -230,8 +635,101 @@ async def get_answer(query: str, mode: str, ip_address: str, background_tasks: B
         query=query,
         response=response,
         context=log_context, 
-        model=current_active_model,
-        ip_address=ip_address
+        model=rt.model,
+        ip_address=ip_address,
+        timings=trace_summary(trace)
     )
+    # Özet, log kaydından sonra (arka plan görevleri sırayla çalışır)
+    _schedule_summary(background_tasks, rt, turn, query, response, ip_address)
     
-    return response
\ No newline at end of file
+    return response
+
+async def stream_answer(query: str, mode: str, ip_address: str, background_tasks: BackgroundTasks, history=None, conversation_id=None):
+    """
+    get_answer'ın akış (streaming) versiyonu.
+    Zinciri astream ile çalıştırır ve üretilen her parçayı geldiği anda iletir:
+    - {"type": "token", "content": "..."}  -> Model çıktısı
+    - {"type": "done", "ttft_ms": ..., "total_ms": ...} -> Akış bitti
+    - {"type": "error", "status": 429/503, "detail": ..., "retry_after": ...} -> Kuyruk dolu
+    Tam cevap, akış tamamlandığında log_conversation ile kaydedilir.
+    """
+    rt = _current_runtime()  # Akış boyunca aynı runtime kullanılır
+    if rt is None:
+        yield {"type": "token", "content": "Sistem hazırlanıyor..."}
+        yield {"type": "done", "ttft_ms": None, "total_ms": 0}
+        return
+
+    chain, log_context = _select_chain(rt, mode)
+    model = rt.model
+    trace = start_trace(mode)
+
+    started = time.perf_counter()
+    ttft_ms = None
+    parts = []
+
+    turn = _prepare_turn(query, ip_address, history, conversation_id)
+
+    # Önbellekte varsa tek parça olarak gönder (orijinal soruyla; takip soruları önbelleğe bakmaz)
+    cache_version = answer_cache.current_version()  # Akış sırasında önbellek temizlenirse cevap saklanmaz
+    query_vector = await _embed_query(query)
+    cached = answer_cache.lookup(mode, query_vector) if not turn["follow_up"] else None
+    if cached is not None:
+        ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+        record_stage("request_total", time.perf_counter() - started)
+        REQUESTS_TOTAL.inc(mode=mode, cache="hit")
+        yield {"type": "token", "content": cached}
+        background_tasks.add_task(
+            log_conversation,
+            query=query,
+            response=cached,
+            context=log_context + " [Cache]",
+            model=model,
+            ip_address=ip_address,
+            timings=trace_summary(trace)
+        )
+        _schedule_summary(background_tasks, rt, turn, query, cached, ip_address)
+        yield {"type": "done", "ttft_ms": ttft_ms, "total_ms": ttft_ms, "cached": True}
+        return
+
+    try:
+        if await _rewrite_follow_up(rt, turn, query, mode, ip_address):
+            query_vector = await _embed_query(turn["retrieval_query"])
+        async with generation_scheduler.slot(mode, ip_address):
+            async for token in chain.astream({
+                "question": query, "retrieval_query": turn["retrieval_query"],
+                "query_vector": query_vector, "memory": turn["memory"],
+            }):
+                if not token:
+                    continue
+                if ttft_ms is None:
+                    # İlk token süresi (Time To First Token) - kullanıcının beklediği asıl süre
+                    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                    record_stage("ttft", ttft_ms / 1000)
+                    print(f"⏱️ İlk token: {ttft_ms} ms ({mode})")
+                parts.append(token)
+                yield {"type": "token", "content": token}
+    except SchedulerRejected as e:
+        # Başlıklar gönderildiği için HTTP durumu değiştirilemez; hata olay olarak iletilir
+        yield {"type": "error", "status": e.status_code, "detail": e.detail, "retry_after": e.retry_after}
+        return
+
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    record_stage("request_total", total_ms / 1000)
+    REQUESTS_TOTAL.inc(mode=mode, cache="miss")
+    print(f"⏱️ Akış tamamlandı: {total_ms} ms ({mode})")
+    if not turn["memory"]:
+        answer_cache.store(mode, turn["retrieval_query"], query_vector, "".join(parts), version=cache_version)
+
+    # Akış bittikten sonra tam cevabı logla
+    background_tasks.add_task(
+        log_conversation,
+        query=query,
+        response="".join(parts),
+        context=log_context,
+        model=model,
+        ip_address=ip_address,
+        timings=trace_summary(trace)
+    )
+    _schedule_summary(background_tasks, rt, turn, query, "".join(parts), ip_address)
+
+    yield {"type": "done", "ttft_ms": ttft_ms, "total_ms": total_ms, "cached": False}
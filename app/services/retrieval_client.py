@@ -0,0 +1,165 @@
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from typing import Any, List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from app.core.config import (
+    RETRIEVAL_SERVER_ADDRESS,
+    RETRIEVAL_SERVER_AUTHKEY,
+    RETRIEVAL_AUTHKEY_PATH,
+    RETRIEVAL_CLIENT_POOL_SIZE,
+    RETRIEVAL_CLIENT_TIMEOUT_SECONDS,
+)
+
+def parse_address(text):
+    """'127.0.0.1:8765' -> ('127.0.0.1', 8765); diğer değerler unix soket yolu kabul edilir."""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return text
+
+def load_authkey(create=False):
+    """
+    Retrieval sunucusunun ortak anahtarını döner.
+    RAG_RETRIEVAL_AUTHKEY verilmişse o kullanılır; yoksa anahtar dosyasından okunur.
+    create=True ise (sunucu) dosya yoksa rastgele bir anahtar üretilip sadece sahibinin
+    okuyabileceği şekilde (0600) yazılır. Dosya yoksa istemcide FileNotFoundError fırlar.
+    """
+    if RETRIEVAL_SERVER_AUTHKEY:
+        return RETRIEVAL_SERVER_AUTHKEY
+    try:
+        with open(RETRIEVAL_AUTHKEY_PATH, "rb") as f:
+            key = f.read().strip()
+        if key:
+            return key
+    except FileNotFoundError:
+        if not create:
+            raise
+    if not create:
+        raise FileNotFoundError(f"Retrieval anahtar dosyası boş: {RETRIEVAL_AUTHKEY_PATH}")
+
+    key = secrets.token_hex(32).encode("ascii")
+    tmp_path = RETRIEVAL_AUTHKEY_PATH + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    os.replace(tmp_path, RETRIEVAL_AUTHKEY_PATH)
+    print(f"🔑 Retrieval anahtarı oluşturuldu: {RETRIEVAL_AUTHKEY_PATH}")
+    return key
+
+class RetrievalClient:
+    """
+    Retrieval sunucusuna (app.services.retrieval_server) bağlantı havuzu.
+    Her çağrı havuzdan bir bağlantı alır, isteği gönderir ve cevabı bekler; böylece
+    aynı işçideki eşzamanlı istekler (thread'ler) birbirini beklemez.
+    Kopan bağlantı atılır ve istek yeni bir bağlantıyla bir kez tekrar denenir.
+    authkey verilmezse ilk bağlantıda load_authkey() ile okunur (sunucu henüz anahtarı yazmamışsa
+    bağlantı hatası gibi davranılır, wait_until_ready beklemeye devam eder).
+    """
+
+    def __init__(self, address=RETRIEVAL_SERVER_ADDRESS, authkey=None,
+                 pool_size=RETRIEVAL_CLIENT_POOL_SIZE, timeout=RETRIEVAL_CLIENT_TIMEOUT_SECONDS):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self._authkey_from_file = authkey is None
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+        # İstatistikler
+        self.calls = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.total_seconds = 0.0
+
+    def call(self, op, *args):
+        started = time.perf_counter()
+        try:
+            for attempt in (1, 2):
+                with self._slots:
+                    conn = None
+                    try:
+                        conn = self._checkout()
+                        conn.send((op, args))
+                        if not conn.poll(self.timeout):
+                            raise TimeoutError(f"Retrieval sunucusu {self.timeout} sn içinde cevap vermedi")
+                        status, result = conn.recv()
+                    except (EOFError, OSError, TimeoutError, AuthenticationError) as e:
+                        if conn is not None:
+                            conn.close()  # Yarım kalmış cevap sonraki isteğe karışmasın
+                        if isinstance(e, AuthenticationError) and self._authkey_from_file:
+                            self.authkey = None  # Sunucu anahtarı yenilemiş olabilir; tekrar okunur
+                        self.reconnects += 1
+                        if attempt == 2 or isinstance(e, TimeoutError):
+                            self.errors += 1
+                            raise ConnectionError(f"Retrieval sunucusuna ulaşılamadı ({op}): {e}") from e
+                        continue
+                    self._idle.put(conn)
+                if status == "error":
+                    self.errors += 1
+                    raise RuntimeError(f"Retrieval sunucusu hatası ({op}): {result}")
+                return result
+        finally:
+            self.calls += 1
+            self.total_seconds += time.perf_counter() - started
+
+    def wait_until_ready(self, timeout):
+        """Sunucu cevap verene kadar bekler (açılışta sunucu henüz modeli yüklüyor olabilir)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.call("ping")
+            except ConnectionError:
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(1)
+
+    def stats(self):
+        return {
+            "address": str(self.address),
+            "calls": self.calls,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "idle_connections": self._idle.qsize(),
+            "avg_ms": round(self.total_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+        }
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            if self.authkey is None:
+                self.authkey = load_authkey()
+            return Client(self.address, authkey=self.authkey)
+
+class RemoteEmbeddings(Embeddings):
+    """Embedding'i retrieval sunucusunda hesaplatan LangChain Embeddings (bge-m3 bu süreçte yüklenmez)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def embed_documents(self, texts):
+        return self.client.call("embed", list(texts))
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class RemoteRetriever(BaseRetriever):
+    """HybridRetriever ile aynı arayüz; arama (Chroma + BM25 + RRF) retrieval sunucusunda yapılır."""
+
+    client: Any
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search(query)
+
+    def search(self, query: str, query_vector=None) -> List[Document]:
+        return self.client.call("search", query, query_vector)
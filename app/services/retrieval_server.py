@@ -0,0 +1,235 @@
+"""
+Embedding modelini (bge-m3), Chroma'yı ve BM25 indeksini tek süreçte tutan retrieval sunucusu.
+Chat API birden fazla işçiyle çalıştırıldığında (uvicorn --workers N) model ve veritabanı
+her işçide ayrı ayrı yüklenmez; işçiler yerel soket üzerinden bu sunucuya bağlanır.
+
+Bağlantılar pickle kullandığından sunucu varsayılan olarak 0600 izinli bir unix soketinde dinler;
+ortak anahtar RAG_RETRIEVAL_AUTHKEY ile verilmezse ilk açılışta üretilip 0600 izinli dosyaya yazılır.
+
+Kullanım (proje kök dizininden):
+    python -m app.services.retrieval_server
+    RAG_RETRIEVAL_BACKEND=remote WEB_CONCURRENCY=4 uvicorn app.main_chat:app --host 0.0.0.0 --port 8000
+    RAG_RETRIEVAL_BACKEND=remote uvicorn app.main_admin:app --host 0.0.0.0 --port 8001
+"""
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Listener
+
+from app.core.config import (
+    RETRIEVAL_SERVER_ADDRESS,
+    EMBED_BATCH_MAX_SIZE,
+    EMBED_BATCH_MAX_WAIT_MS,
+)
+from app.services.retrieval_client import parse_address, load_authkey
+from app.services.corpus_version import read_versions
+
+class BatchEncoder:
+    """
+    Farklı bağlantılardan (işçilerden) gelen embedding isteklerini birkaç milisaniye
+    toplayıp tek bir encode çağrısında hesaplar (EmbeddingBatcher'ın thread'li karşılığı).
+    """
+
+    def __init__(self, encode_fn, max_batch_size=EMBED_BATCH_MAX_SIZE, max_wait_ms=EMBED_BATCH_MAX_WAIT_MS):
+        self._encode = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="retrieval-encoder", daemon=True)
+        self._thread.start()
+
+        # İstatistikler
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.encode_seconds = 0.0
+
+    def encode(self, texts):
+        request = {"texts": texts, "done": threading.Event(), "vectors": None, "error": None}
+        self._queue.put(request)
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["vectors"]
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "encode_seconds": round(self.encode_seconds, 3),
+        }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0]["texts"])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request["texts"])
+
+            texts = [text for request in batch for text in request["texts"]]
+            started = time.perf_counter()
+            try:
+                vectors = self._encode(texts)
+                error = None
+            except Exception as e:
+                vectors, error = None, e
+            self.encode_seconds += time.perf_counter() - started
+            self.batches += 1
+            self.items += len(texts)
+            self.largest_batch = max(self.largest_batch, len(texts))
+
+            offset = 0
+            for request in batch:
+                count = len(request["texts"])
+                if error is not None:
+                    request["error"] = error
+                else:
+                    request["vectors"] = vectors[offset:offset + count]
+                offset += count
+                request["done"].set()
+
+class RetrievalServer:
+    """
+    İstek biçimi: (işlem, argümanlar) -> cevap: ("ok", sonuç) veya ("error", mesaj)
+        ping                      -> sunucu bilgisi
+        embed(texts)              -> vektör listesi (batch'lenir)
+        search(query, vector)     -> Document listesi (HybridRetriever, vektör yoksa sunucuda hesaplanır)
+        fingerprint()             -> koleksiyon izi (cevap önbelleği sürümü için)
+    search / fingerprint öncesinde sürüm damgası kontrol edilir; korpus değiştiyse Chroma yeniden açılır.
+        stats()                   -> istatistikler
+    Her bağlantı ayrı bir thread'de karşılanır; encode tek thread'de (BatchEncoder) toplanır.
+    """
+
+    def __init__(self, address=RETRIEVAL_SERVER_ADDRESS, authkey=None):
+        self.address = parse_address(address)
+        self.authkey = authkey if authkey is not None else load_authkey(create=True)
+        self.encoder = None
+        self.retriever = None
+        self.vectorstore = None
+        self.corpus_version = None
+        self.reopens = 0
+        self._reopen_lock = threading.Lock()
+        self.started_at = None
+        self.connections = 0
+        self.requests = {}
+
+    def load(self):
+        # rag_service'in ağır bağımlılıkları sadece sunucu başlatılırken yüklenir
+        from app.services import rag_service
+        from app.services.hybrid_retriever import HybridRetriever
+
+        embeddings, self.vectorstore = rag_service.load_storage()
+        self.encoder = BatchEncoder(embeddings.embed_documents)
+        self.retriever = HybridRetriever(vectorstore=self.vectorstore)
+        self.corpus_version = read_versions(max_age=0).get("corpus", 0)
+
+    def _check_corpus(self):
+        """Admin API korpusu değiştirdiyse (sürüm damgası) Chroma görünümü yeniden açılır."""
+        version = read_versions().get("corpus", 0)
+        if version == self.corpus_version:
+            return
+        from app.services import rag_service
+        from app.services.hybrid_retriever import HybridRetriever
+
+        with self._reopen_lock:
+            if version == self.corpus_version:
+                return
+            print(f"📚 Korpus değişti (sürüm {self.corpus_version} -> {version}), Chroma yeniden açılıyor...")
+            self.vectorstore = rag_service.reopen_vectorstore()
+            self.retriever = HybridRetriever(vectorstore=self.vectorstore)
+            self.corpus_version = version
+            self.reopens += 1
+
+    def serve_forever(self):
+        self.load()
+        listener = self._listen()
+        self.started_at = time.time()
+        print(f"📡 Retrieval sunucusu dinliyor: {self.address}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:  # Yanlış authkey vb.
+                    print(f"⚠️ Bağlantı reddedildi: {e}")
+                    continue
+                self.connections += 1
+                threading.Thread(target=self._serve, args=(conn,), name="retrieval-conn", daemon=True).start()
+        finally:
+            listener.close()
+
+    def _listen(self):
+        """
+        Unix soketi sadece sahibinin erişebileceği izinlerle (0600) açılır; önceki çalışmadan
+        kalan soket dosyası silinir. TCP adresi sadece yerel (loopback) olabilir.
+        """
+        if isinstance(self.address, tuple):
+            if self.address[0] not in ("127.0.0.1", "localhost", "::1"):
+                raise ValueError(f"Retrieval sunucusu sadece yerel adreste dinleyebilir: {self.address}")
+            return Listener(self.address, authkey=self.authkey)
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        old_umask = os.umask(0o177)  # Soket oluşturulurken bile başka kullanıcılara açık olmasın
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.address, 0o600)
+        return listener
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                self.requests[op] = self.requests.get(op, 0) + 1
+                try:
+                    reply = ("ok", self._dispatch(op, args))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _dispatch(self, op, args):
+        if op == "ping":
+            return {"address": str(self.address), "started_at": self.started_at}
+        if op == "embed":
+            return self.encoder.encode(args[0])
+        if op in ("search", "fingerprint"):
+            self._check_corpus()
+        if op == "search":
+            query, query_vector = args
+            if query_vector is None:
+                query_vector = self.encoder.encode([query])[0]
+            return self.retriever.search(query, query_vector)
+        if op == "fingerprint":
+            return f"{self.vectorstore._collection.name}:{self.vectorstore._collection.count()}"
+        if op == "stats":
+            return {
+                "connections": self.connections,
+                "corpus_version": self.corpus_version,
+                "reopens": self.reopens,
+                "requests": dict(self.requests),
+                "encoder": self.encoder.stats(),
+                "uptime_seconds": round(time.time() - self.started_at, 1) if self.started_at else None,
+            }
+        raise ValueError(f"Bilinmeyen işlem: {op}")
+
+if __name__ == "__main__":
+    RetrievalServer().serve_forever()
@@ -1,51 +1,73 @@
-import json
-import os
-import requests
-from app.core.config import SETTINGS_FILE_PATH
+import asyncio
+import time
 
-DEFAULT_MODEL = "gemma3:12b"
+import httpx
+from app.core.config import OLLAMA_BASE_URL, MODEL_LIST_CACHE_TTL_SECONDS, MODEL_LIST_TIMEOUT_SECONDS
+from app.services.cache_service import answer_cache
+from app.services.config_store import config_store
+
+# Ollama'ya ulaşılamazsa gösterilecek liste
+FALLBACK_MODELS = ["gemma2:9b", "llama3.2", "mistral", "qwen2.5"]
 
 def get_current_model():
     """
-    settings.json dosyasından seçili modeli okur.
-    Dosya yoksa varsayılanı döner.
+    Seçili modeli döner (settings.json'un bellekteki kopyasından, disk okuması yok).
+    Ayar yoksa varsayılanı döner.
     """
-    if not os.path.exists(SETTINGS_FILE_PATH):
-        return DEFAULT_MODEL
-    
-    try:
-        with open(SETTINGS_FILE_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data.get("chat_model", DEFAULT_MODEL)
-    except:
-        return DEFAULT_MODEL
+    return config_store.snapshot().chat_model
 
 def set_current_model(model_name):
     """
-    Seçilen modeli dosyaya kaydeder.
+    Seçilen modeli dosyaya kaydeder. Ayar deposu değişikliği bu süreçte hemen,
+    diğer süreçte dosya izleyicisiyle yayınlar.
     """
-    data = {"chat_model": model_name}
     try:
-        with open(SETTINGS_FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        config_store.set_chat_model(model_name)
+        # Eski modelin cevapları artık geçerli değil
+        answer_cache.invalidate(f"(Model değişti: {model_name})")
         return True
     except Exception as e:
         print(f"Ayar kaydetme hatası: {e}")
         return False
 
-def get_available_models():
-    """
-    Ollama sunucusuna bağlanıp (localhost:11434) yüklü modelleri çeker.
-    """
+# --- OLLAMA MODEL LİSTESİ (TTL önbellekli) ---
+_models = None
+_models_fetched_at = 0.0
+_models_refresh = None  # Devam eden arka plan yenilemesi (asyncio.Task)
+_models_lock = None
+
+async def _fetch_models():
+    """Ollama sunucusundan (OLLAMA_BASE_URL, varsayılan localhost:11434) yüklü modelleri çeker."""
+    global _models, _models_fetched_at
     try:
         # Ollama'nın standart API'si
-        response = requests.get("http://localhost:11434/api/tags", timeout=2)
-        if response.status_code == 200:
-            data = response.json()
-            # Sadece model isimlerini (name) listele
-            return [m["name"] for m in data.get("models", [])]
+        async with httpx.AsyncClient(timeout=MODEL_LIST_TIMEOUT_SECONDS) as client:
+            response = await client.get(f"{OLLAMA_BASE_URL}/api/tags")
+        response.raise_for_status()
+        # Sadece model isimlerini (name) listele
+        _models = [m["name"] for m in response.json().get("models", [])]
     except Exception as e:
         print(f"Ollama'ya bağlanılamadı: {e}")
-    
-    # Hata olursa manuel bir liste dön
-    return ["gemma2:9b", "llama3.2", "mistral", "qwen2.5"]
\ No newline at end of file
+        # Hata olursa son bilinen liste, o da yoksa manuel liste kullanılır
+        if _models is None:
+            _models = list(FALLBACK_MODELS)
+    # Hata durumunda da zaman damgası güncellenir: Ollama kapalıyken her istek beklemesin
+    _models_fetched_at = time.monotonic()
+
+async def get_available_models():
+    """
+    Yüklü model listesini önbellekten döner.
+    - İlk çağrıda liste çekilir (en fazla MODEL_LIST_TIMEOUT_SECONDS beklenir).
+    - Süresi dolmuşsa eski liste hemen döner, yenisi arka planda çekilir.
+    """
+    global _models_refresh, _models_lock
+    if _models is None:
+        if _models_lock is None:
+            _models_lock = asyncio.Lock()
+        async with _models_lock:
+            if _models is None:
+                await _fetch_models()
+    elif time.monotonic() - _models_fetched_at > MODEL_LIST_CACHE_TTL_SECONDS:
+        if _models_refresh is None or _models_refresh.done():
+            _models_refresh = asyncio.create_task(_fetch_models())
+    return list(_models)
@@ -0,0 +1,78 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Açılış durumu (/healthz, /readyz ve /stats için)
+# status: "starting" (yükleniyor) | "ready" | "failed"
+# Bu modül süreçte ilk import edilenlerden olduğu için başlangıç zamanı buradan alınır.
+_process_started = time.perf_counter()
+_state_lock = threading.Lock()
+_state = {"status": "starting", "error": None, "ready_seconds": None, "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+_phases = []  # [(aşama adı, saniye)] açılış sırasıyla
+
+def get_startup_state():
+    with _state_lock:
+        state = dict(_state)
+        state["phases"] = {name: round(seconds, 2) for name, seconds in _phases}
+    state["uptime_seconds"] = round(time.perf_counter() - _process_started, 1)
+    return state
+
+def is_started():
+    return _state["status"] == "ready"
+
+def record_phase(name, seconds):
+    """Açılış aşamasının süresini kaydeder (açılış bittikten sonraki çağrılar kaydedilmez)."""
+    with _state_lock:
+        if _state["status"] == "starting":
+            _phases.append((name, seconds))
+
+@contextmanager
+def startup_phase(name):
+    """
+    with startup_phase("embedding_model"): ...
+    Aynı kod açılıştan sonra da (model değişimi, yenileme) çalışabilir; o zaman süre kaydedilmez.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+def mark_imports_done():
+    """Modül importlarının süresini kaydeder (lifespan başında çağrılır)."""
+    record_phase("imports", time.perf_counter() - _process_started)
+
+def run_startup(target, background=True):
+    """
+    Ağır başlatma işini (embedding modeli, Chroma, model ısındırma) çalıştırır.
+    background=True ise ayrı bir thread'de çalışır; sunucu hemen istek kabul eder,
+    hazır olup olmadığı /readyz ile izlenir. Bitince açılış profili yazdırılır.
+    """
+    def run():
+        try:
+            target()
+        except Exception as e:
+            print(f"❌ Açılış Hatası: {e}")
+            _finish("failed", error=str(e))
+        else:
+            _finish("ready")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="startup", daemon=True)
+    thread.start()
+    return thread
+
+def _finish(status, error=None):
+    with _state_lock:
+        _state.update(status=status, error=error, ready_seconds=round(time.perf_counter() - _process_started, 2))
+    print_startup_profile()
+
+def print_startup_profile():
+    state = get_startup_state()
+    print(f"⏱️ Açılış profili ({state['status']}, toplam {state['ready_seconds']} sn):")
+    width = max((len(name) for name in state["phases"]), default=0)
+    for name, seconds in state["phases"].items():
+        print(f"   {name.ljust(width)}  {seconds:8.2f} sn")